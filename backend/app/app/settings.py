@@ -36,6 +36,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.metrics.RequestMetricsMiddleware",
+    "core.querybudget.RepeatedQueryMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -82,6 +84,25 @@ else:
         }
     }
 
+# Optional read replica for the read-heavy student and attempt-listing views
+# (see core/db_routing.py). Locally, a second SQLite file kept current with
+# ``manage.py sync_sqlite_replica`` stands in for it.
+REPLICA_DATABASE_URL = config("REPLICA_DATABASE_URL", default=None)
+if REPLICA_DATABASE_URL:
+    DATABASES["replica"] = dj_database_url.parse(REPLICA_DATABASE_URL, conn_max_age=600)
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+# Extra databases for student-owned rows (see core/sharding.py), as a
+# comma-separated list of URLs that become aliases shard_1, shard_2, ...
+# Only append: a shard's position fixes its attempt id block. Run
+# ``manage.py rebalance_shards`` after changing the list.
+SHARD_DATABASE_URLS = config("SHARD_DATABASE_URLS", default="", cast=Csv())
+for _index, _url in enumerate(SHARD_DATABASE_URLS, start=1):
+    DATABASES[f"shard_{_index}"] = dj_database_url.parse(_url, conn_max_age=600)
+STUDENT_SHARDS = ["default"] + [f"shard_{_index}" for _index in range(1, len(SHARD_DATABASE_URLS) + 1)]
+DATABASE_ROUTERS = ["core.sharding.ShardRouter", "core.db_routing.ReplicaRouter"]
+# Seconds a student's (and the writing client's) reads stay on the primary after a write.
+REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", default=5.0, cast=float)
+
 AUTH_PASSWORD_VALIDATORS = []
 
 LANGUAGE_CODE = "en-us"
@@ -94,6 +115,58 @@ STATIC_ROOT = config("DJANGO_STATIC_ROOT", default=str(BASE_DIR / "staticfiles")
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Directory ``manage.py export_dashboards`` writes static overview and
+# recommendation bundles to (see core/services/dashboards.py).
+DASHBOARD_EXPORT_DIR = config("DASHBOARD_EXPORT_DIR", default="")
+
+# Attempts older than this many days are moved to compressed monthly archive
+# segments by ``manage.py archive_attempts`` (see core/services/archive.py).
+ATTEMPT_HOT_DAYS = config("ATTEMPT_HOT_DAYS", default=180, cast=int)
+
+# Processes used to analyze cache misses of multi-file project submissions.
+# The default, 0 (like 1), analyzes inline in the request worker; a larger
+# value starts that many processes in every web worker, so size it per host.
+# ``manage.py analyze_snapshots`` runs its own pool (``--workers``).
+CODE_ANALYSIS_WORKERS = config("CODE_ANALYSIS_WORKERS", default=0, cast=int)
+CODE_ANALYSIS_CACHE_TIMEOUT = config("CODE_ANALYSIS_CACHE_TIMEOUT", default=24 * 60 * 60, cast=int)
+
+# Threads per process that add saved attempts to the similarity index after
+# commit; 0 indexes inline in the committing thread.
+SUBMISSION_INDEX_WORKERS = config("SUBMISSION_INDEX_WORKERS", default=1, cast=int)
+
+# Directory shared by all workers for cross-process request metrics; leave
+# empty to report only the serving process.
+METRICS_DIR = config("METRICS_DIR", default="")
+METRICS_FLUSH_INTERVAL = config("METRICS_FLUSH_INTERVAL", default=1.0, cast=float)
+
+# SQLite file holding the token buckets shared by all workers on this host
+# (see core/throttling.py); ":memory:" keeps them per process.
+THROTTLE_STORE = config("THROTTLE_STORE", default=str(BASE_DIR / "throttle.sqlite3"))
+
+# Server-Sent Events feed of new attempts (see core/streaming.py).
+ATTEMPT_STREAM_POLL_INTERVAL = config("ATTEMPT_STREAM_POLL_INTERVAL", default=1.0, cast=float)
+ATTEMPT_STREAM_HEARTBEAT = config("ATTEMPT_STREAM_HEARTBEAT", default=15.0, cast=float)
+ATTEMPT_STREAM_QUEUE_SIZE = config("ATTEMPT_STREAM_QUEUE_SIZE", default=1000, cast=int)
+# How long, in seconds, an attempt's transaction may stay open and still have
+# its attempt delivered after later ids have been streamed.
+ATTEMPT_STREAM_COMMIT_WINDOW = config("ATTEMPT_STREAM_COMMIT_WINDOW", default=10.0, cast=float)
+
+# Memory-mapped per-student recommendation features written by
+# ``manage.py refresh_feature_store`` (see core/services/feature_store.py).
+# Leave empty to compute features from the database on every request; files
+# older than FEATURE_STORE_MAX_AGE seconds (0 = no limit) are ignored.
+FEATURE_STORE_PATH = config("FEATURE_STORE_PATH", default="")
+FEATURE_STORE_MAX_AGE = config("FEATURE_STORE_MAX_AGE", default=900, cast=int)
+
+# In DEBUG, log query shapes repeated this many times within one request.
+QUERY_REPEAT_THRESHOLD = config("QUERY_REPEAT_THRESHOLD", default=5, cast=int)
+
+# Stage-level profiling of instrumented views (see core/profiling.py).
+PROFILING_SERVER_TIMING = config("PROFILING_SERVER_TIMING", default=False, cast=bool)
+PROFILING_ALLOW_HEADER = config("PROFILING_ALLOW_HEADER", default=DEBUG, cast=bool)
+PROFILING_SAMPLE_RATE = config("PROFILING_SAMPLE_RATE", default=0.0, cast=float)
+PROFILING_DIR = config("PROFILING_DIR", default=str(BASE_DIR / "profiles"))
+
 REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
@@ -0,0 +1,139 @@
+"""Send selected read-only views to a read replica, with read-your-writes.
+
+Reads go to the ``replica`` database alias only inside views decorated with
+:func:`replica_reads`, and only when that alias is configured
+(``REPLICA_DATABASE_URL``). Every other query, and every write, goes to
+``default``. :class:`ReplicaRouter` applies that choice; the decorator sets it
+for the duration of the view through a context variable, so threads and async
+tasks do not see each other's choice.
+
+Replicas lag the primary, so recent writers are pinned to the primary for
+``REPLICA_STICKY_SECONDS``:
+
+* the student: each saved attempt or student row pins that student id in the
+  default cache, for every client. With the per-process LocMem cache this only
+  covers the worker that took the write; configure a shared cache to cover all
+  workers.
+* the client: a successful unsafe request through a decorated view sets a
+  short-lived cookie that pins that client's later reads.
+
+If the replica fails, the read runs again on the primary.
+"""
+from __future__ import annotations
+
+import math
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+REPLICA_ALIAS = "replica"
+PIN_COOKIE = "primary_pin"
+_SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+_read_alias: ContextVar[Optional[str]] = ContextVar("core_read_alias", default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints) -> str:
+        # Instances loaded from the replica must still be saved to the primary.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA_ALIAS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints) -> Optional[bool]:
+        # The replica receives the primary's schema through replication.
+        return False if db == REPLICA_ALIAS else None
+
+
+def replica_configured() -> bool:
+    return REPLICA_ALIAS in connections.settings
+
+
+def _sticky_seconds() -> float:
+    return max(0.0, getattr(settings, "REPLICA_STICKY_SECONDS", 5.0))
+
+
+def _pin_key(student_id) -> str:
+    return f"core:primary-pin:student:{student_id}"
+
+
+def pin_student(student_id: int) -> None:
+    """Serve ``student_id``'s reads from the primary for the sticky window."""
+
+    seconds = _sticky_seconds()
+    if seconds and replica_configured():
+        cache.set(_pin_key(student_id), 1, timeout=math.ceil(seconds))
+
+
+def student_pinned(student_id) -> bool:
+    return cache.get(_pin_key(student_id)) is not None
+
+
+def read_alias() -> str:
+    """The alias reads go to right now."""
+
+    return _read_alias.get() or DEFAULT_DB_ALIAS
+
+
+def replica_reads(student_kwarg: Optional[str] = None, student_param: Optional[str] = None):
+    """Run a view's safe-method reads on the replica unless the student or client is pinned.
+
+    ``student_kwarg`` names the URL argument holding the student id, and
+    ``student_param`` the query parameter, if any. Apply it outside
+    ``@api_view`` so it sees the Django request.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in _SAFE_METHODS:
+                response = view(request, *args, **kwargs)
+                seconds = _sticky_seconds()
+                if response.status_code < 400 and seconds and replica_configured():
+                    response.set_cookie(PIN_COOKIE, "1", max_age=math.ceil(seconds), httponly=True, samesite="Lax")
+                return response
+
+            student_id = kwargs.get(student_kwarg) if student_kwarg else None
+            if student_id is None and student_param:
+                student_id = request.GET.get(student_param) or None
+            if (
+                not replica_configured()
+                or request.COOKIES.get(PIN_COOKIE)
+                or (student_id is not None and student_pinned(student_id))
+            ):
+                return view(request, *args, **kwargs)
+
+            token = _read_alias.set(REPLICA_ALIAS)
+            try:
+                return view(request, *args, **kwargs)
+            except DatabaseError:
+                pass
+            finally:
+                _read_alias.reset(token)
+            return view(request, *args, **kwargs)
+
+        return wrapped
+
+    return decorator
+
+
+__all__ = [
+    "PIN_COOKIE",
+    "REPLICA_ALIAS",
+    "ReplicaRouter",
+    "pin_student",
+    "read_alias",
+    "replica_configured",
+    "replica_reads",
+    "student_pinned",
+]
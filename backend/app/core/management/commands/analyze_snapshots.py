@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Attempt, AttemptAnalysis
+from core.services.code_analysis import RULE_VERSION, summarize_snippet
+from core.sharding import across_shards
+
+
+def _pending_chunk(attempts, after_id: int, chunk_size: int) -> List[Tuple[int, int, str]]:
+    return list(
+        attempts.filter(pk__gt=after_id)
+        .exclude(code_snapshot="")
+        .exclude(analysis__rule_version=RULE_VERSION)
+        .order_by("pk")
+        .values_list("pk", "lesson_id", "code_snapshot")[:chunk_size]
+    )
+
+
+def lesson_issue_frequencies() -> Dict[int, Dict[str, object]]:
+    """Share of analyzed snippets per lesson that trigger each rule."""
+
+    snippets: Dict[int, int] = Counter()
+    hits: Dict[int, Counter] = defaultdict(Counter)
+    for analyses in across_shards(AttemptAnalysis.objects.filter(rule_version=RULE_VERSION)):
+        for lesson_id, issue_counts in analyses.values_list("lesson_id", "issue_counts").iterator(chunk_size=2000):
+            snippets[lesson_id] += 1
+            hits[lesson_id].update(rule for rule, count in issue_counts.items() if count)
+    return {
+        lesson_id: {
+            "snippets": total,
+            "rules": {
+                rule: round(count / total, 4) for rule, count in hits[lesson_id].most_common()
+            },
+        }
+        for lesson_id, total in sorted(snippets.items())
+    }
+
+
+class Command(BaseCommand):
+    help = "Analyze stored attempt code snapshots and record per-attempt issue summaries"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Analyzer processes; 1 analyzes in the current process.",
+        )
+        parser.add_argument("--limit", type=int, default=None, help="Stop after this many snapshots.")
+        parser.add_argument(
+            "--report",
+            action="store_true",
+            help="Print per-lesson issue frequencies once analysis finishes.",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options["chunk_size"])
+        workers = max(1, options["workers"])
+        limit = options["limit"]
+
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        processed = 0
+        started = time.perf_counter()
+        try:
+            # Each shard holds its students' attempts and their analyses.
+            for attempts in across_shards(Attempt.objects.all()):
+                last_id = 0
+                while limit is None or processed < limit:
+                    size = chunk_size if limit is None else min(chunk_size, limit - processed)
+                    chunk = _pending_chunk(attempts, last_id, size)
+                    if not chunk:
+                        break
+                    codes = [code for _, _, code in chunk]
+                    if executor:
+                        summaries = list(
+                            executor.map(
+                                summarize_snippet, codes, chunksize=max(1, len(codes) // (workers * 4))
+                            )
+                        )
+                    else:
+                        summaries = [summarize_snippet(code) for code in codes]
+                    self._store(attempts.db, chunk, summaries)
+                    processed += len(chunk)
+                    last_id = chunk[-1][0]
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f"Analyzed {processed} snapshots ({processed / elapsed if elapsed else 0.0:.1f}/s)"
+                    )
+        finally:
+            if executor:
+                executor.shutdown()
+
+        elapsed = time.perf_counter() - started
+        rate = processed / elapsed if elapsed else 0.0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Analyzed {processed} snapshots under rule version {RULE_VERSION} "
+                f"in {elapsed:.1f}s ({rate:.1f} snippets/s)."
+            )
+        )
+
+        if options["report"]:
+            for lesson_id, summary in lesson_issue_frequencies().items():
+                rules = ", ".join(f"{rule}={share:.1%}" for rule, share in summary["rules"].items())
+                self.stdout.write(f"lesson {lesson_id} ({summary['snippets']} snippets): {rules or 'clean'}")
+
+    @staticmethod
+    def _store(alias: str, chunk: List[Tuple[int, int, str]], summaries: List[Dict[str, int]]) -> None:
+        analyses = [
+            AttemptAnalysis(
+                attempt_id=attempt_id,
+                lesson_id=lesson_id,
+                rule_version=RULE_VERSION,
+                issue_counts=counts,
+                issue_total=sum(counts.values()),
+            )
+            for (attempt_id, lesson_id, _), counts in zip(chunk, summaries)
+        ]
+        # Each chunk commits on its own so an interrupted run resumes where it stopped.
+        with transaction.atomic(using=alias):
+            AttemptAnalysis.objects.using(alias).bulk_create(
+                analyses,
+                update_conflicts=True,
+                unique_fields=["attempt"],
+                update_fields=["lesson", "rule_version", "issue_counts", "issue_total", "analyzed_at"],
+            )
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.archive import archive_attempts, hot_cutoff
+
+
+class Command(BaseCommand):
+    help = "Move attempts older than the hot window into compressed monthly archive segments"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=None,
+            help="Archive attempts from before midnight this many days ago (default: ATTEMPT_HOT_DAYS).",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        days = options["older_than_days"]
+        if days is None:
+            days = getattr(settings, "ATTEMPT_HOT_DAYS", 180)
+        if days < 0:
+            raise CommandError("--older-than-days must not be negative.")
+        cutoff = hot_cutoff(days)
+        moved = archive_attempts(cutoff, batch_size=max(1, options["batch_size"]))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {moved['attempts']} attempts from before {cutoff.date().isoformat()} "
+                f"into {moved['segments']} new segments."
+            )
+        )
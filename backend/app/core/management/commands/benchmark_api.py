@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import json
+import platform
+from datetime import timedelta
+from pathlib import Path
+from typing import List
+from unittest import mock
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Attempt, Lesson, Student
+from core.services.benchmark import BenchmarkCase, compare, measure
+from core.services.completion import student_progress
+from core.services.recommender import score_candidate
+from core.services.synthetic import PRESETS, generate_dataset
+from core.views import WriteThrottle
+
+_ANALYZE_SNIPPET = """
+def review(items, flag):
+    total = 0
+    spare = 5
+    for index in range(len(items) + 1):
+        total += items[index]
+    if flag:
+        print('duplicate')
+    else:
+        print('duplicate')
+"""
+
+
+def _build_cases(client: Client) -> List[BenchmarkCase]:
+    ranked = list(
+        Student.objects.annotate(attempt_count=Count("attempts"))
+        .order_by("-attempt_count", "pk")
+        .values_list("pk", "attempt_count")
+    )
+    if not ranked:
+        raise CommandError("No students to benchmark; seed data first.")
+    heavy_id = ranked[0][0]
+    typical_id = ranked[len(ranked) // 2][0]
+    lesson_id, course_id = Lesson.objects.order_by("pk").values_list("pk", "course_id").first() or (None, None)
+    if lesson_id is None:
+        raise CommandError("No lessons to benchmark; seed data first.")
+
+    def get(url):
+        def run():
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+
+        return run
+
+    def post_attempt():
+        response = client.post(
+            reverse("attempt-collection"),
+            data={
+                "student": typical_id,
+                "lesson": lesson_id,
+                "timestamp": (timezone.now() - timedelta(minutes=1)).isoformat(),
+                "correctness": 0.75,
+                "hints_used": 1,
+                "duration_sec": 300,
+                "code_snapshot": _ANALYZE_SNIPPET,
+            },
+            content_type="application/json",
+        )
+        assert response.status_code == 201, response.status_code
+
+    def analyze():
+        response = client.post(
+            reverse("analyze-code"), data={"code": _ANALYZE_SNIPPET}, content_type="application/json"
+        )
+        assert response.status_code == 200, response.status_code
+
+    def load_progress():
+        # What the overview and recommendation read per student.
+        student_progress(heavy_id)
+
+    def score_batch():
+        for step in range(1000):
+            score_candidate(step % 100, step % 30, (step % 10) / 10.0, (step % 4) / 2.0)
+
+    return [
+        BenchmarkCase("student_overview.heavy", get(reverse("student-overview", args=[heavy_id]))),
+        BenchmarkCase("student_overview.typical", get(reverse("student-overview", args=[typical_id]))),
+        BenchmarkCase(
+            "student_recommendation.heavy", get(reverse("student-recommendation", args=[heavy_id]))
+        ),
+        BenchmarkCase(
+            "student_recommendation.typical", get(reverse("student-recommendation", args=[typical_id]))
+        ),
+        BenchmarkCase("student_dashboard.heavy", get(reverse("student-dashboard", args=[heavy_id]))),
+        BenchmarkCase("course_candidates", get(reverse("course-candidates", args=[course_id]) + "?limit=50")),
+        BenchmarkCase("student_progress.heavy", load_progress),
+        BenchmarkCase("attempt_collection.get", get(reverse("attempt-collection"))),
+        BenchmarkCase("attempt_collection.post", post_attempt),
+        BenchmarkCase("analyze_code", analyze),
+        BenchmarkCase("score_candidate", score_batch, operations=1000),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Benchmark the API hot paths against a synthetic dataset and compare with a baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+        parser.add_argument("--seed", type=int, default=123456789)
+        parser.add_argument("--repeat", type=int, default=20, help="Timed iterations per case.")
+        parser.add_argument("--case", action="append", default=[], help="Only run cases with this prefix.")
+        parser.add_argument("--output", help="Write results to this JSON file (e.g. a new baseline).")
+        parser.add_argument("--compare", help="Baseline JSON file to compare against.")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Allowed relative slowdown for timing and memory before flagging a regression.",
+        )
+        parser.add_argument(
+            "--in-place",
+            action="store_true",
+            help="Benchmark the configured database as-is instead of a freshly seeded test database.",
+        )
+        parser.add_argument("--keepdb", action="store_true", help="Reuse the benchmark test database.")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["compare"]:
+            try:
+                baseline = json.loads(Path(options["compare"]).read_text())["cases"]
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f"Could not read baseline {options['compare']}: {exc}") from exc
+
+        old_name = None
+        if not options["in_place"]:
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+            )
+        try:
+            if not options["in_place"] and not (options["keepdb"] and Attempt.objects.exists()):
+                counts = generate_dataset(PRESETS[options["preset"]], seed=options["seed"])
+                self.stdout.write("Seeded " + ", ".join(f"{value} {key}" for key, value in counts.items()))
+            results = self._run(options)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+
+        report = {
+            "meta": {
+                "preset": None if options["in_place"] else options["preset"],
+                "seed": options["seed"],
+                "repeat": options["repeat"],
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "machine": platform.machine(),
+                "created_at": timezone.now().isoformat(),
+            },
+            "cases": results,
+        }
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+            self.stdout.write(f"Wrote results to {options['output']}")
+
+        if baseline is not None:
+            regressions = compare(results, baseline, threshold=options["threshold"])
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(f"REGRESSION {regression}"))
+                raise CommandError(f"{len(regressions)} benchmark regression(s) against {options['compare']}.")
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
+
+    def _run(self, options):
+        client = Client(HTTP_HOST="localhost")
+        cases = _build_cases(client)
+        if options["case"]:
+            cases = [case for case in cases if case.name.startswith(tuple(options["case"]))]
+
+        results = {}
+        self.stdout.write(f"{'case':34} {'p50 ms':>10} {'p95 ms':>10} {'queries':>8} {'peak KiB':>10}")
+        # Throttling would turn repeated writes into 429s, and DEBUG query logging
+        # would inflate both timings and memory.
+        with override_settings(DEBUG=False), mock.patch.object(
+            WriteThrottle, "allow_request", return_value=True
+        ):
+            for case in cases:
+                result = measure(case, repeat=max(1, options["repeat"]))
+                results[case.name] = result.as_dict()
+                self.stdout.write(
+                    f"{case.name:34} {result.wall_ms_p50:>10.3f} {result.wall_ms_p95:>10.3f} "
+                    f"{result.queries:>8} {result.peak_memory_kb:>10.1f}"
+                )
+        return results
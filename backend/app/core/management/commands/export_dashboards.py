@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.dashboards import export_dashboards
+from core.views import student_bundle_payloads
+
+
+class Command(BaseCommand):
+    help = "Render every student's overview and recommendation into precompressed, content-hashed JSON bundles"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=getattr(settings, "DASHBOARD_EXPORT_DIR", ""),
+            help="Directory to update (default: DASHBOARD_EXPORT_DIR).",
+        )
+        parser.add_argument("--batch-size", type=int, default=500, help="Students read per completion query.")
+        parser.add_argument(
+            "--max-age-hours",
+            type=float,
+            default=24.0,
+            help="Render students with unchanged inputs again once their bundles are this old; 0 never does.",
+        )
+        parser.add_argument(
+            "--grace-minutes",
+            type=float,
+            default=60.0,
+            help="Keep bundles the manifest no longer names for this long before removing them.",
+        )
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        if not output:
+            raise CommandError("Pass --output or set DASHBOARD_EXPORT_DIR.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if options["grace_minutes"] < 0:
+            raise CommandError("--grace-minutes cannot be negative.")
+        max_age = timedelta(hours=options["max_age_hours"]) if options["max_age_hours"] > 0 else None
+        started = time.monotonic()
+        counts = export_dashboards(
+            output,
+            student_bundle_payloads,
+            batch_size=options["batch_size"],
+            max_age=max_age,
+            grace=timedelta(minutes=options["grace_minutes"]),
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rendered {counts['rendered']} of {counts['students']} students into {output}: "
+                f"{counts['written']} files written, {counts['removed']} removed "
+                f"in {time.monotonic() - started:.1f}s."
+            )
+        )
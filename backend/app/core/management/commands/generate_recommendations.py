@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from core.models import NightlyRecommendation, Student
+from core.sharding import shard_for_student
+from core.services import nightly
+from core.services.replay import ReplayCatalog
+
+UPDATE_FIELDS = ["course", "score", "confidence", "explanation", "alternatives", "generated_at"]
+
+
+class Command(BaseCommand):
+    help = "Precompute every student's recommendation in id-range shards, resuming from a checkpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shard-size", type=int, default=2000, help="Students per shard (an id range).")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Worker processes; 1 runs shards in this process.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=["table", "ndjson"],
+            default="table",
+            help="Upsert into the NightlyRecommendation table, or append one JSON object per student to --output.",
+        )
+        parser.add_argument("--output", help="NDJSON file to write (required with --format ndjson).")
+        parser.add_argument(
+            "--checkpoint",
+            help="JSON file recording finished shards; an interrupted run resumes from it.",
+        )
+        parser.add_argument("--restart", action="store_true", help="Ignore and overwrite an existing checkpoint.")
+
+    def handle(self, *args, **options):
+        shard_size = options["shard_size"]
+        workers = max(1, options["workers"])
+        output_format = options["format"]
+        if shard_size < 1:
+            raise CommandError("--shard-size must be at least 1.")
+        if output_format == "ndjson" and not options["output"]:
+            raise CommandError("--output is required with --format ndjson.")
+
+        bounds = Student.objects.aggregate(first=Min("pk"), last=Max("pk"))
+        if bounds["first"] is None:
+            self.stdout.write("No students; nothing to generate.")
+            return
+        params = {
+            "shard_size": shard_size,
+            "format": output_format,
+            "output": str(Path(options["output"]).resolve()) if options["output"] else None,
+            "first_id": bounds["first"],
+            "last_id": bounds["last"],
+        }
+
+        checkpoint_path = Path(options["checkpoint"]) if options["checkpoint"] else None
+        checkpoint = self._load_checkpoint(checkpoint_path, params, options["restart"])
+        now = datetime.fromisoformat(checkpoint["now"])
+        done = set(checkpoint["done"])
+        shards = nightly.shard_ranges(params["first_id"], params["last_id"], shard_size)
+        pending = [shard for shard in shards if shard[0] not in done]
+        if done:
+            self.stdout.write(f"Resuming: {len(done)} of {len(shards)} shards already done.")
+
+        stream = None
+        if output_format == "ndjson":
+            stream = self._open_ndjson(Path(params["output"]), checkpoint["offset"])
+
+        started = time.perf_counter()
+        written = finished = 0
+
+        def record(shard: tuple, rows: List[Dict[str, object]]) -> None:
+            nonlocal written, finished
+            if stream is None:
+                self._upsert(rows)
+            else:
+                stream.write("".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows).encode("utf-8"))
+                stream.flush()
+                os.fsync(stream.fileno())
+                checkpoint["offset"] = stream.tell()
+            done.add(shard[0])
+            checkpoint["done"] = sorted(done)
+            if checkpoint_path is not None:
+                self._save_checkpoint(checkpoint_path, checkpoint)
+            written += len(rows)
+            finished += 1
+            elapsed = time.perf_counter() - started
+            rate = written / elapsed if elapsed else 0.0
+            eta = (len(pending) - finished) * elapsed / finished
+            self.stdout.write(
+                f"shard {shard[0]}-{shard[1] - 1}: {len(rows)} students | "
+                f"{len(done)}/{len(shards)} shards, {rate:,.0f} students/s, eta {eta:.0f}s"
+            )
+
+        catalog = ReplayCatalog.load()
+        try:
+            if workers == 1 or len(pending) <= 1:
+                nightly.init_worker(catalog)
+                for shard in pending:
+                    record(shard, nightly.generate_shard(shard[0], shard[1], now.timestamp()))
+            else:
+                self._run_pool(catalog, pending, workers, now.timestamp(), record)
+        finally:
+            if stream is not None:
+                stream.close()
+
+        elapsed = time.perf_counter() - started
+        rate = written / elapsed if elapsed else 0.0
+        destination = params["output"] if stream is not None else NightlyRecommendation._meta.db_table
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {written} recommendations in {len(pending)} shards in {elapsed:.1f}s "
+                f"({rate:,.0f} students/s) into {destination}."
+            )
+        )
+
+    def _run_pool(self, catalog, pending, workers, now_timestamp, record) -> None:
+        # Forked workers must not share the parent's database connections.
+        connections.close_all()
+        queue = list(pending)
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=nightly.init_worker, initargs=(catalog,)
+        ) as pool:
+            running = {}
+            while queue or running:
+                while queue and len(running) < workers * 2:
+                    shard = queue.pop(0)
+                    running[pool.submit(nightly.generate_shard, shard[0], shard[1], now_timestamp)] = shard
+                completed, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    record(running.pop(future), future.result())
+
+    @staticmethod
+    def _upsert(rows: List[Dict[str, object]]) -> None:
+        objects = [
+            NightlyRecommendation(
+                student_id=row["student_id"],
+                course_id=row["course_id"],
+                score=row["score"],
+                confidence=row["confidence"],
+                explanation=row["explanation"],
+                alternatives=row["alternatives"],
+                generated_at=datetime.fromisoformat(row["generated_at"]),
+            )
+            for row in rows
+        ]
+        shards: Dict[str, List[NightlyRecommendation]] = {}
+        for recommendation in objects:
+            shards.setdefault(shard_for_student(recommendation.student_id), []).append(recommendation)
+        for alias, shard_objects in shards.items():
+            with transaction.atomic(using=alias):
+                NightlyRecommendation.objects.on_shard(alias).bulk_create(
+                    shard_objects,
+                    batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=["student"],
+                    update_fields=UPDATE_FIELDS,
+                )
+
+    @staticmethod
+    def _open_ndjson(path: Path, offset: int):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Binary mode, so tell() is the byte offset stored in the checkpoint.
+        stream = open(path, "r+b" if offset and path.exists() else "wb")
+        # Drop anything written after the last checkpointed shard.
+        stream.seek(offset)
+        stream.truncate()
+        return stream
+
+    def _load_checkpoint(self, path: Optional[Path], params: Dict[str, object], restart: bool) -> Dict[str, object]:
+        if path is not None and path.exists() and not restart:
+            checkpoint = json.loads(path.read_text())
+            if checkpoint.get("params") != params:
+                raise CommandError(
+                    f"{path} was written with different options or students; pass --restart to discard it."
+                )
+            return checkpoint
+        return {"params": params, "now": timezone.now().isoformat(), "done": [], "offset": 0}
+
+    @staticmethod
+    def _save_checkpoint(path: Path, checkpoint: Dict[str, object]) -> None:
+        temporary = path.with_name(path.name + ".tmp")
+        temporary.write_text(json.dumps(checkpoint))
+        os.replace(temporary, path)
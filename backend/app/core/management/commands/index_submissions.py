@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from core.models import Attempt
+from core.services.submission_index import index_attempts
+from core.sharding import across_shards
+
+
+class Command(BaseCommand):
+    help = "Backfill the submission similarity index for attempts that are not indexed yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lesson", type=int, default=None, help="Only index this lesson.")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        attempts = Attempt.objects.exclude(code_snapshot="").filter(signature__isnull=True)
+        if options["lesson"] is not None:
+            attempts = attempts.filter(lesson_id=options["lesson"])
+        # Signatures live on their attempt's shard; the router finds it from student_id.
+        attempts = attempts.order_by("pk").only("pk", "student_id", "lesson_id", "code_snapshot")
+        indexed = sum(
+            index_attempts(shard.iterator(chunk_size=options["chunk_size"])) for shard in across_shards(attempts)
+        )
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} submissions."))
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.rebalance import mirror_students, rebalance_shards, replicate_catalog
+from core.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    help = "Copy the catalog to every shard and move students whose rows sit on the wrong shard"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report the students that would move.")
+        parser.add_argument("--batch-size", type=int, default=200, help="Students moved per transaction.")
+        parser.add_argument(
+            "--copies-only",
+            action="store_true",
+            help="Only rewrite the catalog and student copies on the shards from default; safe while writers run.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if options["copies_only"]:
+            catalog = replicate_catalog()
+            students = mirror_students()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Copied {sum(catalog.values())} catalog rows and {students} students to the shards."
+                )
+            )
+            return
+        plan = rebalance_shards(batch_size=options["batch_size"], dry_run=options["dry_run"])
+        verb = "Would move" if options["dry_run"] else "Moved"
+        for (source, target), student_ids in sorted(plan.moves.items()):
+            self.stdout.write(f"{verb} {len(student_ids)} students from {source} to {target}.")
+        self.stdout.write(
+            self.style.SUCCESS(f"{verb} {plan.students} students across {len(shard_aliases())} shards.")
+        )
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from core.services.completion import rebuild_completions
+
+
+class Command(BaseCommand):
+    help = "Recompute the lesson-completion bitmaps from attempt history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--student",
+            type=int,
+            action="append",
+            default=None,
+            help="Only rebuild this student's bitmaps; repeat for several.",
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_completions(options["student"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} lesson-completion bitmaps."))
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily activity rollups from attempt history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Only rebuild days from this date (YYYY-MM-DD) on.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            try:
+                since = date.fromisoformat(options["since"])
+            except ValueError as exc:
+                raise CommandError(f"--since must be a YYYY-MM-DD date: {exc}") from exc
+        written = rebuild_rollups(since, batch_size=max(1, options["batch_size"]))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {written['student_days']} student-course days and {written['lesson_days']} lesson days."
+            )
+        )
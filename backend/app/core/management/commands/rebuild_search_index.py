@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from core.services.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Recreate the catalog full-text search documents from courses and lessons"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rebuild_search_index(batch_size=max(1, options["batch_size"]))
+        self.stdout.write(self.style.SUCCESS(f"Indexed {written} courses and lessons."))
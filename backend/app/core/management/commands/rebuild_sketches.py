@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from core.services.lesson_stats import rebuild_sketches
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-lesson duration and correctness quantile sketches from attempt history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        written = rebuild_sketches(chunk_size=max(1, options["chunk_size"]))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt sketches for {written} lessons."))
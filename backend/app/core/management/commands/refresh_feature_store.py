@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from core.services.feature_store import write_feature_store
+
+
+class Command(BaseCommand):
+    help = "Write the memory-mapped per-student feature store read by every API worker"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            default=getattr(settings, "FEATURE_STORE_PATH", ""),
+            help="File to replace (default: FEATURE_STORE_PATH).",
+        )
+        parser.add_argument("--shard-size", type=int, default=2000, help="Students read per attempts query.")
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.0,
+            help="Keep running and rewrite the store every INTERVAL seconds; 0 writes it once.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not path:
+            raise CommandError("Pass --path or set FEATURE_STORE_PATH.")
+        if options["shard_size"] < 1:
+            raise CommandError("--shard-size must be at least 1.")
+        interval = options["interval"]
+        while True:
+            started = time.monotonic()
+            written = write_feature_store(path, shard_size=options["shard_size"])
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Wrote features for {written['students']} students x {written['courses']} courses "
+                    f"to {path} in {elapsed:.1f}s."
+                )
+            )
+            if interval <= 0:
+                return
+            close_old_connections()
+            time.sleep(max(0.0, interval - elapsed))
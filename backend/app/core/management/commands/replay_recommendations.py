@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.replay import baseline_weights, parse_weight_set, replay_history
+
+
+class Command(BaseCommand):
+    help = "Replay attempt history to compare recommender weight sets against what students did next"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--weights",
+            action="append",
+            default=[],
+            metavar="NAME:FEATURE=WEIGHT,...",
+            help="Alternative weight set; repeat to compare several. The current weights always run as 'baseline'.",
+        )
+        parser.add_argument(
+            "--session-gap-minutes",
+            type=float,
+            default=60.0,
+            help="Idle time after which a student's next attempt counts as a decision point; 0 scores every attempt.",
+        )
+        parser.add_argument("--top", type=int, default=3, help="Size of the recommendation list for hit@N.")
+        parser.add_argument("--limit", type=int, default=None, help="Only replay the oldest N attempts.")
+        parser.add_argument("--chunk-size", type=int, default=10000)
+        parser.add_argument("--output", help="Write the report to this JSON file.")
+
+    def handle(self, *args, **options):
+        try:
+            weight_sets = [baseline_weights()] + [parse_weight_set(spec) for spec in options["weights"]]
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+        names = [weights.name for weights in weight_sets]
+        if len(set(names)) != len(names):
+            raise CommandError("Weight set names must be unique.")
+
+        def progress(events: int) -> None:
+            self.stdout.write(f"{events} attempts replayed")
+
+        engine, elapsed = replay_history(
+            weight_sets,
+            session_gap=max(0.0, options["session_gap_minutes"]) * 60.0,
+            top_n=max(1, options["top"]),
+            chunk_size=max(1, options["chunk_size"]),
+            limit=options["limit"],
+            progress=progress if options["verbosity"] > 1 else None,
+        )
+        rate = engine.events / elapsed if elapsed else 0.0
+        top = max(1, options["top"])
+        self.stdout.write(f"{'weight set':24} {'decisions':>10} {'hit@1':>8} {f'hit@{top}':>8} {'changed':>8}")
+        results = [stats.as_dict() for stats in engine.stats]
+        for result in results:
+            self.stdout.write(
+                f"{result['name']:24} {result['decisions']:>10} {result['hit_rate_at_1']:>8.4f} "
+                f"{result['hit_rate_at_n']:>8.4f} {result['changed_from_baseline']:>8.4f}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Replayed {engine.events} attempts in {elapsed:.1f}s ({rate:,.0f} attempts/s).")
+        )
+
+        if options["output"]:
+            report = {
+                "attempts": engine.events,
+                "seconds": round(elapsed, 3),
+                "session_gap_minutes": options["session_gap_minutes"],
+                "top": top,
+                "weight_sets": results,
+            }
+            Path(options["output"]).write_text(json.dumps(report, indent=2) + "\n")
+            self.stdout.write(f"Wrote report to {options['output']}")
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.synthetic import PRESETS, ScalePreset, clear_dataset, dataset_exists, generate_dataset
+
+
+class Command(BaseCommand):
+    help = "Create a deterministic synthetic dataset for load and benchmark work"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+        parser.add_argument("--students", type=int, default=None, help="Override the preset student count.")
+        parser.add_argument("--courses", type=int, default=None, help="Override the preset course count.")
+        parser.add_argument("--lessons", type=int, default=None, help="Override lessons per course.")
+        parser.add_argument(
+            "--mean-attempts", type=float, default=None, help="Override the mean attempts per student."
+        )
+        parser.add_argument("--seed", type=int, default=123456789)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--flush",
+            action="store_true",
+            help="Delete previously generated synthetic rows before seeding.",
+        )
+
+    def handle(self, *args, **options):
+        base = PRESETS[options["preset"]]
+        preset = ScalePreset(
+            students=options["students"] if options["students"] is not None else base.students,
+            courses=options["courses"] if options["courses"] is not None else base.courses,
+            lessons_per_course=options["lessons"] if options["lessons"] is not None else base.lessons_per_course,
+            mean_attempts=(
+                options["mean_attempts"] if options["mean_attempts"] is not None else base.mean_attempts
+            ),
+        )
+        if preset.students < 1 or preset.courses < 1 or preset.lessons_per_course < 1:
+            raise CommandError("Students, courses and lessons per course must be positive.")
+
+        if options["flush"]:
+            clear_dataset()
+        elif dataset_exists():
+            raise CommandError("Synthetic rows from an earlier run exist; pass --flush to replace them.")
+
+        started = time.perf_counter()
+
+        def progress(model: str, inserted: int) -> None:
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{model}: {inserted} rows ({elapsed:.1f}s)")
+
+        counts = generate_dataset(
+            preset,
+            seed=options["seed"],
+            batch_size=max(1, options["batch_size"]),
+            progress=progress if options["verbosity"] > 1 else None,
+        )
+        elapsed = time.perf_counter() - started
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Seeded {summary} in {elapsed:.1f}s."))
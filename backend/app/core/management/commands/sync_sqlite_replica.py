@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.db_routing import REPLICA_ALIAS, replica_configured
+
+
+def copy_sqlite_database(source_alias: str = DEFAULT_DB_ALIAS, target_alias: str = REPLICA_ALIAS) -> None:
+    """Overwrite the target SQLite file with a consistent snapshot of the source database."""
+
+    source = connections[source_alias]
+    source.ensure_connection()
+    target = sqlite3.connect(connections[target_alias].settings_dict["NAME"])
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database to the replica SQLite file, to stand in for replication locally"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.0,
+            help="Keep copying every INTERVAL seconds, simulating replication lag; 0 copies once.",
+        )
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError("Set REPLICA_DATABASE_URL to configure the replica database.")
+        for alias in (DEFAULT_DB_ALIAS, REPLICA_ALIAS):
+            if connections[alias].vendor != "sqlite":
+                raise CommandError(f'The "{alias}" database is not SQLite; use real replication instead.')
+        while True:
+            copy_sqlite_database()
+            self.stdout.write(self.style.SUCCESS(f"Copied {DEFAULT_DB_ALIAS} to {REPLICA_ALIAS}."))
+            if options["interval"] <= 0:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,256 @@
+"""Per-endpoint request metrics exposed in the Prometheus text format.
+
+Each process accumulates counters in memory. When ``settings.METRICS_DIR`` is
+set, a process also writes its totals to ``<METRICS_DIR>/metrics-<pid>.json``
+at most once per ``METRICS_FLUSH_INTERVAL`` seconds, and the metrics endpoint
+merges every file in the directory. A scrape therefore sees all gunicorn
+workers, whichever one serves it. Counters are cumulative, so files left by
+recycled workers keep contributing their totals, like Prometheus multiprocess
+mode.
+"""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from .querybudget import wrap_all_connections
+from .throttling import get_store
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+UNRESOLVED_VIEW = "unresolved"
+
+# Layout of the per-view counter list, kept flat so merging is a plain sum.
+_REQUESTS, _LATENCY_SUM, _QUERIES, _QUERY_SECONDS, _RESPONSE_BYTES = range(5)
+_BUCKETS_START = 5
+_WIDTH = _BUCKETS_START + len(LATENCY_BUCKETS) + 1
+
+
+class MetricsRegistry:
+    """Process-local metric store with optional file-based cross-process sharing."""
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 1.0) -> None:
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self._views: Dict[str, List[float]] = {}
+        self._statuses: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def observe(
+        self,
+        view: str,
+        status: int,
+        seconds: float,
+        queries: int,
+        query_seconds: float,
+        response_bytes: int,
+    ) -> None:
+        with self._lock:
+            counters = self._views.get(view)
+            if counters is None:
+                counters = self._views[view] = [0.0] * _WIDTH
+                self._statuses[view] = {}
+            counters[_REQUESTS] += 1
+            counters[_LATENCY_SUM] += seconds
+            counters[_QUERIES] += queries
+            counters[_QUERY_SECONDS] += query_seconds
+            counters[_RESPONSE_BYTES] += response_bytes
+            counters[_BUCKETS_START + bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            statuses = self._statuses[view]
+            code = str(status)
+            statuses[code] = statuses.get(code, 0) + 1
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _local_state(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "views": {view: list(counters) for view, counters in self._views.items()},
+                "statuses": {view: dict(codes) for view, codes in self._statuses.items()},
+            }
+
+    def _own_path(self) -> Path:
+        return self.directory / f"metrics-{os.getpid()}.json"
+
+    def flush(self) -> None:
+        if not self.directory:
+            return
+        self._last_flush = time.monotonic()
+        state = self._local_state()
+        handle, temporary = tempfile.mkstemp(dir=self.directory, prefix=".metrics-", suffix=".tmp")
+        with os.fdopen(handle, "w") as stream:
+            json.dump(state, stream)
+        os.replace(temporary, self._own_path())
+
+    def collect(self) -> Dict[str, object]:
+        """Totals across every process sharing the metrics directory."""
+
+        states = [self._local_state()]
+        if self.directory:
+            own_path = self._own_path()
+            for path in self.directory.glob("metrics-*.json"):
+                if path == own_path:
+                    continue
+                try:
+                    states.append(json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    continue
+
+        views: Dict[str, List[float]] = {}
+        statuses: Dict[str, Dict[str, int]] = {}
+        for state in states:
+            for view, counters in state["views"].items():
+                merged = views.setdefault(view, [0.0] * _WIDTH)
+                for index, value in enumerate(counters[:_WIDTH]):
+                    merged[index] += value
+            for view, codes in state["statuses"].items():
+                merged_codes = statuses.setdefault(view, {})
+                for code, count in codes.items():
+                    merged_codes[code] = merged_codes.get(code, 0) + count
+        return {"views": views, "statuses": statuses}
+
+    def render(self) -> str:
+        return render_prometheus(self.collect())
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render_prometheus(state: Dict[str, object]) -> str:
+    views: Dict[str, List[float]] = state["views"]
+    statuses: Dict[str, Dict[str, int]] = state["statuses"]
+    lines = [
+        "# HELP codingal_http_requests_total Requests handled, by view and status code.",
+        "# TYPE codingal_http_requests_total counter",
+    ]
+    for view in sorted(statuses):
+        for code, count in sorted(statuses[view].items()):
+            lines.append(f'codingal_http_requests_total{{view="{_label(view)}",status="{code}"}} {count}')
+
+    lines += [
+        "# HELP codingal_http_request_duration_seconds Request latency, by view.",
+        "# TYPE codingal_http_request_duration_seconds histogram",
+    ]
+    for view in sorted(views):
+        counters = views[view]
+        label = _label(view)
+        cumulative = 0.0
+        for bound, count in zip(LATENCY_BUCKETS, counters[_BUCKETS_START:]):
+            cumulative += count
+            lines.append(
+                f'codingal_http_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} '
+                f"{_number(cumulative)}"
+            )
+        lines.append(
+            f'codingal_http_request_duration_seconds_bucket{{view="{label}",le="+Inf"}} '
+            f"{_number(counters[_REQUESTS])}"
+        )
+        lines.append(
+            f'codingal_http_request_duration_seconds_sum{{view="{label}"}} {_number(counters[_LATENCY_SUM])}'
+        )
+        lines.append(
+            f'codingal_http_request_duration_seconds_count{{view="{label}"}} {_number(counters[_REQUESTS])}'
+        )
+
+    for name, index, kind, help_text in (
+        ("codingal_db_queries_total", _QUERIES, "counter", "Database queries executed, by view."),
+        ("codingal_db_query_seconds_total", _QUERY_SECONDS, "counter", "Time spent in database queries, by view."),
+        ("codingal_http_response_bytes_total", _RESPONSE_BYTES, "counter", "Response body bytes, by view."),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for view in sorted(views):
+            lines.append(f'{name}{{view="{_label(view)}"}} {_number(views[view][index])}')
+    return "\n".join(lines) + "\n"
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> MetricsRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetricsRegistry(
+                    getattr(settings, "METRICS_DIR", None) or None,
+                    getattr(settings, "METRICS_FLUSH_INTERVAL", 1.0),
+                )
+    return _registry
+
+
+class _QueryTimer:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class RequestMetricsMiddleware:
+    """Record latency, query count/time, response size and status per URL name."""
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        self.registry = get_registry()
+
+    def __call__(self, request):
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        with wrap_all_connections(timer):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        match = getattr(request, "resolver_match", None)
+        view = (match.url_name if match else None) or UNRESOLVED_VIEW
+        size = 0 if response.streaming else len(response.content)
+        self.registry.observe(view, response.status_code, elapsed, timer.count, timer.seconds, size)
+        return response
+
+
+def render_throttle_rejections(rejections: Dict[str, int]) -> str:
+    lines = [
+        "# HELP codingal_throttle_rejections_total Requests rejected by a throttle, by bucket.",
+        "# TYPE codingal_throttle_rejections_total counter",
+    ]
+    for bucket, count in sorted(rejections.items()):
+        lines.append(f'codingal_throttle_rejections_total{{bucket="{_label(bucket)}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    text = get_registry().render() + render_throttle_rejections(get_store().rejections())
+    return HttpResponse(text, content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+__all__ = [
+    "MetricsRegistry",
+    "RequestMetricsMiddleware",
+    "get_registry",
+    "metrics_view",
+    "render_prometheus",
+    "render_throttle_rejections",
+]
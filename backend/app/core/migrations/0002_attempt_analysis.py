@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttemptAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rule_version', models.CharField(max_length=20)),
+                ('issue_counts', models.JSONField(blank=True, default=dict)),
+                ('issue_total', models.PositiveIntegerField(default=0)),
+                ('analyzed_at', models.DateTimeField(auto_now=True)),
+                ('attempt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='analysis', to='core.attempt')),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analyses', to='core.lesson')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['lesson', 'rule_version'], name='core_attemp_lesson__721c8e_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_submission_similarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NightlyRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0.0)),
+                ('confidence', models.FloatField(default=0.0)),
+                ('explanation', models.TextField(blank=True)),
+                ('alternatives', models.JSONField(blank=True, default=list)),
+                ('generated_at', models.DateTimeField()),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.course')),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='nightly_recommendation', to='core.student')),
+            ],
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_completion_bits(apps, schema_editor):
+    """Build the bitmaps from the attempts already on this database, as ``rebuild_completions`` does."""
+
+    alias = schema_editor.connection.alias
+    Attempt = apps.get_model("core", "Attempt")
+    LessonCompletion = apps.get_model("core", "LessonCompletion")
+    progress = {}
+    rows = (
+        Attempt.objects.using(alias)
+        .order_by()
+        .values_list("student_id", "lesson__course_id", "lesson__order_index")
+        .distinct()
+    )
+    for student_id, course_id, order_index in rows.iterator(chunk_size=10000):
+        progress[(student_id, course_id)] = progress.get((student_id, course_id), 0) | 1 << order_index
+    LessonCompletion.objects.using(alias).bulk_create(
+        [
+            LessonCompletion(
+                student_id=student_id, course_id=course_id, bits=bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+            )
+            for (student_id, course_id), bits in progress.items()
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_nightly_recommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonCompletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bits', models.BinaryField(default=b'')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='completions', to='core.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_completions', to='core.student')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('student', 'course'), name='unique_lesson_completion')],
+            },
+        ),
+        migrations.RunPython(backfill_completion_bits, migrations.RunPython.noop),
+    ]
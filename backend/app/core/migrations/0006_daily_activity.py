@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_lesson_completion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonDailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('duration_total', models.PositiveBigIntegerField(default=0)),
+                ('correctness_total', models.FloatField(default=0.0)),
+                ('hints_total', models.PositiveIntegerField(default=0)),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to='core.lesson')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('lesson', 'day'), name='unique_lesson_daily_activity')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentDailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('duration_total', models.PositiveBigIntegerField(default=0)),
+                ('correctness_total', models.FloatField(default=0.0)),
+                ('hints_total', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_daily_activity', to='core.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to='core.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student', 'day'], name='core_studen_student_fa4a2c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'course', 'day'), name='unique_student_daily_activity')],
+            },
+        ),
+    ]
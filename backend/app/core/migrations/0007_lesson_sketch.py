@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_daily_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('duration', models.BinaryField()),
+                ('correctness', models.BinaryField()),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('lesson', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sketch', to='core.lesson')),
+            ],
+        ),
+    ]
@@ -0,0 +1,136 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:22
+
+import django.db.models.deletion
+from django.db import DEFAULT_DB_ALIAS, migrations, models
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE core_searchdocument_fts USING fts5(
+        title, body, tags_text,
+        content='core_searchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER core_searchdocument_fts_insert AFTER INSERT ON core_searchdocument BEGIN
+        INSERT INTO core_searchdocument_fts(rowid, title, body, tags_text)
+        VALUES (new.id, new.title, new.body, new.tags_text);
+    END
+    """,
+    """
+    CREATE TRIGGER core_searchdocument_fts_delete AFTER DELETE ON core_searchdocument BEGIN
+        INSERT INTO core_searchdocument_fts(core_searchdocument_fts, rowid, title, body, tags_text)
+        VALUES ('delete', old.id, old.title, old.body, old.tags_text);
+    END
+    """,
+    """
+    CREATE TRIGGER core_searchdocument_fts_update AFTER UPDATE ON core_searchdocument BEGIN
+        INSERT INTO core_searchdocument_fts(core_searchdocument_fts, rowid, title, body, tags_text)
+        VALUES ('delete', old.id, old.title, old.body, old.tags_text);
+        INSERT INTO core_searchdocument_fts(rowid, title, body, tags_text)
+        VALUES (new.id, new.title, new.body, new.tags_text);
+    END
+    """,
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS core_searchdocument_fts_update",
+    "DROP TRIGGER IF EXISTS core_searchdocument_fts_delete",
+    "DROP TRIGGER IF EXISTS core_searchdocument_fts_insert",
+    "DROP TABLE IF EXISTS core_searchdocument_fts",
+]
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE core_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(tags_text, '')), 'B')
+        || setweight(to_tsvector('simple', coalesce(body, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX core_searchdocument_vector_gin ON core_searchdocument USING GIN (search_vector)",
+    "CREATE INDEX core_searchdocument_tags_gin ON core_searchdocument USING GIN (tags jsonb_path_ops)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS core_searchdocument_tags_gin",
+    "DROP INDEX IF EXISTS core_searchdocument_vector_gin",
+    "ALTER TABLE core_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+create_full_text_index = _run({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD})
+drop_full_text_index = _run({"sqlite": SQLITE_REVERSE, "postgresql": POSTGRES_REVERSE})
+
+
+def index_catalog(apps, schema_editor):
+    """Write a search document per existing course and lesson, as ``rebuild_search_index`` does."""
+
+    alias = schema_editor.connection.alias
+    if alias != DEFAULT_DB_ALIAS:
+        return  # search documents live on ``default`` only
+    Course = apps.get_model("core", "Course")
+    Lesson = apps.get_model("core", "Lesson")
+    SearchDocument = apps.get_model("core", "SearchDocument")
+
+    def tags_text(tags):
+        return " ".join(str(tag).lower() for tag in tags or [])
+
+    course_names = {}
+    documents = []
+    for course in Course.objects.using(alias).order_by("pk").only("pk", "name", "description", "tags"):
+        course_names[course.pk] = course.name
+        documents.append(
+            SearchDocument(
+                course_id=course.pk,
+                title=course.name,
+                body=course.description,
+                tags=list(course.tags or []),
+                tags_text=tags_text(course.tags),
+            )
+        )
+    for lesson in Lesson.objects.using(alias).order_by("pk").only("pk", "course_id", "title", "tags"):
+        documents.append(
+            SearchDocument(
+                course_id=lesson.course_id,
+                lesson_id=lesson.pk,
+                title=lesson.title,
+                body=course_names[lesson.course_id],
+                tags=list(lesson.tags or []),
+                tags_text=tags_text(lesson.tags),
+            )
+        )
+    SearchDocument.objects.using(alias).bulk_create(documents, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_lesson_sketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('body', models.TextField(blank=True)),
+                ('tags', models.JSONField(blank=True, default=list)),
+                ('tags_text', models.TextField(blank=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.course')),
+                ('lesson', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.lesson')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('lesson__isnull', True)), fields=('course',), name='unique_course_search_document'), models.UniqueConstraint(condition=models.Q(('lesson__isnull', False)), fields=('lesson',), name='unique_lesson_search_document')],
+            },
+        ),
+        migrations.RunPython(create_full_text_index, drop_full_text_index),
+        # After the triggers, so the full-text index picks the documents up.
+        migrations.RunPython(index_catalog, migrations.RunPython.noop),
+    ]
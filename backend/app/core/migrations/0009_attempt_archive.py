@@ -0,0 +1,106 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_completion_totals(apps, schema_editor):
+    """Fill the new totals from the attempts on this database, adding any missing completion rows.
+
+    Nothing is archived yet, so hot attempts are the whole history, and the
+    rows match what ``rebuild_completions`` would compute.
+    """
+
+    alias = schema_editor.connection.alias
+    Attempt = apps.get_model("core", "Attempt")
+    LessonCompletion = apps.get_model("core", "LessonCompletion")
+    totals = {
+        (row["student_id"], row["lesson__course_id"]): row
+        for row in Attempt.objects.using(alias)
+        .order_by()
+        .values("student_id", "lesson__course_id")
+        .annotate(count=models.Count("pk"), hints=models.Sum("hints_used"), latest=models.Max("timestamp"))
+        .iterator(chunk_size=10000)
+    }
+    fields = ["attempts_count", "hints_total", "last_attempt_at"]
+    batch = []
+    for completion in LessonCompletion.objects.using(alias).order_by("pk").iterator(chunk_size=2000):
+        row = totals.pop((completion.student_id, completion.course_id), None)
+        if row is None:
+            continue
+        completion.attempts_count = row["count"]
+        completion.hints_total = row["hints"] or 0
+        completion.last_attempt_at = row["latest"]
+        batch.append(completion)
+        if len(batch) == 2000:
+            LessonCompletion.objects.using(alias).bulk_update(batch, fields)
+            batch = []
+    LessonCompletion.objects.using(alias).bulk_update(batch, fields)
+
+    # Attempts saved without signals (bulk loads) may have no completion row yet.
+    progress = dict.fromkeys(totals, 0)
+    rows = (
+        Attempt.objects.using(alias)
+        .order_by()
+        .values_list("student_id", "lesson__course_id", "lesson__order_index")
+        .distinct()
+    )
+    for student_id, course_id, order_index in rows.iterator(chunk_size=10000):
+        if (student_id, course_id) in progress:
+            progress[(student_id, course_id)] |= 1 << order_index
+    LessonCompletion.objects.using(alias).bulk_create(
+        [
+            LessonCompletion(
+                student_id=student_id,
+                course_id=course_id,
+                bits=bits.to_bytes((bits.bit_length() + 7) // 8, "little"),
+                attempts_count=totals[(student_id, course_id)]["count"],
+                hints_total=totals[(student_id, course_id)]["hints"] or 0,
+                last_attempt_at=totals[(student_id, course_id)]["latest"],
+            )
+            for (student_id, course_id), bits in progress.items()
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lessoncompletion',
+            name='attempts_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lessoncompletion',
+            name='hints_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lessoncompletion',
+            name='last_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='AttemptArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('attempt_count', models.PositiveIntegerField(default=0)),
+                ('first_at', models.DateTimeField()),
+                ('last_at', models.DateTimeField()),
+                ('payload', models.BinaryField()),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archive_segments', to='core.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month'], name='core_attemp_month_5f6ecd_idx'), models.Index(fields=['last_at'], name='core_attemp_last_at_c8f5c4_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'month'), name='unique_archive_segment')],
+            },
+        ),
+        migrations.RunPython(backfill_completion_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# Tag filters match case-insensitively, as they do through FTS5 on SQLite. The
+# generated column holds the lower-cased tags, and the GIN index moves to it.
+POSTGRES_FORWARD = [
+    "DROP INDEX IF EXISTS core_searchdocument_tags_gin",
+    "ALTER TABLE core_searchdocument ADD COLUMN tag_keys jsonb GENERATED ALWAYS AS (lower(tags::text)::jsonb) STORED",
+    "CREATE INDEX core_searchdocument_tag_keys_gin ON core_searchdocument USING GIN (tag_keys jsonb_path_ops)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS core_searchdocument_tag_keys_gin",
+    "ALTER TABLE core_searchdocument DROP COLUMN IF EXISTS tag_keys",
+    "CREATE INDEX core_searchdocument_tags_gin ON core_searchdocument USING GIN (tags jsonb_path_ops)",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == "postgresql":
+            for statement in statements:
+                schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_attempt_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(POSTGRES_FORWARD), _run(POSTGRES_REVERSE)),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 
+from .sharding import StudentShardQuerySet
+
 
 class Student(models.Model):
     name = models.CharField(max_length=200)
@@ -53,6 +55,8 @@ class Attempt(models.Model):
     duration_sec = models.PositiveIntegerField(default=0)
     code_snapshot = models.TextField(blank=True)
 
+    objects = StudentShardQuerySet.as_manager()
+
     class Meta:
         indexes = [
             models.Index(fields=["student", "timestamp"]),
@@ -62,3 +66,177 @@ class Attempt(models.Model):
 
     def __str__(self) -> str:
         return f"{self.student_id}:{self.lesson_id}@{self.timestamp.isoformat()}"
+
+
+class AttemptAnalysis(models.Model):
+    attempt = models.OneToOneField(Attempt, on_delete=models.CASCADE, related_name="analysis")
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="analyses")
+    rule_version = models.CharField(max_length=20)
+    issue_counts = models.JSONField(default=dict, blank=True)
+    issue_total = models.PositiveIntegerField(default=0)
+    analyzed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["lesson", "rule_version"])]
+
+    def __str__(self) -> str:
+        return f"{self.attempt_id}@v{self.rule_version}: {self.issue_total} issues"
+
+
+class SubmissionSignature(models.Model):
+    attempt = models.OneToOneField(Attempt, on_delete=models.CASCADE, related_name="signature")
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="submission_signatures")
+    minhash = models.BinaryField()
+
+    def __str__(self) -> str:
+        return f"signature for attempt {self.attempt_id}"
+
+
+class SubmissionBucket(models.Model):
+    signature = models.ForeignKey(SubmissionSignature, on_delete=models.CASCADE, related_name="buckets")
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="+")
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=["lesson", "band", "bucket"])]
+
+
+class NightlyRecommendation(models.Model):
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name="nightly_recommendation")
+    course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    score = models.FloatField(default=0.0)
+    confidence = models.FloatField(default=0.0)
+    explanation = models.TextField(blank=True)
+    alternatives = models.JSONField(default=list, blank=True)
+    generated_at = models.DateTimeField()
+
+    objects = StudentShardQuerySet.as_manager()
+
+    def __str__(self) -> str:
+        return f"{self.student_id} -> {self.course_id} ({self.generated_at.isoformat()})"
+
+
+class LessonCompletion(models.Model):
+    """A student's progress in a course: attempted lessons as a bitmap (bit ``n`` for ``order_index == n``)
+    plus running attempt and hint totals, which outlive archived attempts."""
+
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="lesson_completions")
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="completions")
+    bits = models.BinaryField(default=b"")
+    attempts_count = models.PositiveIntegerField(default=0)
+    hints_total = models.PositiveIntegerField(default=0)
+    last_attempt_at = models.DateTimeField(null=True, blank=True)
+
+    objects = StudentShardQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["student", "course"], name="unique_lesson_completion"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.student_id}:{self.course_id} {int.from_bytes(self.bits, 'little'):b}"
+
+
+class StudentDailyActivity(models.Model):
+    """One day of a student's attempts in one course; mean correctness is ``correctness_total / attempts``."""
+
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="daily_activity")
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="student_daily_activity")
+    day = models.DateField()
+    attempts = models.PositiveIntegerField(default=0)
+    duration_total = models.PositiveBigIntegerField(default=0)
+    correctness_total = models.FloatField(default=0.0)
+    hints_total = models.PositiveIntegerField(default=0)
+
+    objects = StudentShardQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["student", "course", "day"], name="unique_student_daily_activity"),
+        ]
+        indexes = [models.Index(fields=["student", "day"])]
+
+    def __str__(self) -> str:
+        return f"{self.student_id}:{self.course_id}@{self.day.isoformat()} ({self.attempts} attempts)"
+
+
+class AttemptArchiveSegment(models.Model):
+    """One student's archived attempts from one calendar month, compressed (see ``services/archive.py``)."""
+
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="archive_segments")
+    month = models.DateField()
+    attempt_count = models.PositiveIntegerField(default=0)
+    first_at = models.DateTimeField()
+    last_at = models.DateTimeField()
+    payload = models.BinaryField()
+
+    objects = StudentShardQuerySet.as_manager()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["student", "month"], name="unique_archive_segment")]
+        indexes = [models.Index(fields=["month"]), models.Index(fields=["last_at"])]
+
+    def __str__(self) -> str:
+        return f"{self.student_id}@{self.month:%Y-%m} ({self.attempt_count} attempts)"
+
+
+class LessonDailyActivity(models.Model):
+    """One day of attempts on one lesson, across all students."""
+
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="daily_activity")
+    day = models.DateField()
+    attempts = models.PositiveIntegerField(default=0)
+    duration_total = models.PositiveBigIntegerField(default=0)
+    correctness_total = models.FloatField(default=0.0)
+    hints_total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["lesson", "day"], name="unique_lesson_daily_activity")]
+
+    def __str__(self) -> str:
+        return f"{self.lesson_id}@{self.day.isoformat()} ({self.attempts} attempts)"
+
+
+class LessonSketch(models.Model):
+    """Serialized KLL sketches of one lesson's attempt durations and correctness."""
+
+    lesson = models.OneToOneField(Lesson, on_delete=models.CASCADE, related_name="sketch")
+    duration = models.BinaryField()
+    correctness = models.BinaryField()
+    # Bumped on every write; updates only apply to the version they read.
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"sketch for lesson {self.lesson_id} (v{self.version})"
+
+
+class SearchDocument(models.Model):
+    """Searchable text for one course (``lesson`` is null) or one lesson.
+
+    The full-text index over these rows is database specific and created by
+    migration 0008: an FTS5 table on SQLite, a ``tsvector`` column with a GIN
+    index on PostgreSQL. On PostgreSQL, migration 0010 adds ``tag_keys``, the
+    lower-cased tags, for tag filters.
+    """
+
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="+")
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    title = models.CharField(max_length=200)
+    body = models.TextField(blank=True)
+    tags = models.JSONField(default=list, blank=True)
+    tags_text = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["course"], condition=models.Q(lesson__isnull=True), name="unique_course_search_document"
+            ),
+            models.UniqueConstraint(
+                fields=["lesson"], condition=models.Q(lesson__isnull=False), name="unique_lesson_search_document"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return self.title
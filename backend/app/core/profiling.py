@@ -0,0 +1,122 @@
+"""Named stage timing and opt-in cProfile capture for views.
+
+Views decorated with :func:`profiled_view` can wrap their phases in
+``with stage(request, "load"):``. When profiling is off, ``stage`` returns a
+shared no-op context manager, so the only cost is one attribute lookup per
+stage. Profiling is on for a request when any of these holds:
+
+* ``PROFILING_SERVER_TIMING`` is true: stage durations are reported in a
+  ``Server-Timing`` response header;
+* the request carries ``X-Profile: 1`` and ``PROFILING_ALLOW_HEADER`` is true:
+  Server-Timing plus a cProfile dump;
+* a random draw falls under ``PROFILING_SAMPLE_RATE``: a cProfile dump only.
+
+Dumps are written to ``PROFILING_DIR`` as ``<url name>-<timestamp>-<pid>.prof``
+and can be inspected with ``python -m pstats`` or snakeviz.
+"""
+from __future__ import annotations
+
+import cProfile
+import os
+import random
+import time
+from contextlib import nullcontext
+from functools import wraps
+from pathlib import Path
+from typing import List, Tuple
+
+from django.conf import settings
+
+_NULL_STAGE = nullcontext()
+_PROFILE_HEADER = "HTTP_X_PROFILE"
+
+
+class _Stage:
+    __slots__ = ("_timer", "_name", "_started")
+
+    def __init__(self, timer: "StageTimer", name: str) -> None:
+        self._timer = timer
+        self._name = name
+
+    def __enter__(self) -> None:
+        self._started = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self._timer.stages.append((self._name, time.perf_counter() - self._started))
+
+
+class StageTimer:
+    """Collects ``(stage, seconds)`` pairs for one request."""
+
+    def __init__(self) -> None:
+        self.stages: List[Tuple[str, float]] = []
+
+    def stage(self, name: str) -> _Stage:
+        return _Stage(self, name)
+
+    def server_timing(self) -> str:
+        totals = {}
+        for name, seconds in self.stages:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return ", ".join(f"{name};dur={seconds * 1000.0:.3f}" for name, seconds in totals.items())
+
+
+class _NullTimer:
+    def stage(self, name: str):
+        return _NULL_STAGE
+
+
+NULL_TIMER = _NullTimer()
+
+
+def stage(request, name: str):
+    """Context manager timing ``name`` for ``request``; free when profiling is off."""
+
+    return getattr(request, "stage_timer", NULL_TIMER).stage(name)
+
+
+def _dump_profile(profile: cProfile.Profile, view_name: str) -> None:
+    directory = Path(getattr(settings, "PROFILING_DIR", "profiles"))
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    profile.dump_stats(str(directory / f"{view_name}-{stamp}-{os.getpid()}.prof"))
+
+
+def profiled_view(view):
+    """Enable stage timing, Server-Timing and sampled cProfile capture for ``view``."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        requested = (
+            request.META.get(_PROFILE_HEADER) == "1"
+            and getattr(settings, "PROFILING_ALLOW_HEADER", False)
+        )
+        report_timing = requested or getattr(settings, "PROFILING_SERVER_TIMING", False)
+        sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+        capture = requested or (sample_rate > 0 and random.random() < sample_rate)
+        if not report_timing and not capture:
+            return view(request, *args, **kwargs)
+
+        timer = StageTimer()
+        request.stage_timer = timer
+        profile = cProfile.Profile() if capture else None
+        if profile:
+            profile.enable()
+        try:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, "render") and not getattr(response, "is_rendered", True):
+                with timer.stage("render"):
+                    response.render()
+        finally:
+            if profile:
+                profile.disable()
+                match = getattr(request, "resolver_match", None)
+                _dump_profile(profile, (match.url_name if match else None) or view.__name__)
+        if report_timing and timer.stages:
+            response["Server-Timing"] = timer.server_timing()
+        return response
+
+    return wrapper
+
+
+__all__ = ["NULL_TIMER", "StageTimer", "profiled_view", "stage"]
@@ -0,0 +1,154 @@
+"""Guards against query-count regressions and N+1 access patterns.
+
+``query_budget`` asserts that a block or function stays within a maximum
+number of queries::
+
+    with query_budget(4):
+        client.get(url)
+
+    @query_budget(2)
+    def load_dashboard(): ...
+
+``RepeatedQueryMiddleware`` is a DEBUG-only companion. It groups the queries
+of each request by SQL shape, with literals and ``IN`` lists collapsed, and
+logs every shape that repeats at least ``QUERY_REPEAT_THRESHOLD`` times,
+together with the application frame that issued it. A repeat like that is
+the signature of a missing ``select_related``/``prefetch_related``.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import traceback
+from contextlib import ContextDecorator, ExitStack, contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+logger = logging.getLogger("core.queries")
+
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?|[-\w.']+)\s*,?)+\)", re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LIBRARY_MARKERS = ("/django/", "/rest_framework/", "/site-packages/", "/querybudget.py")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block issues more queries than its budget allows."""
+
+
+class query_budget(ContextDecorator):
+    """Fail if the wrapped block runs more than ``max_queries`` queries on ``using``."""
+
+    def __init__(self, max_queries: int, using: str = DEFAULT_DB_ALIAS) -> None:
+        self.max_queries = max_queries
+        self.using = using
+        self._context: Optional[CaptureQueriesContext] = None
+
+    @property
+    def captured_queries(self) -> List[Dict[str, str]]:
+        return self._context.captured_queries if self._context else []
+
+    def __enter__(self) -> "query_budget":
+        self._context = CaptureQueriesContext(connections[self.using])
+        self._context.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb) -> None:
+        self._context.__exit__(exc_type, exc_value, tb)
+        if exc_type is not None:
+            return
+        executed = len(self._context.captured_queries)
+        if executed > self.max_queries:
+            listing = "\n".join(
+                f"{index}. {query['sql']}" for index, query in enumerate(self._context.captured_queries, 1)
+            )
+            raise QueryBudgetExceeded(
+                f"{executed} queries executed, budget is {self.max_queries}:\n{listing}"
+            )
+
+
+@contextmanager
+def wrap_all_connections(wrapper) -> Iterator[None]:
+    """Install ``wrapper`` as an ``execute_wrapper`` on every configured alias for the block.
+
+    Replica and shard queries count alongside ``default`` ones.
+    """
+
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield
+
+
+def sql_shape(sql: str) -> str:
+    """Normalize ``sql`` so queries differing only in literal values compare equal."""
+
+    shape = _IN_LIST.sub("IN (...)", sql)
+    shape = _STRING.sub("?", shape)
+    return _NUMBER.sub("?", shape)
+
+
+def _application_origin() -> str:
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        if not any(marker in frame.filename for marker in _LIBRARY_MARKERS):
+            return f"{frame.filename}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+
+class RepeatedQueryDetector:
+    """``execute_wrapper`` that counts SQL shapes and remembers where repeats came from."""
+
+    def __init__(self, threshold: int) -> None:
+        self.threshold = threshold
+        self.counts: Dict[str, int] = {}
+        self.origins: Dict[str, str] = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = sql_shape(sql)
+        count = self.counts.get(shape, 0) + 1
+        self.counts[shape] = count
+        if count == 2:
+            self.origins[shape] = _application_origin()
+        return execute(sql, params, many, context)
+
+    def repeated(self) -> Dict[str, int]:
+        return {shape: count for shape, count in self.counts.items() if count >= self.threshold}
+
+
+class RepeatedQueryMiddleware:
+    """Log repeated identical query shapes per request when ``DEBUG`` is on."""
+
+    def __init__(self, get_response) -> None:
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, "QUERY_REPEAT_THRESHOLD", 5)
+
+    def __call__(self, request):
+        detector = RepeatedQueryDetector(self.threshold)
+        with wrap_all_connections(detector):
+            response = self.get_response(request)
+        for shape, count in detector.repeated().items():
+            logger.warning(
+                "Possible N+1: %d identical queries during %s %s from %s: %s",
+                count,
+                request.method,
+                request.path,
+                detector.origins.get(shape, "unknown"),
+                shape,
+            )
+        return response
+
+
+__all__ = [
+    "QueryBudgetExceeded",
+    "RepeatedQueryDetector",
+    "RepeatedQueryMiddleware",
+    "query_budget",
+    "sql_shape",
+    "wrap_all_connections",
+]
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import posixpath
+import zipfile
 from datetime import timedelta
 
 from django.utils import timezone
 from rest_framework import serializers
 
 from .models import Attempt, Course, Lesson
+from .services.completion import MAX_ORDER_INDEX, parse_order_ranges
+from .services.search import search_terms
 
 
 class LessonSerializer(serializers.ModelSerializer):
@@ -65,3 +69,179 @@ class AttemptCreateSerializer(serializers.ModelSerializer):
 
 class CodeAnalysisSerializer(serializers.Serializer):
     code = serializers.CharField(max_length=20_000, allow_blank=False)
+
+
+MAX_PROJECT_FILES = 200
+MAX_PROJECT_FILE_CHARS = 50_000
+MAX_PROJECT_TOTAL_CHARS = 1_000_000
+
+
+def _clean_project_path(path: str) -> str:
+    normalized = posixpath.normpath(path.replace("\\", "/"))
+    if normalized.startswith(("/", "../")) or normalized in {".", ".."}:
+        raise serializers.ValidationError(f'Invalid file path "{path}".')
+    return normalized
+
+
+class ProjectAnalysisSerializer(serializers.Serializer):
+    """Accepts either a JSON ``files`` map of path to source or a zip ``archive``."""
+
+    files = serializers.DictField(
+        child=serializers.CharField(
+            max_length=MAX_PROJECT_FILE_CHARS, allow_blank=True, trim_whitespace=False
+        ),
+        required=False,
+    )
+    archive = serializers.FileField(required=False)
+
+    def validate_archive(self, value):
+        try:
+            archive = zipfile.ZipFile(value)
+        except zipfile.BadZipFile as exc:
+            raise serializers.ValidationError("Archive is not a valid zip file.") from exc
+        files = {}
+        with archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.endswith(".py"):
+                    continue
+                if info.filename.startswith("__MACOSX/"):
+                    continue
+                if info.file_size > MAX_PROJECT_FILE_CHARS * 4:
+                    raise serializers.ValidationError(f'"{info.filename}" is too large.')
+                try:
+                    source = archive.read(info).decode("utf-8")
+                except UnicodeDecodeError as exc:
+                    raise serializers.ValidationError(
+                        f'"{info.filename}" is not UTF-8 encoded.'
+                    ) from exc
+                if len(source) > MAX_PROJECT_FILE_CHARS:
+                    raise serializers.ValidationError(f'"{info.filename}" is too large.')
+                files[info.filename] = source
+                if len(files) > MAX_PROJECT_FILES:
+                    break
+        return files
+
+    def validate(self, attrs):
+        files = attrs.get("files")
+        archived = attrs.get("archive")
+        if (files is None) == (archived is None):
+            raise serializers.ValidationError("Provide exactly one of \"files\" or \"archive\".")
+        files = files if files is not None else archived
+        if not files:
+            raise serializers.ValidationError("The project does not contain any Python files.")
+        if len(files) > MAX_PROJECT_FILES:
+            raise serializers.ValidationError(f"Projects are limited to {MAX_PROJECT_FILES} files.")
+        if sum(len(source) for source in files.values()) > MAX_PROJECT_TOTAL_CHARS:
+            raise serializers.ValidationError("The project is too large to analyze.")
+        cleaned = {}
+        for path, source in files.items():
+            normalized = _clean_project_path(path)
+            if normalized in cleaned:
+                raise serializers.ValidationError(f'More than one file has the path "{normalized}".')
+            cleaned[normalized] = source
+        return {"files": cleaned}
+
+
+class SimilarSubmissionsQuerySerializer(serializers.Serializer):
+    attempt = serializers.IntegerField(required=False, min_value=1)
+    threshold = serializers.FloatField(required=False, default=0.8, min_value=0.0, max_value=1.0)
+    limit = serializers.IntegerField(required=False, default=20, min_value=1, max_value=100)
+
+
+class CourseCandidatesQuerySerializer(serializers.Serializer):
+    limit = serializers.IntegerField(required=False, default=20, min_value=1, max_value=500)
+
+
+class CourseCohortQuerySerializer(serializers.Serializer):
+    """Lesson sets are ``order_index`` lists and ranges, e.g. ``completed=1-5&missing=6``.
+
+    Indexes may not exceed the course's last lesson, passed as the
+    ``highest_order_index`` context value, nor ``MAX_ORDER_INDEX``.
+    """
+
+    completed = serializers.CharField(required=False, default="", allow_blank=True, max_length=500)
+    missing = serializers.CharField(required=False, default="", allow_blank=True, max_length=500)
+    limit = serializers.IntegerField(required=False, default=100, min_value=1, max_value=1000)
+
+    def _lessons(self, value: str):
+        try:
+            highest = min(self.context.get("highest_order_index", MAX_ORDER_INDEX), MAX_ORDER_INDEX)
+            return parse_order_ranges(value, highest=highest)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc)) from exc
+
+    def validate_completed(self, value: str):
+        return self._lessons(value)
+
+    def validate_missing(self, value: str):
+        return self._lessons(value)
+
+    def validate(self, attrs):
+        if attrs["completed"] & attrs["missing"]:
+            raise serializers.ValidationError("A lesson cannot be both completed and missing.")
+        return attrs
+
+
+MAX_TIMELINE_DAYS = 366
+
+
+class StudentTimelineQuerySerializer(serializers.Serializer):
+    """``from``/``to`` dates, inclusive; defaults to the last 30 days.
+
+    ``from`` is a Python keyword, so the fields are declared in ``get_fields``.
+    """
+
+    def get_fields(self):
+        return {
+            "from": serializers.DateField(required=False),
+            "to": serializers.DateField(required=False),
+            "course": serializers.IntegerField(required=False, min_value=1),
+        }
+
+    def validate(self, attrs):
+        end = attrs.get("to") or timezone.localdate()
+        start = attrs.get("from") or end - timedelta(days=29)
+        if start > end:
+            raise serializers.ValidationError('"from" must not be after "to".')
+        if (end - start).days >= MAX_TIMELINE_DAYS:
+            raise serializers.ValidationError(f"Timelines are limited to {MAX_TIMELINE_DAYS} days.")
+        return {**attrs, "from": start, "to": end}
+
+
+class AttemptListQuerySerializer(serializers.Serializer):
+    """Newest attempts, optionally for one ``student`` and older than ``before``; ``archived=1`` adds the archive."""
+
+    student = serializers.IntegerField(required=False, min_value=1)
+    before = serializers.DateTimeField(required=False)
+    archived = serializers.BooleanField(required=False, default=False)
+
+
+class AttemptExportQuerySerializer(serializers.Serializer):
+    """``from`` (inclusive) and ``to`` (exclusive) timestamps; archived attempts are included unless ``archived=0``."""
+
+    def get_fields(self):
+        return {
+            "student": serializers.IntegerField(required=False, min_value=1),
+            "from": serializers.DateTimeField(required=False),
+            "to": serializers.DateTimeField(required=False),
+            "archived": serializers.BooleanField(required=False, default=True),
+            "code": serializers.BooleanField(required=False, default=False),
+        }
+
+    def validate(self, attrs):
+        if attrs.get("from") and attrs.get("to") and attrs["from"] >= attrs["to"]:
+            raise serializers.ValidationError('"from" must be before "to".')
+        return attrs
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    """``q`` terms all match, as prefixes; each ``tag`` (repeatable) must be on the result."""
+
+    q = serializers.CharField(max_length=200)
+    tag = serializers.ListField(child=serializers.CharField(max_length=50), required=False, default=list, max_length=5)
+    limit = serializers.IntegerField(required=False, default=20, min_value=1, max_value=100)
+
+    def validate_q(self, value: str) -> str:
+        if not search_terms(value):
+            raise serializers.ValidationError("Enter at least one word to search for.")
+        return value
@@ -0,0 +1,334 @@
+"""Hot/cold split of attempt history.
+
+``Attempt`` (the hot table) keeps recent attempts only. ``archive_attempts``
+moves attempts older than a cutoff into :class:`AttemptArchiveSegment` rows:
+one per student and calendar month, holding that month's attempts as
+zlib-compressed columns. The hot table, its indexes and every per-student
+prefetch then stay bounded by the hot window rather than by all history.
+
+Nothing that needs all of history reads the hot table alone:
+
+* progress, attempt counts, hint totals and last activity are running totals
+  on ``LessonCompletion``, updated as attempts arrive, so archiving leaves them
+  as they were (its deletes run under :func:`moving_attempts`);
+* daily rollups and lesson sketches are never recomputed on archival, and their
+  rebuilds read the archive too;
+* the attempt listing (``?archived=1``), the export endpoint and the replay read
+  both, merged in time order by :func:`iter_attempt_records`.
+
+Archived attempts keep their ids. Their code-analysis and similarity-index
+rows are dropped with the hot row, so similar-submission search covers the
+hot window only.
+
+Segment payload, before compression, little-endian::
+
+    header      _HEADER: format version, attempt count
+    columns     count x int64 ids, int64 lesson ids, int64 epoch microseconds,
+                float64 correctness, uint32 hints, uint32 durations,
+                uint32 code snapshot byte lengths
+    snapshots   the UTF-8 code snapshots, back to back
+
+Rows are in ``(timestamp, id)`` order.
+"""
+from __future__ import annotations
+
+import heapq
+import struct
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from itertools import groupby
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Attempt, AttemptArchiveSegment
+from ..sharding import across_shards, shard_aliases
+
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<BI")
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+_moving: ContextVar[bool] = ContextVar("core_moving_attempts", default=False)
+
+
+class AttemptRecord(NamedTuple):
+    """An attempt from either table, with the same fields as ``Attempt``."""
+
+    id: int
+    student_id: int
+    lesson_id: int
+    timestamp: datetime
+    correctness: float
+    hints_used: int
+    duration_sec: int
+    code_snapshot: str
+
+    @property
+    def sort_key(self) -> Tuple[datetime, int]:
+        return self.timestamp, self.id
+
+
+RECORD_FIELDS = AttemptRecord._fields
+
+
+def month_of(timestamp: datetime) -> date:
+    """First day of ``timestamp``'s month in the project time zone."""
+
+    return timezone.localtime(timestamp).date().replace(day=1)
+
+
+def encode_segment(records: Sequence[AttemptRecord]) -> bytes:
+    records = sorted(records, key=lambda record: record.sort_key)
+    count = len(records)
+    snapshots = [record.code_snapshot.encode() for record in records]
+    parts = [
+        _HEADER.pack(FORMAT_VERSION, count),
+        struct.pack(f"<{count}q", *(record.id for record in records)),
+        struct.pack(f"<{count}q", *(record.lesson_id for record in records)),
+        struct.pack(f"<{count}q", *((record.timestamp - _EPOCH) // _MICROSECOND for record in records)),
+        struct.pack(f"<{count}d", *(record.correctness for record in records)),
+        struct.pack(f"<{count}I", *(record.hints_used for record in records)),
+        struct.pack(f"<{count}I", *(record.duration_sec for record in records)),
+        struct.pack(f"<{count}I", *map(len, snapshots)),
+        *snapshots,
+    ]
+    return zlib.compress(b"".join(parts), 6)
+
+
+def decode_segment(student_id: int, payload) -> List[AttemptRecord]:
+    data = zlib.decompress(bytes(payload))
+    version, count = _HEADER.unpack_from(data)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported archive segment version {version}.")
+    offset = _HEADER.size
+    columns = []
+    for code in "qqqdIII":
+        column = struct.unpack_from(f"<{count}{code}", data, offset)
+        offset += struct.calcsize(f"<{count}{code}")
+        columns.append(column)
+    ids, lessons, micros, correctness, hints, durations, lengths = columns
+    records = []
+    for index in range(count):
+        end = offset + lengths[index]
+        records.append(
+            AttemptRecord(
+                ids[index],
+                student_id,
+                lessons[index],
+                _EPOCH + micros[index] * _MICROSECOND,
+                correctness[index],
+                hints[index],
+                durations[index],
+                data[offset:end].decode(),
+            )
+        )
+        offset = end
+    return records
+
+
+def _segments(student_id: Optional[int] = None, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """Per-shard segment querysets overlapping ``[start, end)``."""
+
+    segments = AttemptArchiveSegment.objects.all()
+    if student_id is not None:
+        segments = AttemptArchiveSegment.objects.for_student(student_id)
+    if start is not None:
+        segments = segments.filter(last_at__gte=start)
+    if end is not None:
+        segments = segments.filter(first_at__lt=end)
+    return [segments] if student_id is not None else across_shards(segments)
+
+
+def _in_range(record: AttemptRecord, start: Optional[datetime], end: Optional[datetime]) -> bool:
+    return (start is None or record.timestamp >= start) and (end is None or record.timestamp < end)
+
+
+def iter_archived_records(segments, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """Records of one shard's segments, in no particular order across segments."""
+
+    rows = segments.values_list("student_id", "payload")
+    for student_id, payload in rows.iterator(chunk_size=200):
+        for record in decode_segment(student_id, payload):
+            if _in_range(record, start, end):
+                yield record
+
+
+def _ordered_archive(segments, start: Optional[datetime], end: Optional[datetime]) -> Iterator[AttemptRecord]:
+    # One month of segments at a time: every attempt of a month sorts before the next month's.
+    rows = segments.order_by("month").values_list("month", "student_id", "payload")
+    for _, month_rows in groupby(rows.iterator(chunk_size=200), key=lambda row: row[0]):
+        records = [
+            record
+            for _, student_id, payload in month_rows
+            for record in decode_segment(student_id, payload)
+            if _in_range(record, start, end)
+        ]
+        records.sort(key=lambda record: record.sort_key)
+        yield from records
+
+
+def _ordered_hot(attempts, with_code: bool, chunk_size: int) -> Iterator[AttemptRecord]:
+    fields = RECORD_FIELDS if with_code else RECORD_FIELDS[:-1]
+    for row in attempts.order_by("timestamp", "pk").values_list(*fields).iterator(chunk_size=chunk_size):
+        yield AttemptRecord(*row) if with_code else AttemptRecord(*row, "")
+
+
+def iter_attempt_records(
+    *,
+    student_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    include_archived: bool = True,
+    with_code: bool = True,
+    chunk_size: int = 5000,
+) -> Iterator[AttemptRecord]:
+    """Attempts from ``start`` (inclusive) to ``end`` (exclusive), hot and archived, oldest first.
+
+    Every shard's hot rows and segments are merged by ``(timestamp, id)``.
+    Memory holds one month of one shard's archive at a time. Without
+    ``with_code``, ``code_snapshot`` is left blank and not read from the hot
+    table.
+    """
+
+    attempts = Attempt.objects.all() if student_id is None else Attempt.objects.for_student(student_id)
+    if start is not None:
+        attempts = attempts.filter(timestamp__gte=start)
+    if end is not None:
+        attempts = attempts.filter(timestamp__lt=end)
+    shards = [attempts] if student_id is not None else across_shards(attempts)
+    streams = [_ordered_hot(shard, with_code, chunk_size) for shard in shards]
+    if include_archived:
+        streams += [_ordered_archive(segments, start, end) for segments in _segments(student_id, start, end)]
+    if len(streams) == 1:
+        return streams[0]
+    return heapq.merge(*streams, key=lambda record: record.sort_key)
+
+
+def latest_archived_records(
+    limit: int, *, student_id: Optional[int] = None, before: Optional[datetime] = None
+) -> List[AttemptRecord]:
+    """The ``limit`` newest archived attempts (older than ``before``), newest first.
+
+    Segments are read newest first and reading stops once no remaining
+    segment can hold a newer attempt than the ones kept.
+    """
+
+    kept: List[Tuple[Tuple[datetime, int], AttemptRecord]] = []
+    for segments in _segments(student_id, end=before):
+        for segment in segments.order_by("-last_at").only("student_id", "last_at", "payload").iterator(chunk_size=20):
+            if len(kept) == limit and segment.last_at < kept[0][0][0]:
+                break
+            for record in decode_segment(segment.student_id, segment.payload):
+                if before is not None and record.timestamp >= before:
+                    continue
+                if len(kept) < limit:
+                    heapq.heappush(kept, (record.sort_key, record))
+                elif record.sort_key > kept[0][0]:
+                    heapq.heapreplace(kept, (record.sort_key, record))
+    return [record for _, record in sorted(kept, key=lambda item: item[0], reverse=True)]
+
+
+def _archive_batch(alias: str, student_ids: List[int], before: datetime, batch_size: int) -> Tuple[int, int]:
+    attempts = Attempt.objects.on_shard(alias).filter(student_id__in=student_ids, timestamp__lt=before)
+    records = [AttemptRecord(*row) for row in attempts.order_by("student_id", "timestamp", "pk").values_list(*RECORD_FIELDS)]
+    if not records:
+        return 0, 0
+    grouped: Dict[Tuple[int, date], List[AttemptRecord]] = {}
+    for record in records:
+        grouped.setdefault((record.student_id, month_of(record.timestamp)), []).append(record)
+
+    segments = AttemptArchiveSegment.objects.on_shard(alias)
+    existing = {
+        (segment.student_id, segment.month): segment
+        for segment in segments.filter(student_id__in=student_ids, month__in={month for _, month in grouped})
+    }
+    created, updated = [], []
+    for (student_id, month), month_records in grouped.items():
+        segment = existing.get((student_id, month))
+        if segment is not None:
+            archived = {record.id: record for record in decode_segment(student_id, segment.payload)}
+            archived.update((record.id, record) for record in month_records)
+            month_records = list(archived.values())
+            updated.append(segment)
+        else:
+            segment = AttemptArchiveSegment(student_id=student_id, month=month)
+            created.append(segment)
+        month_records.sort(key=lambda record: record.sort_key)
+        segment.attempt_count = len(month_records)
+        segment.first_at = month_records[0].timestamp
+        segment.last_at = month_records[-1].timestamp
+        segment.payload = encode_segment(month_records)
+    segments.bulk_create(created, batch_size=batch_size)
+    segments.bulk_update(updated, ["attempt_count", "first_at", "last_at", "payload"], batch_size=batch_size)
+
+    ids = [record.id for record in records]
+    with moving_attempts():
+        for offset in range(0, len(ids), batch_size):
+            # Cascades to the attempts' analysis and similarity-index rows.
+            Attempt.objects.on_shard(alias).filter(pk__in=ids[offset : offset + batch_size]).delete()
+    return len(records), len(created)
+
+
+@contextmanager
+def moving_attempts():
+    """Mark attempts deleted in the block as moved elsewhere, not removed from history.
+
+    Completion totals are left as they are for these deletes, instead of
+    being rebuilt (see :func:`~core.services.completion.schedule_rebuild`).
+    """
+
+    token = _moving.set(True)
+    try:
+        yield
+    finally:
+        _moving.reset(token)
+
+
+def attempts_moving() -> bool:
+    return _moving.get()
+
+
+def archive_attempts(before: datetime, *, batch_size: int = 500) -> Dict[str, int]:
+    """Move attempts with ``timestamp < before`` into archive segments; returns attempts and new segments.
+
+    Each batch of students is archived in one transaction on its shard, so an
+    attempt is always in exactly one of the two tables.
+    """
+
+    moved = {"attempts": 0, "segments": 0}
+    for alias in shard_aliases():
+        old = Attempt.objects.on_shard(alias).filter(timestamp__lt=before).order_by("student_id")
+        student_ids = list(old.values_list("student_id", flat=True).distinct())
+        for offset in range(0, len(student_ids), batch_size):
+            with transaction.atomic(using=old.db):
+                attempts, segments = _archive_batch(alias, student_ids[offset : offset + batch_size], before, batch_size)
+            moved["attempts"] += attempts
+            moved["segments"] += segments
+    return moved
+
+
+def hot_cutoff(days: int, now: Optional[datetime] = None) -> datetime:
+    """Start of the hot window: midnight, ``days`` days before ``now``, in the project time zone."""
+
+    today = timezone.localtime(now or timezone.now()).date()
+    return timezone.make_aware(datetime.combine(today - timedelta(days=days), datetime.min.time()))
+
+
+__all__ = [
+    "AttemptRecord",
+    "RECORD_FIELDS",
+    "archive_attempts",
+    "attempts_moving",
+    "decode_segment",
+    "encode_segment",
+    "hot_cutoff",
+    "iter_archived_records",
+    "iter_attempt_records",
+    "latest_archived_records",
+    "month_of",
+    "moving_attempts",
+]
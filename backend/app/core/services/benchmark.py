@@ -0,0 +1,132 @@
+"""Measurement helpers for the API hot-path benchmark suite.
+
+Each case is timed over several iterations for wall time, then run once under
+``CaptureQueriesContext`` for its query count and once under ``tracemalloc``
+for peak Python memory, so the instrumentation does not skew the timings.
+"""
+from __future__ import annotations
+
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Metrics compared against a baseline; query counts are exact so any increase
+# is reported, the noisier metrics only beyond the relative threshold.
+COMPARED_METRICS = ("wall_ms_p50", "queries", "peak_memory_kb")
+EXACT_METRICS = ("queries",)
+
+
+@dataclass(frozen=True)
+class BenchmarkCase:
+    name: str
+    run: Callable[[], object]
+    # Number of operations performed by one ``run`` call (for micro-benchmarks
+    # that batch many cheap calls); timings are reported per operation.
+    operations: int = 1
+
+
+@dataclass(frozen=True)
+class CaseResult:
+    name: str
+    iterations: int
+    wall_ms_mean: float
+    wall_ms_p50: float
+    wall_ms_p95: float
+    queries: int
+    peak_memory_kb: float
+
+    def as_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class Regression:
+    case: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        if not self.baseline:
+            return float("inf")
+        return self.current / self.baseline - 1.0
+
+    def __str__(self) -> str:
+        change = "new" if self.change == float("inf") else f"{self.change:+.1%}"
+        return f"{self.case}.{self.metric}: {self.baseline:g} -> {self.current:g} ({change})"
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(case: BenchmarkCase, *, repeat: int = 20, warmup: int = 2) -> CaseResult:
+    for _ in range(warmup):
+        case.run()
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        case.run()
+        samples.append((time.perf_counter() - started) * 1000.0 / case.operations)
+
+    with CaptureQueriesContext(connection) as captured:
+        case.run()
+    queries = len(captured.captured_queries)
+
+    tracemalloc.start()
+    try:
+        case.run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return CaseResult(
+        name=case.name,
+        iterations=repeat,
+        wall_ms_mean=round(statistics.fmean(samples), 4),
+        wall_ms_p50=round(_percentile(samples, 0.5), 4),
+        wall_ms_p95=round(_percentile(samples, 0.95), 4),
+        queries=queries,
+        peak_memory_kb=round(peak / 1024.0, 1),
+    )
+
+
+def compare(
+    current: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    *,
+    threshold: float = 0.2,
+    metrics=COMPARED_METRICS,
+) -> List[Regression]:
+    """Metrics of cases present in both runs that got worse than the baseline allows."""
+
+    regressions = []
+    for name, result in sorted(current.items()):
+        reference: Optional[Dict[str, float]] = baseline.get(name)
+        if reference is None:
+            continue
+        for metric in metrics:
+            if metric not in result or metric not in reference:
+                continue
+            allowed = reference[metric] if metric in EXACT_METRICS else reference[metric] * (1.0 + threshold)
+            if result[metric] > allowed:
+                regressions.append(Regression(name, metric, reference[metric], result[metric]))
+    return regressions
+
+
+__all__ = [
+    "BenchmarkCase",
+    "CaseResult",
+    "Regression",
+    "compare",
+    "measure",
+]
@@ -0,0 +1,197 @@
+"""Reverse recommendation: which students most need a given course.
+
+The per-student recommender scores every course for one student. This module
+scores one course for every student, using the same four features and
+``FEATURES`` weights. It runs a fixed number of queries, whatever the number
+of students:
+
+* the course's lesson-completion rows, giving completed lessons, attempts,
+  hints and last activity per student who has started the course;
+* one chunked stream of ``(id, weak_tags)`` over all students.
+
+Students are scored a chunk at a time and only the best ``limit`` are kept,
+in a min-heap. Memory is O(chunk + limit + students who started the course).
+With NumPy installed, each chunk is scored as arrays; otherwise a plain
+Python loop applies the ``FEATURES`` normalizers. Both give the same scores.
+"""
+from __future__ import annotations
+
+import heapq
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.utils import timezone
+
+from ..models import Course, LessonCompletion, Student
+from ..sharding import across_shards
+from .completion import decode_bits, lesson_mask
+from .recommender import FEATURES
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised where NumPy is absent
+    np = None
+
+# Recency assumed for a course without activity, as in the per-student view.
+UNTOUCHED_RECENCY_DAYS = 30.0
+CHUNK_SIZE = 5000
+
+_WEIGHTS = {feature.key: feature.weight for feature in FEATURES}
+_NORMALIZERS = {feature.key: feature.normalizer for feature in FEATURES}
+
+
+@dataclass(frozen=True)
+class CandidateFeatures:
+    student_id: int
+    progress_percent: float
+    recency_gap_days: float
+    tag_alignment: float
+    hint_rate: float
+
+    def as_inputs(self) -> Dict[str, float]:
+        return {
+            "progress_percent": self.progress_percent,
+            "recency_gap_days": self.recency_gap_days,
+            "tag_alignment": self.tag_alignment,
+            "hint_rate": self.hint_rate,
+        }
+
+
+def _course_progress(course_id: int, mask: int) -> Dict[int, Tuple[int, int, int, datetime]]:
+    """``student_id -> (lessons completed, attempts, hints, last attempt)`` for one course.
+
+    Read from the lesson-completion totals, which cover archived attempts too.
+    ``mask`` holds the course's current lessons.
+    """
+
+    rows = LessonCompletion.objects.filter(course_id=course_id).values_list(
+        "student_id", "bits", "attempts_count", "hints_total", "last_attempt_at"
+    )
+    # A student's row lives on one shard, so per-shard results never overlap.
+    return {
+        student_id: ((decode_bits(value) & mask).bit_count(), attempts, hints, latest)
+        for shard in across_shards(rows)
+        for student_id, value, attempts, hints, latest in shard
+        if attempts
+    }
+
+
+def _chunk_columns(
+    chunk: Sequence[Tuple[int, Optional[List[str]]]],
+    progress: Dict[int, Tuple[int, int, int, datetime]],
+    course_tags: frozenset,
+    lessons_total: int,
+    now: datetime,
+) -> Tuple[List[int], Dict[str, List[float]]]:
+    """Student ids and raw feature columns, keyed like ``FEATURES``."""
+
+    student_ids = []
+    progress_column, recency_column, alignment_column, hint_column = [], [], [], []
+    for student_id, weak_tags in chunk:
+        focus = set(weak_tags or [])
+        student_ids.append(student_id)
+        alignment_column.append(len(course_tags & focus) / len(focus) if course_tags and focus else 0.0)
+        started = progress.get(student_id)
+        if started is None:
+            progress_column.append(0.0)
+            recency_column.append(UNTOUCHED_RECENCY_DAYS)
+            hint_column.append(0.0)
+            continue
+        completed, attempts, hints, latest = started
+        progress_column.append(completed / lessons_total * 100.0 if lessons_total else 0.0)
+        recency_column.append((now - latest).total_seconds() / 86400.0)
+        hint_column.append(hints / attempts if attempts else 0.0)
+    columns = {
+        "progress_gap": progress_column,
+        "recency_gap": recency_column,
+        "tag_alignment": alignment_column,
+        "support_need": hint_column,
+    }
+    return student_ids, columns
+
+
+def score_columns(columns: Dict[str, Sequence[float]]) -> Sequence[float]:
+    """Recommendation scores per row of raw feature ``columns``; vectorized when NumPy is available."""
+
+    size = len(next(iter(columns.values())))
+    if np is not None:
+        scores = np.zeros(size)
+        for key, weight in _WEIGHTS.items():
+            values = _NORMALIZERS[key].transform(np.asarray(columns[key], dtype=float))
+            scores += weight * np.clip(values, 0.0, 1.0)
+        return scores
+    scores = [0.0] * size
+    for key, weight in _WEIGHTS.items():
+        normalizer = _NORMALIZERS[key]
+        for index, value in enumerate(columns[key]):
+            scores[index] += weight * normalizer(value)
+    return scores
+
+
+def _top_indices(scores: Sequence[float], student_ids: Sequence[int], limit: int) -> Iterable[int]:
+    if np is not None and len(scores) > limit:
+        threshold = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+        above = np.flatnonzero(scores > threshold)
+        # Rows are in student id order, so the first ties have the lowest ids.
+        tied = np.flatnonzero(scores == threshold)[: limit - len(above)]
+        return above.tolist() + tied.tolist()
+    return heapq.nlargest(limit, range(len(scores)), key=lambda index: (scores[index], -student_ids[index]))
+
+
+def _chunks(rows: Iterable, size: int) -> Iterable[List]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def rank_course_candidates(
+    course: Course,
+    *,
+    limit: int = 20,
+    now: Optional[datetime] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> List[Tuple[float, CandidateFeatures]]:
+    """The ``limit`` students who score highest for ``course``, best first.
+
+    Ties go to the lower student id.
+    """
+
+    now = now or timezone.now()
+    order_indexes = list(course.lessons.values_list("order_index", flat=True))
+    lessons_total = len(order_indexes)
+    course_tags = frozenset(course.tags or [])
+    progress = _course_progress(course.pk, lesson_mask(order_indexes))
+
+    best: List[Tuple[float, int, CandidateFeatures]] = []
+    students = Student.objects.order_by("pk").values_list("pk", "weak_tags").iterator(chunk_size=chunk_size)
+    for chunk in _chunks(students, chunk_size):
+        student_ids, columns = _chunk_columns(chunk, progress, course_tags, lessons_total, now)
+        scores = score_columns(columns)
+        for index in _top_indices(scores, student_ids, limit):
+            key = (float(scores[index]), -student_ids[index])
+            if len(best) == limit and key <= best[0][:2]:
+                continue
+            entry = key + (
+                CandidateFeatures(
+                    student_ids[index],
+                    columns["progress_gap"][index],
+                    columns["recency_gap"][index],
+                    columns["tag_alignment"][index],
+                    columns["support_need"][index],
+                ),
+            )
+            if len(best) < limit:
+                heapq.heappush(best, entry)
+            else:
+                heapq.heapreplace(best, entry)
+    best.sort(key=lambda entry: entry[:2], reverse=True)
+    return [(score, features) for score, _, features in best]
+
+
+__all__ = ["CandidateFeatures", "UNTOUCHED_RECENCY_DAYS", "rank_course_candidates", "score_columns"]
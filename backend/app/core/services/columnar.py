@@ -0,0 +1,190 @@
+"""Columnar binary export of attempt history for analytics.
+
+``write_columnar_export`` streams every attempt, hot and archived, in
+``(timestamp, id)`` order and appends each field to its own file of
+fixed-width little-endian values. ``manifest.json`` describes the columns::
+
+    id.bin              int64
+    student_id.bin      int64
+    lesson_id.bin       int64
+    timestamp.bin       int64 microseconds since the Unix epoch, UTC
+    correctness.bin     float64
+    hints_used.bin      uint32
+    duration_sec.bin    uint32
+
+Row ``i`` of the export is element ``i`` of every column. Memory holds one
+chunk of rows per column, however long the history. A row takes 48 bytes
+against about 150 for the NDJSON export, and the files need no parsing:
+:func:`load_columnar_export` maps them read-only and returns NumPy arrays
+(``timestamp`` as ``datetime64[us]``), or typed memoryviews with
+``use_numpy=False`` or where NumPy, a backend requirement, is missing. Column
+files are replaced first and the manifest last, and the loader checks every
+file against the manifest's row count.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import sys
+import tempfile
+from array import array
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+from django.utils import timezone
+
+from .archive import iter_attempt_records
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised where NumPy is absent
+    np = None
+
+FORMAT = "codingal-attempt-columns"
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+
+
+class Column(NamedTuple):
+    name: str
+    dtype: str  # NumPy dtype string
+    typecode: str  # ``array`` / ``memoryview.cast`` code of the same width
+
+
+COLUMNS = (
+    Column("id", "<i8", "q"),
+    Column("student_id", "<i8", "q"),
+    Column("lesson_id", "<i8", "q"),
+    Column("timestamp", "<i8", "q"),
+    Column("correctness", "<f8", "d"),
+    Column("hints_used", "<u4", "I"),
+    Column("duration_sec", "<u4", "I"),
+)
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _flush(buffers: Dict[str, array], streams) -> None:
+    for name, values in buffers.items():
+        if sys.byteorder != "little":
+            values.byteswap()
+        values.tofile(streams[name])
+        del values[:]
+
+
+def write_columnar_export(
+    directory,
+    *,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    include_archived: bool = True,
+    chunk_size: int = 50000,
+) -> Dict[str, object]:
+    """Export attempts from ``start`` (inclusive) to ``end`` (exclusive) into ``directory``; returns the manifest."""
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    temporary: Dict[str, str] = {}
+    streams = {}
+    try:
+        for column in COLUMNS:
+            handle, temporary[column.name] = tempfile.mkstemp(dir=directory, prefix=f".{column.name}-", suffix=".tmp")
+            streams[column.name] = os.fdopen(handle, "wb")
+        buffers = {column.name: array(column.typecode) for column in COLUMNS}
+        add_id, add_student, add_lesson, add_timestamp, add_correctness, add_hints, add_duration = (
+            buffers[column.name].append for column in COLUMNS
+        )
+        rows = 0
+        records = iter_attempt_records(
+            start=start, end=end, include_archived=include_archived, with_code=False, chunk_size=chunk_size
+        )
+        for record in records:
+            add_id(record.id)
+            add_student(record.student_id)
+            add_lesson(record.lesson_id)
+            delta = record.timestamp - _EPOCH
+            add_timestamp((delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds)
+            add_correctness(record.correctness)
+            add_hints(record.hints_used)
+            add_duration(record.duration_sec)
+            rows += 1
+            if rows % chunk_size == 0:
+                _flush(buffers, streams)
+        _flush(buffers, streams)
+        for name, stream in streams.items():
+            stream.close()
+            os.chmod(temporary[name], 0o644)
+        for column in COLUMNS:
+            os.replace(temporary.pop(column.name), directory / f"{column.name}.bin")
+    finally:
+        for stream in streams.values():
+            stream.close()
+        for path in temporary.values():
+            if os.path.exists(path):
+                os.unlink(path)
+
+    manifest = {
+        "format": FORMAT,
+        "version": FORMAT_VERSION,
+        "rows": rows,
+        "order": ["timestamp", "id"],
+        "generated_at": timezone.now().isoformat(),
+        "from": start.isoformat() if start else None,
+        "to": end.isoformat() if end else None,
+        "include_archived": include_archived,
+        "columns": [
+            {
+                "name": column.name,
+                "file": f"{column.name}.bin",
+                "dtype": column.dtype,
+                **({"unit": "us", "epoch": "1970-01-01T00:00:00+00:00"} if column.name == "timestamp" else {}),
+            }
+            for column in COLUMNS
+        ],
+    }
+    handle, path = tempfile.mkstemp(dir=directory, prefix=f".{MANIFEST}-", suffix=".tmp")
+    with os.fdopen(handle, "w") as stream:
+        json.dump(manifest, stream, indent=2)
+    os.chmod(path, 0o644)
+    os.replace(path, directory / MANIFEST)
+    return manifest
+
+
+def load_columnar_export(directory, *, use_numpy: Optional[bool] = None) -> Dict[str, object]:
+    """Map an export's columns read-only: ``name -> array``, NumPy when available, else ``memoryview``."""
+
+    directory = Path(directory)
+    manifest = json.loads((directory / MANIFEST).read_text())
+    if manifest.get("format") != FORMAT or manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{directory} is not a version {FORMAT_VERSION} attempt column export.")
+    if use_numpy is None:
+        use_numpy = np is not None
+    elif use_numpy and np is None:
+        raise ImportError("NumPy is not installed.")
+    typecodes = {column.name: column.typecode for column in COLUMNS}
+    rows = manifest["rows"]
+    columns: Dict[str, object] = {}
+    for column in manifest["columns"]:
+        path = directory / column["file"]
+        itemsize = int(column["dtype"][2:])
+        if path.stat().st_size != rows * itemsize:
+            raise ValueError(f"{path} does not hold {rows} rows; the export is incomplete or was replaced.")
+        if use_numpy:
+            values = np.memmap(path, dtype=column["dtype"], mode="r") if rows else np.empty(0, dtype=column["dtype"])
+            if column["name"] == "timestamp":
+                values = values.view("<M8[us]")
+        else:
+            if sys.byteorder != "little":
+                raise ValueError("Reading an export without NumPy needs a little-endian host.")
+            if rows:
+                with open(path, "rb") as stream:
+                    values = memoryview(mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ))
+            else:
+                values = memoryview(b"")
+            values = values.cast(typecodes[column["name"]])
+        columns[column["name"]] = values
+    return columns
+
+
+__all__ = ["COLUMNS", "MANIFEST", "load_columnar_export", "write_columnar_export"]
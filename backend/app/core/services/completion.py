@@ -0,0 +1,350 @@
+"""Bitmap index of the lessons each student has completed, per course.
+
+A :class:`LessonCompletion` row holds an integer bitmap for one (student,
+course), stored little-endian in a binary column. Bit ``n`` is set once the
+student has an attempt on the lesson with ``order_index == n``. With the
+bitmap, progress is a popcount and the next lesson is the lowest bit set in
+``lesson_mask & ~completed``. Cohort questions such as "finished lessons 1-5
+but not 6" become mask tests over one course's rows, and never read
+``Attempt``.
+
+Each row also keeps running totals of the student's attempts and hints in the
+course and the time of the latest one. They are what the overview and the
+recommenders read, and they stay whole when old attempts are archived.
+
+The ``post_save`` signal keeps the index current for attempts created through
+the ORM. Totals only ever add up, so an attempt that is edited or deleted
+through the ORM instead rebuilds its student's rows once the transaction
+commits (:func:`schedule_rebuild`); moves to the archive or another shard do
+not. Moving a lesson to another ``order_index`` or course rebuilds the rows
+of the course's students the same way. Bulk loaders and queryset ``update()``
+calls bypass signals: follow them with :func:`rebuild_completions`, or the
+``rebuild_completions`` command. Rebuilds read archived attempts too.
+"""
+from __future__ import annotations
+
+import heapq
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import DateTimeField, F, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from ..models import Attempt, AttemptArchiveSegment, Lesson, LessonCompletion
+from ..sharding import across_shards, shard_aliases, students_by_shard
+from .archive import attempts_moving, iter_archived_records
+
+
+class CourseProgress(NamedTuple):
+    bits: int
+    attempts_count: int
+    hints_total: int
+    last_attempt_at: Optional[datetime]
+
+
+def encode_bits(bits: int) -> bytes:
+    return bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+
+
+def decode_bits(value) -> int:
+    return int.from_bytes(value or b"", "little")
+
+
+# Largest ``order_index`` a lesson filter may name, whatever the course.
+MAX_ORDER_INDEX = 1024
+
+
+def lesson_mask(order_indexes: Iterable[int]) -> int:
+    """Bitmap with one bit per existing lesson of a course."""
+
+    mask = 0
+    for order_index in order_indexes:
+        mask |= 1 << order_index
+    return mask
+
+
+def first_missing(completed: int, mask: int) -> Optional[int]:
+    """Lowest ``order_index`` in ``mask`` whose bit is not set in ``completed``."""
+
+    missing = mask & ~completed
+    if not missing:
+        return None
+    return (missing & -missing).bit_length() - 1
+
+
+def parse_order_ranges(spec: str, *, highest: int = MAX_ORDER_INDEX) -> Set[int]:
+    """``"1-5,7"`` -> ``{1, 2, 3, 4, 5, 7}``; raises ``ValueError`` on malformed input.
+
+    Indexes above ``highest`` are rejected before any set or mask is built.
+    """
+
+    indexes: Set[int] = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        low, _, high = part.partition("-")
+        try:
+            start, end = int(low), int(high or low)
+        except ValueError:
+            raise ValueError(f'"{part}" is not a lesson number or range.') from None
+        if start < 0 or end < start:
+            raise ValueError(f'"{part}" is not a valid lesson range.')
+        if end > highest:
+            raise ValueError(f'"{part}" goes past the last lesson, {highest}.')
+        indexes.update(range(start, end + 1))
+    return indexes
+
+
+def record_completion(
+    student_id: int,
+    course_id: int,
+    order_index: int,
+    *,
+    hints_used: int = 0,
+    timestamp: Optional[datetime] = None,
+) -> None:
+    """Count one attempt on a lesson: set its bit and add to the running totals.
+
+    The common case costs two queries, a read and an update. When the bit is
+    new, the update only applies if the bitmap is unchanged since the read,
+    and is retried otherwise, so concurrent attempts never drop each other's
+    bits; the totals are added in SQL. No lock or savepoint is needed.
+    """
+
+    bit = 1 << order_index
+    changes = {"attempts_count": F("attempts_count") + 1, "hints_total": F("hints_total") + hints_used}
+    if timestamp is not None:
+        when = Value(timestamp, output_field=DateTimeField())
+        changes["last_attempt_at"] = Greatest(Coalesce("last_attempt_at", when), when)
+    shard = LessonCompletion.objects.student_shard(student_id)
+    completions = shard.filter(student_id=student_id, course_id=course_id)
+    while True:
+        row = completions.values_list("pk", "bits").first()
+        if row is None:
+            # An empty row; a concurrent insert wins the unique constraint and the next pass counts into it.
+            shard.bulk_create([LessonCompletion(student_id=student_id, course_id=course_id)], ignore_conflicts=True)
+            continue
+        pk, value = row
+        bits = decode_bits(value)
+        if bits & bit:
+            shard.filter(pk=pk).update(**changes)
+            return
+        if shard.filter(pk=pk, bits=value).update(bits=encode_bits(bits | bit), **changes):
+            return
+
+
+def record_attempt(attempt: Attempt) -> None:
+    lesson = attempt.lesson
+    record_completion(
+        attempt.student_id,
+        lesson.course_id,
+        lesson.order_index,
+        hints_used=attempt.hints_used,
+        timestamp=attempt.timestamp,
+    )
+
+
+def student_progress(student_id: int) -> Dict[int, CourseProgress]:
+    """``course_id -> progress`` for every course the student has attempted."""
+
+    rows = LessonCompletion.objects.for_student(student_id).values_list(
+        "course_id", "bits", "attempts_count", "hints_total", "last_attempt_at"
+    )
+    return {
+        course_id: CourseProgress(decode_bits(value), attempts, hints, last)
+        for course_id, value, attempts, hints, last in rows
+    }
+
+
+def progress_for_students(student_ids: Iterable[int]) -> Dict[int, Dict[int, CourseProgress]]:
+    """``student_id -> course_id -> progress`` for a batch of students, one query per shard."""
+
+    rows = LessonCompletion.objects.filter(student_id__in=list(student_ids)).values_list(
+        "student_id", "course_id", "bits", "attempts_count", "hints_total", "last_attempt_at"
+    )
+    progress: Dict[int, Dict[int, CourseProgress]] = {}
+    for shard in across_shards(rows):
+        for student_id, course_id, value, attempts, hints, last in shard:
+            progress.setdefault(student_id, {})[course_id] = CourseProgress(decode_bits(value), attempts, hints, last)
+    return progress
+
+
+def student_completions(student_id: int) -> Dict[int, int]:
+    """``course_id -> completed bitmap`` for one student."""
+
+    return {
+        course_id: decode_bits(value)
+        for course_id, value in LessonCompletion.objects.for_student(student_id).values_list("course_id", "bits")
+    }
+
+
+def cohort_student_ids(course_id: int, *, completed: Iterable[int] = (), missing: Iterable[int] = ()) -> List[int]:
+    """Students who started ``course_id``, completed every lesson in ``completed`` and none in ``missing``.
+
+    Lessons are ``order_index`` values. Results are in student id order, merged
+    across shards.
+    """
+
+    required = lesson_mask(completed)
+    excluded = lesson_mask(missing)
+    rows = heapq.merge(
+        *(
+            completions.filter(course_id=course_id)
+            .order_by("student_id")
+            .values_list("student_id", "bits")
+            .iterator(chunk_size=5000)
+            for completions in across_shards(LessonCompletion.objects.all())
+        )
+    )
+    members = []
+    for student_id, value in rows:
+        bits = decode_bits(value)
+        if bits & required == required and not bits & excluded:
+            members.append(student_id)
+    return members
+
+
+def _rebuild(attempts, segments, completions, batch_size: int) -> int:
+    lessons = dict(
+        (pk, (course_id, order_index))
+        for pk, course_id, order_index in Lesson.objects.using(completions.db).values_list(
+            "pk", "course_id", "order_index"
+        )
+    )
+    progress: Dict[Tuple[int, int], list] = {}
+
+    def add(student_id: int, lesson_id: int, hints_used: int, timestamp: datetime) -> None:
+        course_id, order_index = lessons[lesson_id]
+        entry = progress.get((student_id, course_id))
+        if entry is None:
+            progress[(student_id, course_id)] = [1 << order_index, 1, hints_used, timestamp]
+            return
+        entry[0] |= 1 << order_index
+        entry[1] += 1
+        entry[2] += hints_used
+        if timestamp > entry[3]:
+            entry[3] = timestamp
+
+    # Lessons missing from this shard's catalog copy (deleted, or not copied
+    # yet) are skipped; rebalance_shards --copies-only and a rebuild catch up.
+    rows = attempts.order_by().values_list("student_id", "lesson_id", "hints_used", "timestamp")
+    for row in rows.iterator(chunk_size=10000):
+        if row[1] in lessons:
+            add(*row)
+    for record in iter_archived_records(segments):
+        if record.lesson_id in lessons:
+            add(record.student_id, record.lesson_id, record.hints_used, record.timestamp)
+
+    with transaction.atomic(using=completions.db):
+        completions.delete()
+        LessonCompletion.objects.using(completions._db).bulk_create(
+            [
+                LessonCompletion(
+                    student_id=student_id,
+                    course_id=course_id,
+                    bits=encode_bits(bits),
+                    attempts_count=attempts_count,
+                    hints_total=hints_total,
+                    last_attempt_at=last_attempt_at,
+                )
+                for (student_id, course_id), (bits, attempts_count, hints_total, last_attempt_at) in progress.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(progress)
+
+
+def rebuild_completions(student_ids: Optional[Iterable[int]] = None, *, batch_size: int = 2000) -> int:
+    """Recompute bitmaps and totals from hot and archived attempts (all students, or only ``student_ids``).
+
+    Each shard is rebuilt from its own attempts. Returns rows written.
+    """
+
+    if student_ids is None:
+        return sum(
+            _rebuild(
+                Attempt.objects.on_shard(alias),
+                AttemptArchiveSegment.objects.on_shard(alias),
+                LessonCompletion.objects.on_shard(alias),
+                batch_size,
+            )
+            for alias in shard_aliases()
+        )
+    written = 0
+    for alias, shard_student_ids in students_by_shard(student_ids).items():
+        for offset in range(0, len(shard_student_ids), batch_size):
+            chunk = shard_student_ids[offset : offset + batch_size]
+            written += _rebuild(
+                Attempt.objects.on_shard(alias).filter(student_id__in=chunk),
+                AttemptArchiveSegment.objects.on_shard(alias).filter(student_id__in=chunk),
+                LessonCompletion.objects.on_shard(alias).filter(student_id__in=chunk),
+                batch_size,
+            )
+    return written
+
+
+_pending = threading.local()
+
+
+def schedule_rebuild(student_id: int, using: str = DEFAULT_DB_ALIAS) -> None:
+    """Rebuild a student's rows after commit, once one of their attempts was edited or deleted.
+
+    Students scheduled in one transaction share one rebuild. Does nothing
+    for deletes under :func:`~core.services.archive.moving_attempts`.
+    """
+
+    if not attempts_moving():
+        _schedule([student_id], using)
+
+
+def schedule_course_rebuild(course_ids: Iterable[int], using: str = DEFAULT_DB_ALIAS) -> None:
+    """Rebuild, after commit, the rows of every student with progress in ``course_ids``.
+
+    Bits are keyed by ``order_index``, so they are recomputed when a lesson
+    moves to another position or course.
+    """
+
+    completions = LessonCompletion.objects.filter(course_id__in=list(course_ids))
+    _schedule(
+        {student_id for shard in across_shards(completions) for student_id in shard.values_list("student_id", flat=True)},
+        using,
+    )
+
+
+def _schedule(student_ids: Iterable[int], using: str) -> None:
+    student_ids = set(student_ids)
+    if student_ids:
+        _pending.__dict__.setdefault(using, set()).update(student_ids)
+        transaction.on_commit(lambda: _rebuild_pending(using), using=using)
+
+
+def _rebuild_pending(using: str) -> None:
+    # The first callback of a transaction rebuilds every pending student; the
+    # rest find nothing left. Ids left by a rolled-back transaction are
+    # rebuilt with the next commit, which is harmless.
+    student_ids = _pending.__dict__.pop(using, None)
+    if student_ids:
+        rebuild_completions(sorted(student_ids))
+
+
+__all__ = [
+    "CourseProgress",
+    "MAX_ORDER_INDEX",
+    "cohort_student_ids",
+    "decode_bits",
+    "encode_bits",
+    "first_missing",
+    "lesson_mask",
+    "parse_order_ranges",
+    "progress_for_students",
+    "rebuild_completions",
+    "record_attempt",
+    "record_completion",
+    "schedule_course_rebuild",
+    "schedule_rebuild",
+    "student_completions",
+    "student_progress",
+]
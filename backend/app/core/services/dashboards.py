@@ -0,0 +1,240 @@
+"""Static dashboard bundles for serving from a CDN or plain file server.
+
+``export_dashboards`` renders every student's overview and recommendation
+with the same code as ``/api/students/<id>/overview/`` and
+``/api/students/<id>/recommendation/``. Each body is written once as minified
+JSON, and again precompressed as ``.gz`` and, when the ``brotli`` package is
+installed, ``.br``. Layout under the output directory::
+
+    manifest.json                                 (+ .gz, .br)
+    students/<id>/overview.<content hash>.json    (+ .gz, .br)
+    students/<id>/recommendation.<content hash>.json
+
+Bundle names hash their bytes, so a bundle never changes once written and can
+be cached forever. ``manifest.json`` is the only file rewritten in place, and
+it should be served with a short cache lifetime. For each student it lists the
+bundle paths, a digest of the rendering inputs and when they were rendered.
+The inputs are the student row, the student's lesson-completion rows and the
+catalog. A student is rendered again only when that digest changes, or when
+the bundles are older than ``max_age``. The recommendation's recency feature
+moves with the clock, so ``max_age`` bounds how stale it gets. A rendered body
+that hashes the same as before is not written again.
+
+Bundles the new manifest no longer names are retired rather than removed:
+the manifest lists them under ``retired`` with the time they were replaced,
+and they are deleted by the first export after ``grace`` has passed. Clients
+and caches still holding the previous manifest keep finding its bundles until
+then. Without ``brotli``, ``.br`` files left by an export that had it are
+removed, so no stale variant is served next to a newer body.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from ..models import Course, Lesson, Student
+from .completion import CourseProgress, progress_for_students
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - exercised where brotli is absent
+    brotli = None
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+BUNDLES = ("overview", "recommendation")
+_HASH_LENGTH = 16
+
+# ``(student, courses, progress by course, now) -> {bundle name: body}``; see ``views.student_bundle_payloads``.
+Renderer = Callable[[Student, List[Course], Dict[int, CourseProgress], datetime], Dict[str, Dict[str, object]]]
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode()).hexdigest()
+
+
+def catalog_digest(courses: List[Course]) -> str:
+    return _digest(
+        [
+            [course.pk, course.name, course.description, course.difficulty, course.tags]
+            + [[lesson.pk, lesson.title, lesson.order_index] for lesson in course.lessons.all()]
+            for course in courses
+        ]
+    )
+
+
+def _inputs_digest(catalog: str, student: Student, progress: Dict[int, CourseProgress]) -> str:
+    return _digest(
+        [
+            catalog,
+            [student.pk, student.name, student.email, student.weak_tags],
+            sorted([course_id, *entry] for course_id, entry in progress.items()),
+        ]
+    )
+
+
+def encode_bundle(payload) -> bytes:
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, allow_nan=False).encode()
+
+
+def _variants(data: bytes) -> Dict[str, bytes]:
+    # mtime=0 keeps the gzip bytes a function of the content alone.
+    variants = {"": data, ".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data, quality=11)
+    return variants
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}-", suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as stream:
+            stream.write(data)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+
+
+def _write_bundle(root: Path, relative: str, data: bytes) -> int:
+    """Write ``relative`` and its compressed variants that do not exist yet; returns files written."""
+
+    written = 0
+    for suffix, body in _variants(data).items():
+        path = root / f"{relative}{suffix}"
+        if not path.exists():
+            _write_atomic(path, body)
+            written += 1
+    return written
+
+
+def load_manifest(root) -> Dict[str, object]:
+    try:
+        manifest = json.loads((Path(root) / MANIFEST).read_bytes())
+    except (FileNotFoundError, ValueError):
+        return {}
+    return manifest if manifest.get("version") == FORMAT_VERSION else {}
+
+
+def _remove(root: Path, relative: str) -> bool:
+    path = root / relative
+    if not path.exists():
+        return False
+    path.unlink()
+    if path.parent != root and not any(path.parent.iterdir()):
+        path.parent.rmdir()
+    return True
+
+
+def export_dashboards(
+    root,
+    render: Renderer,
+    *,
+    batch_size: int = 500,
+    max_age: Optional[timedelta] = timedelta(hours=24),
+    grace: timedelta = timedelta(hours=1),
+    now: Optional[datetime] = None,
+) -> Dict[str, int]:
+    """Bring the bundles under ``root`` up to date; returns students, rendered, files written and files removed.
+
+    Students are read ``batch_size`` at a time with one lesson-completion query
+    per shard.
+    """
+
+    root = Path(root)
+    now = now or timezone.now()
+    previous_manifest = load_manifest(root)
+    previous = previous_manifest.get("students", {})
+    courses = list(
+        Course.objects.prefetch_related(Prefetch("lessons", queryset=Lesson.objects.order_by("order_index"))).order_by(
+            "name"
+        )
+    )
+    catalog = catalog_digest(courses)
+    fresh_after = (now - max_age).isoformat() if max_age is not None else None
+
+    entries: Dict[str, Dict[str, object]] = {}
+    counts = {"students": 0, "rendered": 0, "written": 0, "removed": 0}
+    students = Student.objects.order_by("pk")
+    batch: List[Student] = []
+
+    def flush() -> None:
+        progress = progress_for_students(student.pk for student in batch)
+        for student in batch:
+            student_progress = progress.get(student.pk, {})
+            inputs = _inputs_digest(catalog, student, student_progress)
+            entry = previous.get(str(student.pk))
+            if (
+                entry is not None
+                and entry.get("inputs") == inputs
+                and (fresh_after is None or entry["rendered_at"] > fresh_after)
+                and all((root / entry[name]).exists() for name in BUNDLES)
+            ):
+                entries[str(student.pk)] = entry
+                continue
+            entry = {"inputs": inputs, "rendered_at": now.isoformat()}
+            for name, payload in render(student, courses, student_progress, now).items():
+                data = encode_bundle(payload)
+                relative = f"students/{student.pk}/{name}.{hashlib.sha256(data).hexdigest()[:_HASH_LENGTH]}.json"
+                counts["written"] += _write_bundle(root, relative, data)
+                entry[name] = relative
+            entries[str(student.pk)] = entry
+            counts["rendered"] += 1
+        counts["students"] += len(batch)
+        batch.clear()
+
+    for student in students.iterator(chunk_size=batch_size):
+        batch.append(student)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    kept = {entry[name] for entry in entries.values() for name in BUNDLES}
+    retired = {
+        relative: when
+        for relative, when in previous_manifest.get("retired", {}).items()
+        if relative not in kept
+    }
+    for entry in previous.values():
+        for name in BUNDLES:
+            if entry[name] not in kept:
+                retired.setdefault(entry[name], now.isoformat())
+    expire_before = (now - grace).isoformat()
+    expired = [relative for relative, when in retired.items() if when <= expire_before]
+    for relative in expired:
+        del retired[relative]
+
+    manifest = {
+        "version": FORMAT_VERSION,
+        "generated_at": now.isoformat(),
+        "catalog": catalog,
+        "students": entries,
+        "retired": retired,
+    }
+    data = encode_bundle(manifest)
+    for suffix, body in _variants(data).items():
+        _write_atomic(root / f"{MANIFEST}{suffix}", body)
+
+    # Only after the new manifest is in place: the one it replaced may name these.
+    for relative in expired:
+        counts["removed"] += sum(_remove(root, f"{relative}{suffix}") for suffix in ("", ".gz", ".br"))
+    if brotli is None:
+        for relative in [MANIFEST, *kept, *retired]:
+            counts["removed"] += _remove(root, f"{relative}.br")
+    return counts
+
+
+__all__ = ["BUNDLES", "MANIFEST", "catalog_digest", "encode_bundle", "export_dashboards", "load_manifest"]
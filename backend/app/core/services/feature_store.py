@@ -0,0 +1,265 @@
+"""Memory-mapped store of per-student recommendation features.
+
+The ``refresh_feature_store`` command writes one fixed-layout file with the
+recommender's four inputs for every (student, course). Every worker process
+maps that file read-only, so all workers on a host share one copy in the page
+cache. A lookup is a binary search, offset arithmetic and a ``struct`` unpack
+straight from the mapping: no query, no per-process warm-up, no
+deserialization of the rest of the file.
+
+Layout, little-endian::
+
+    header      _HEADER: magic, format version, record size, course count,
+                generated_at (epoch seconds), catalog key, student count
+    course ids  int64 per course, in the views' order (by name)
+    records     student count x course count _RECORD rows: progress percent,
+                hint rate, tag alignment and last activity (epoch seconds, NaN
+                if none) as float64, then attempts as uint32 and 4 bytes of
+                padding
+    student ids int64 per student, ascending; row ``i`` of the records is
+                student ``i`` of this table
+
+A lookup binary-searches the student id table for the row index, so the file
+grows with the number of students, not with the span of their ids. The record
+for (student, course) starts at
+``records + (row * course_count + slot) * record_size``, where ``slot`` is the
+course's position in the course id table.
+
+The catalog key digests each course's id, tags and lesson count, in the
+views' order (:func:`catalog_key`). Progress and tag alignment depend on all
+three. Readers compare it with the catalog they loaded and fall back to the
+database when a course, a tag or a lesson has changed since the refresh.
+
+Writers build the new file next to the old one and ``os.replace`` it into
+place. Readers notice the new inode on their next lookup and map it, while
+requests already running finish on the old mapping. The store is a snapshot:
+attempts after ``generated_at`` are missing until the next refresh, and
+``FEATURE_STORE_MAX_AGE`` bounds how stale a file may be before readers ignore
+it and fall back to the database.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from ..models import Student
+from .candidates import UNTOUCHED_RECENCY_DAYS
+from .nightly import aggregate_course_state
+from .replay import ReplayCatalog
+
+MAGIC = b"CCFEATS\0"
+FORMAT_VERSION = 2
+_HEADER = struct.Struct("<8sHHIdQI4x")
+_RECORD = struct.Struct("<ddddI4x")
+
+
+class StudentCourseFeatures(NamedTuple):
+    progress_percent: float
+    hint_rate: float
+    tag_alignment: float
+    last_activity: float
+    attempts: int
+
+    def recommendation_inputs(self, now_timestamp: float) -> Dict[str, float]:
+        """Keyword arguments for ``score_candidate``, with recency measured at ``now_timestamp``."""
+
+        if math.isnan(self.last_activity):
+            recency_gap_days = UNTOUCHED_RECENCY_DAYS
+        else:
+            recency_gap_days = (now_timestamp - self.last_activity) / 86400.0
+        return {
+            "progress_percent": self.progress_percent,
+            "recency_gap_days": recency_gap_days,
+            "tag_alignment": self.tag_alignment,
+            "hint_rate": self.hint_rate,
+        }
+
+
+def catalog_key(courses: Iterable[Tuple[int, Iterable[str], int]]) -> int:
+    """64-bit digest of ``(course id, tags, lesson count)`` per course, in the views' order."""
+
+    rows = [[course_id, sorted(set(tags or ())), lessons] for course_id, tags, lessons in courses]
+    return int.from_bytes(hashlib.sha256(json.dumps(rows).encode()).digest()[:8], "little")
+
+
+def _records_offset(course_count: int) -> int:
+    return _HEADER.size + 8 * course_count
+
+
+class FeatureStore:
+    """Read-only view of one feature store file."""
+
+    def __init__(self, path) -> None:
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        if len(self._view) < _HEADER.size:
+            raise ValueError(f"{path} is not a feature store.")
+        magic, version, record_size, course_count, generated_at, key, count = _HEADER.unpack_from(self._view)
+        if magic != MAGIC or version != FORMAT_VERSION or record_size != _RECORD.size:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} feature store.")
+        self.generated_at = generated_at
+        self.catalog_key = key
+        self.student_count = count
+        self.course_ids: Tuple[int, ...] = struct.unpack_from(f"<{course_count}q", self._view, _HEADER.size)
+        self._slots = {course_id: slot for slot, course_id in enumerate(self.course_ids)}
+        self._records = _records_offset(course_count)
+        self._row_size = course_count * _RECORD.size
+        ids = self._records + count * self._row_size
+        if len(self._view) != ids + 8 * count:
+            raise ValueError(f"{path} is truncated.")
+        self._student_ids: Sequence[int]
+        if sys.byteorder == "little":
+            self._student_ids = self._view[ids:].cast("q")
+        else:  # pragma: no cover - big-endian hosts copy and swap the id table
+            self._student_ids = array("q", self._view[ids:])
+            self._student_ids.byteswap()
+
+    def _row_offset(self, student_id: int) -> Optional[int]:
+        index = bisect_left(self._student_ids, student_id)
+        if index == self.student_count or self._student_ids[index] != student_id:
+            return None
+        return self._records + index * self._row_size
+
+    def __contains__(self, student_id: int) -> bool:
+        return self._row_offset(student_id) is not None
+
+    def features(self, student_id: int, course_id: int) -> Optional[StudentCourseFeatures]:
+        offset = self._row_offset(student_id)
+        slot = self._slots.get(course_id)
+        if offset is None or slot is None:
+            return None
+        return StudentCourseFeatures._make(_RECORD.unpack_from(self._view, offset + slot * _RECORD.size))
+
+    def student_features(self, student_id: int) -> Optional[Dict[int, StudentCourseFeatures]]:
+        """``course_id -> features`` for every course in the store, or ``None`` for an unknown student."""
+
+        offset = self._row_offset(student_id)
+        if offset is None:
+            return None
+        row = _RECORD.iter_unpack(self._view[offset : offset + self._row_size])
+        return {course_id: StudentCourseFeatures._make(values) for course_id, values in zip(self.course_ids, row)}
+
+
+_current: Optional[Tuple[tuple, FeatureStore]] = None
+_open_lock = threading.Lock()
+
+
+def get_feature_store() -> Optional[FeatureStore]:
+    """This process's mapping of ``FEATURE_STORE_PATH``; ``None`` when unset, missing or too old.
+
+    One ``stat`` per call detects a refreshed file. The previous mapping is
+    dropped rather than closed, and is unmapped once no request uses it.
+    """
+
+    global _current
+    path = getattr(settings, "FEATURE_STORE_PATH", "")
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (str(path), stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    current = _current
+    if current is None or current[0] != key:
+        with _open_lock:
+            current = _current
+            if current is None or current[0] != key:
+                try:
+                    current = _current = (key, FeatureStore(path))
+                except (OSError, ValueError):
+                    return None
+    store = current[1]
+    max_age = getattr(settings, "FEATURE_STORE_MAX_AGE", 0)
+    if max_age and time.time() - store.generated_at > max_age:
+        return None
+    return store
+
+
+def write_feature_store(path, *, shard_size: int = 2000, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Compute every student's features and atomically replace the file at ``path``.
+
+    Students are read ``shard_size`` at a time in id order, one attempts query
+    per shard, so memory stays bounded by the shard size and the id table.
+    Returns the student and course counts written.
+    """
+
+    path = Path(path)
+    catalog = ReplayCatalog.load()
+    courses = sorted(catalog.rank, key=catalog.rank.__getitem__)
+    key = catalog_key((course_id, catalog.tags[course_id], catalog.lesson_totals[course_id]) for course_id in courses)
+    generated_at = now.timestamp() if now is not None else time.time()
+    student_ids = array("q")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}-", suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as stream:
+            stream.write(bytes(_HEADER.size))
+            stream.write(struct.pack(f"<{len(courses)}q", *courses))
+            after = None
+            while True:
+                students = Student.objects.order_by("pk")
+                if after is not None:
+                    students = students.filter(pk__gt=after)
+                shard = list(students.values_list("pk", "weak_tags")[:shard_size])
+                if not shard:
+                    break
+                after = shard[-1][0]
+                state = aggregate_course_state(catalog, shard[0][0], after + 1)
+                chunk = bytearray()
+                for student_id, weak_tags in shard:
+                    student_ids.append(student_id)
+                    focus = frozenset(weak_tags or ())
+                    for course_id in courses:
+                        alignment = catalog.alignment(course_id, focus)
+                        entry = state.get((student_id, course_id))
+                        if entry is None:
+                            chunk += _RECORD.pack(0.0, 0.0, alignment, math.nan, 0)
+                            continue
+                        completed, attempts, hints, latest = entry
+                        total = catalog.lesson_totals[course_id]
+                        progress = bin(completed).count("1") / total * 100.0 if total else 0.0
+                        chunk += _RECORD.pack(progress, hints / attempts, alignment, latest.timestamp(), attempts)
+                stream.write(chunk)
+            if sys.byteorder != "little":  # pragma: no cover
+                student_ids.byteswap()
+            student_ids.tofile(stream)
+            stream.seek(0)
+            stream.write(
+                _HEADER.pack(MAGIC, FORMAT_VERSION, _RECORD.size, len(courses), generated_at, key, len(student_ids))
+            )
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+    return {"students": len(student_ids), "courses": len(courses)}
+
+
+__all__ = [
+    "FeatureStore",
+    "StudentCourseFeatures",
+    "catalog_key",
+    "get_feature_store",
+    "write_feature_store",
+]
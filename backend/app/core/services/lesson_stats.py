@@ -0,0 +1,142 @@
+"""Persistence and lookups for the per-lesson duration and correctness sketches.
+
+Each lesson has one :class:`LessonSketch` row with two serialized
+:class:`KLLSketch` values, ~2.5 KB each at most. Every new attempt is folded in
+by a read, an in-memory update and a write. The write is conditional on the
+row's ``version``, and retried if another writer got there first, so
+concurrent inserts are never dropped.
+
+A KLL sketch can only take values in, not drop them: attempts edited or
+deleted after they were folded in still count until ``rebuild_sketches``
+(or the ``rebuild_sketches`` command) recomputes them from the attempts.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction
+
+from ..models import Attempt, AttemptArchiveSegment, Lesson, LessonSketch
+from ..sharding import across_shards
+from .archive import iter_archived_records
+from .quantiles import KLLSketch
+
+STAT_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99)
+
+
+@dataclass(frozen=True)
+class LessonSketches:
+    duration: KLLSketch
+    correctness: KLLSketch
+
+    @classmethod
+    def empty(cls) -> "LessonSketches":
+        return cls(KLLSketch(), KLLSketch())
+
+    @classmethod
+    def load(cls, duration, correctness) -> "LessonSketches":
+        return cls(KLLSketch.from_bytes(duration), KLLSketch.from_bytes(correctness))
+
+    def add(self, duration_sec: int, correctness: float) -> None:
+        self.duration.update(duration_sec)
+        self.correctness.update(correctness)
+
+    def percentiles(self, duration_sec: int, correctness: float) -> Dict[str, float]:
+        """Percent of the lesson's attempts with a shorter duration / lower correctness."""
+
+        return {
+            "duration": round(self.duration.rank(duration_sec) * 100.0, 1),
+            "correctness": round(self.correctness.rank(correctness) * 100.0, 1),
+        }
+
+
+def record_attempt_sketch(attempt: Attempt) -> None:
+    """Fold one new attempt into its lesson's sketches."""
+
+    existing = LessonSketch.objects.filter(lesson_id=attempt.lesson_id)
+    while True:
+        row = existing.values_list("pk", "version", "duration", "correctness").first()
+        if row is None:
+            empty = LessonSketches.empty()
+            # A concurrent insert wins the unique constraint; the next pass updates it.
+            LessonSketch.objects.bulk_create(
+                [
+                    LessonSketch(
+                        lesson_id=attempt.lesson_id,
+                        duration=empty.duration.to_bytes(),
+                        correctness=empty.correctness.to_bytes(),
+                    )
+                ],
+                ignore_conflicts=True,
+            )
+            continue
+        pk, version, duration, correctness = row
+        sketches = LessonSketches.load(duration, correctness)
+        sketches.add(attempt.duration_sec, attempt.correctness)
+        updated = LessonSketch.objects.filter(pk=pk, version=version).update(
+            duration=sketches.duration.to_bytes(),
+            correctness=sketches.correctness.to_bytes(),
+            version=version + 1,
+        )
+        if updated:
+            return
+
+
+def sketches_for_lessons(lesson_ids: Iterable[int]) -> Dict[int, LessonSketches]:
+    rows = LessonSketch.objects.filter(lesson_id__in=set(lesson_ids)).values_list(
+        "lesson_id", "duration", "correctness"
+    )
+    return {lesson_id: LessonSketches.load(duration, correctness) for lesson_id, duration, correctness in rows}
+
+
+def lesson_sketches(lesson_id: int) -> Optional[LessonSketches]:
+    return sketches_for_lessons([lesson_id]).get(lesson_id)
+
+
+def rebuild_sketches(*, chunk_size: int = 10000) -> int:
+    """Recompute every lesson's sketches from archived then hot attempts, shard by shard; returns lessons written."""
+
+    sketches: Dict[int, LessonSketches] = {}
+    lesson_ids = set(Lesson.objects.values_list("pk", flat=True))
+    for segments, attempts in zip(
+        across_shards(AttemptArchiveSegment.objects.order_by("month", "student_id")),
+        across_shards(Attempt.objects.order_by("pk")),
+    ):
+        archived = (
+            (record.lesson_id, record.duration_sec, record.correctness)
+            for record in iter_archived_records(segments)
+            if record.lesson_id in lesson_ids
+        )
+        rows = attempts.values_list("lesson_id", "duration_sec", "correctness").iterator(chunk_size=chunk_size)
+        for lesson_id, duration_sec, correctness in chain(archived, rows):
+            lesson = sketches.get(lesson_id)
+            if lesson is None:
+                lesson = sketches[lesson_id] = LessonSketches.empty()
+            lesson.add(duration_sec, correctness)
+
+    with transaction.atomic():
+        LessonSketch.objects.all().delete()
+        LessonSketch.objects.bulk_create(
+            [
+                LessonSketch(
+                    lesson_id=lesson_id,
+                    duration=lesson.duration.to_bytes(),
+                    correctness=lesson.correctness.to_bytes(),
+                )
+                for lesson_id, lesson in sketches.items()
+            ],
+            batch_size=500,
+        )
+    return len(sketches)
+
+
+__all__ = [
+    "LessonSketches",
+    "STAT_QUANTILES",
+    "lesson_sketches",
+    "rebuild_sketches",
+    "record_attempt_sketch",
+    "sketches_for_lessons",
+]
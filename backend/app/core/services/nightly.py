@@ -0,0 +1,156 @@
+"""Batch generation of per-student recommendations for the nightly nudge job.
+
+Students are split into shards by id range. :func:`generate_shard` handles one
+shard with two queries, whatever its size: the shard's students, then their
+lesson-completion rows, whose running totals cover archived attempts too. It
+reuses a :class:`ReplayCatalog` snapshot that each worker process receives
+once. Every (student, course) pair in the shard is scored in one
+:func:`score_columns` call, vectorized when NumPy is available. The views'
+tie-break by course name applies, and ``score_candidate`` then builds the
+confidence and explanation for each student's top course. A shard's results
+therefore match what ``/api/students/<id>/recommendation/`` returns at the
+same instant.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+from ..models import LessonCompletion, Student
+from ..sharding import across_shards
+from .candidates import UNTOUCHED_RECENCY_DAYS, score_columns
+from .completion import decode_bits
+from .recommender import score_candidate
+from .replay import ReplayCatalog
+
+_catalog: Optional[ReplayCatalog] = None
+
+
+def init_worker(catalog: ReplayCatalog) -> None:
+    """Process-pool initializer: keep one catalog snapshot for every shard."""
+
+    global _catalog
+    import django
+    from django.apps import apps
+
+    if not apps.ready:  # spawn-based pools start without Django configured
+        django.setup()
+    _catalog = catalog
+
+
+def shard_ranges(first_id: int, last_id: int, shard_size: int) -> List[Tuple[int, int]]:
+    """Half-open ``[start, end)`` id ranges covering ``first_id..last_id``."""
+
+    return [(start, min(start + shard_size, last_id + 1)) for start in range(first_id, last_id + 1, shard_size)]
+
+
+def aggregate_course_state(catalog: ReplayCatalog, start: int, end: int) -> Dict[Tuple[int, int], list]:
+    """``(student, course) -> [completed bitmask, attempts, hints, latest timestamp]`` for one id range.
+
+    Read from the lesson-completion rows, which also count archived attempts.
+    The bitmask has one bit per lesson ``order_index``.
+    """
+
+    state: Dict[Tuple[int, int], list] = {}
+    completions = (
+        LessonCompletion.objects.filter(student_id__gte=start, student_id__lt=end)
+        .order_by()
+        .values_list("student_id", "course_id", "bits", "attempts_count", "hints_total", "last_attempt_at")
+    )
+    rows = chain.from_iterable(shard.iterator(chunk_size=10000) for shard in across_shards(completions))
+    for student_id, course_id, value, attempts, hints, latest in rows:
+        if not attempts or course_id not in catalog.rank:
+            continue
+        state[(student_id, course_id)] = [
+            decode_bits(value) & catalog.order_masks.get(course_id, -1),
+            attempts,
+            hints,
+            latest,
+        ]
+    return state
+
+
+def generate_shard(start: int, end: int, now_timestamp: float) -> List[Dict[str, object]]:
+    """Recommendations for students with ``start <= id < end``, in id order."""
+
+    catalog = _catalog
+    if catalog is None:
+        raise RuntimeError("init_worker() must run before generate_shard().")
+    now = datetime.fromtimestamp(now_timestamp, tz=timezone.utc)
+
+    students = list(
+        Student.objects.filter(pk__gte=start, pk__lt=end).order_by("pk").values_list("pk", "weak_tags")
+    )
+    if not students:
+        return []
+
+    state = aggregate_course_state(catalog, start, end)
+
+    courses = sorted(catalog.rank, key=catalog.rank.__getitem__)
+    columns: Dict[str, List[float]] = {
+        "progress_gap": [],
+        "recency_gap": [],
+        "tag_alignment": [],
+        "support_need": [],
+    }
+    for student_id, weak_tags in students:
+        focus = frozenset(weak_tags or ())
+        for course_id in courses:
+            columns["tag_alignment"].append(catalog.alignment(course_id, focus))
+            entry = state.get((student_id, course_id))
+            if entry is None:
+                columns["progress_gap"].append(0.0)
+                columns["recency_gap"].append(UNTOUCHED_RECENCY_DAYS)
+                columns["support_need"].append(0.0)
+                continue
+            total = catalog.lesson_totals[course_id]
+            columns["progress_gap"].append(bin(entry[0]).count("1") / total * 100.0 if total else 0.0)
+            columns["recency_gap"].append((now - entry[3]).total_seconds() / 86400.0)
+            columns["support_need"].append(entry[2] / entry[1])
+    scores = score_columns(columns)
+
+    results = []
+    width = len(courses)
+    generated_at = now.isoformat()
+    for row, (student_id, _) in enumerate(students):
+        offset = row * width
+        order = sorted(range(width), key=lambda index: -scores[offset + index])[:3]
+        if not order:
+            results.append(
+                {
+                    "student_id": student_id,
+                    "course_id": None,
+                    "score": 0.0,
+                    "confidence": 0.0,
+                    "explanation": "No courses available to recommend.",
+                    "alternatives": [],
+                    "generated_at": generated_at,
+                }
+            )
+            continue
+        top = offset + order[0]
+        result = score_candidate(
+            progress_percent=columns["progress_gap"][top],
+            recency_gap_days=columns["recency_gap"][top],
+            tag_alignment=columns["tag_alignment"][top],
+            hint_rate=columns["support_need"][top],
+        )
+        results.append(
+            {
+                "student_id": student_id,
+                "course_id": courses[order[0]],
+                "score": round(result.score, 4),
+                "confidence": round(result.confidence, 4),
+                "explanation": result.explanation,
+                "alternatives": [
+                    {"course_id": courses[index], "score": round(float(scores[offset + index]), 4)}
+                    for index in order[1:]
+                ],
+                "generated_at": generated_at,
+            }
+        )
+    return results
+
+
+__all__ = ["aggregate_course_state", "generate_shard", "init_worker", "shard_ranges"]
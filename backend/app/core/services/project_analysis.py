@@ -0,0 +1,93 @@
+"""Multi-file project analysis with per-file result caching.
+
+Results are cached by the SHA-256 of each file's content (and the analyzer's
+rule version), so resubmitting a project only analyzes the files that changed.
+Cache misses are analyzed inline by default. When
+``settings.CODE_ANALYSIS_WORKERS`` is greater than one, they go to a process
+pool shared by the requests of this worker, started on first use and shut
+down when the worker exits.
+"""
+from __future__ import annotations
+
+import atexit
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .code_analysis import RULE_VERSION, analyze_snippet
+
+_CACHE_PREFIX = "code-analysis"
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class FileReport:
+    path: str
+    sha256: str
+    cached: bool
+    issues: List[Dict[str, object]]
+
+
+def _cache_key(digest: str) -> str:
+    return f"{_CACHE_PREFIX}:{RULE_VERSION}:{digest}"
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=workers)
+            atexit.register(_executor.shutdown, cancel_futures=True)
+        return _executor
+
+
+def _analyze_many(sources: List[str]) -> List[List[Dict[str, object]]]:
+    workers = getattr(settings, "CODE_ANALYSIS_WORKERS", 0)
+    if workers > 1 and len(sources) > 1:
+        return list(_get_executor(workers).map(analyze_snippet, sources))
+    return [analyze_snippet(source) for source in sources]
+
+
+def analyze_project(files: Dict[str, str]) -> List[FileReport]:
+    """Analyze every file of a project, reusing cached results for unchanged content."""
+
+    digests = {
+        path: hashlib.sha256(source.encode("utf-8")).hexdigest() for path, source in files.items()
+    }
+    keys = {digest: _cache_key(digest) for digest in digests.values()}
+    cached = cache.get_many(list(keys.values()))
+    results: Dict[str, List[Dict[str, object]]] = {
+        digest: cached[key] for digest, key in keys.items() if key in cached
+    }
+
+    # Identical files share one analysis even on a cold cache.
+    pending: Dict[str, str] = {}
+    for path, digest in digests.items():
+        if digest not in results:
+            pending.setdefault(digest, files[path])
+    if pending:
+        fresh = dict(zip(pending, _analyze_many(list(pending.values()))))
+        cache.set_many(
+            {keys[digest]: issues for digest, issues in fresh.items()},
+            timeout=getattr(settings, "CODE_ANALYSIS_CACHE_TIMEOUT", 24 * 60 * 60),
+        )
+        results.update(fresh)
+
+    return [
+        FileReport(
+            path=path,
+            sha256=digest,
+            cached=digest not in pending,
+            issues=results[digest],
+        )
+        for path, digest in sorted(digests.items())
+    ]
+
+
+__all__ = ["FileReport", "analyze_project"]
@@ -0,0 +1,228 @@
+"""Move student-owned rows to the shard ``STUDENT_SHARDS`` assigns them.
+
+Run it with writers stopped, after changing ``STUDENT_SHARDS``:
+
+1. Each shard's attempt id sequence is raised into its id block.
+2. The catalog is copied to every shard, and rows deleted on ``default`` are
+   deleted from the copies.
+3. Every student row is mirrored to its home shard.
+4. Students with rows on a shard that is no longer their home are moved a
+   batch at a time. The copy and the delete for a batch each run in one
+   transaction per database, the copy committing first. A run interrupted
+   between the two leaves the batch on both shards; the next run skips the
+   attempts already copied and finishes the move.
+
+Moved attempts take new ids from the target shard's block. Their analysis and
+similarity-index rows follow them. Per-student aggregates and archive
+segments are replaced on the target; archived attempts keep their ids.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from ..models import (
+    Attempt,
+    AttemptAnalysis,
+    AttemptArchiveSegment,
+    Course,
+    Lesson,
+    LessonCompletion,
+    NightlyRecommendation,
+    Student,
+    StudentDailyActivity,
+    SubmissionBucket,
+    SubmissionSignature,
+)
+from ..sharding import ID_BLOCK, restore_auto_timestamps, shard_aliases, shard_for_student, upsert_rows
+from .archive import moving_attempts
+
+# Per-student rows nothing else points at, replaced wholesale on the target.
+_AGGREGATES = (LessonCompletion, StudentDailyActivity, NightlyRecommendation, AttemptArchiveSegment)
+
+
+@dataclass
+class RebalancePlan:
+    """Students to move, as ``(source, target) -> student ids``."""
+
+    moves: Dict[Tuple[str, str], List[int]] = field(default_factory=dict)
+
+    @property
+    def students(self) -> int:
+        return sum(len(student_ids) for student_ids in self.moves.values())
+
+
+def _copy(instance, **overrides):
+    values = {
+        model_field.attname: getattr(instance, model_field.attname)
+        for model_field in instance._meta.concrete_fields
+        if not model_field.primary_key
+    }
+    values.update(overrides)
+    return type(instance)(**values)
+
+
+def reset_attempt_sequences() -> None:
+    """Make each shard after ``default`` allocate attempt ids at or above its block start."""
+
+    table = Attempt._meta.db_table
+    for position, alias in enumerate(shard_aliases()):
+        if not position:
+            continue
+        floor = position * ID_BLOCK
+        connection = connections[alias]
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, floor])
+                elif row[0] < floor:
+                    cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = %s", [floor, table])
+            elif connection.vendor == "postgresql":
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence(%s, 'id'), GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM {table})))",
+                    [table, floor],
+                )
+
+
+def replicate_catalog(*, batch_size: int = 1000) -> Dict[str, int]:
+    """Copy every course and lesson from ``default`` to the other shards; returns rows copied per shard."""
+
+    courses = list(Course.objects.using(DEFAULT_DB_ALIAS).order_by("pk"))
+    lessons = list(Lesson.objects.using(DEFAULT_DB_ALIAS).order_by("pk"))
+    copied = {}
+    for alias in shard_aliases():
+        if alias == DEFAULT_DB_ALIAS:
+            continue
+        with transaction.atomic(using=alias):
+            upsert_rows(Course, alias, courses, batch_size=batch_size)
+            upsert_rows(Lesson, alias, lessons, batch_size=batch_size)
+            for model in (Lesson, Course):
+                # Read the copies before the originals: a row saved meanwhile is
+                # committed on default before its copy lands, so it is never stale.
+                copies = set(model.objects.using(alias).values_list("pk", flat=True))
+                originals = set(model.objects.using(DEFAULT_DB_ALIAS).values_list("pk", flat=True))
+                model.objects.using(alias).filter(pk__in=copies - originals).delete()
+        copied[alias] = len(courses) + len(lessons)
+    return copied
+
+
+def mirror_students(*, batch_size: int = 1000) -> int:
+    """Upsert every student onto its home shard; returns rows written outside ``default``."""
+
+    written = 0
+    students = Student.objects.using(DEFAULT_DB_ALIAS).order_by("pk")
+    pending: Dict[str, List[Student]] = {}
+    for student in students.iterator(chunk_size=batch_size):
+        home = shard_for_student(student.pk)
+        if home == DEFAULT_DB_ALIAS:
+            continue
+        pending.setdefault(home, []).append(student)
+        if len(pending[home]) >= batch_size:
+            upsert_rows(Student, home, pending.pop(home), batch_size=batch_size)
+            written += batch_size
+    for home, batch in pending.items():
+        upsert_rows(Student, home, batch, batch_size=batch_size)
+        written += len(batch)
+    return written
+
+
+def _students_with_rows(alias: str) -> Iterable[int]:
+    owners = set(Attempt.objects.using(alias).order_by().values_list("student_id", flat=True).distinct())
+    for model in _AGGREGATES:
+        owners.update(model.objects.using(alias).order_by().values_list("student_id", flat=True).distinct())
+    return sorted(owners)
+
+
+def plan_rebalance() -> RebalancePlan:
+    plan = RebalancePlan()
+    for source in shard_aliases():
+        for student_id in _students_with_rows(source):
+            target = shard_for_student(student_id)
+            if target != source:
+                plan.moves.setdefault((source, target), []).append(student_id)
+    return plan
+
+
+def _copy_students(source: str, target: str, student_ids: List[int], batch_size: int) -> None:
+    copied = set(
+        Attempt.objects.using(target)
+        .filter(student_id__in=student_ids)
+        .values_list("student_id", "lesson_id", "timestamp")
+    )
+    attempts = [
+        attempt
+        for attempt in Attempt.objects.using(source).filter(student_id__in=student_ids).order_by("pk")
+        if (attempt.student_id, attempt.lesson_id, attempt.timestamp) not in copied
+    ]
+    copies = Attempt.objects.using(target).bulk_create([_copy(attempt) for attempt in attempts], batch_size=batch_size)
+    attempt_ids = {attempt.pk: copy.pk for attempt, copy in zip(attempts, copies)}
+
+    analyses = list(AttemptAnalysis.objects.using(source).filter(attempt_id__in=list(attempt_ids)))
+    analysis_copies = AttemptAnalysis.objects.using(target).bulk_create(
+        [_copy(analysis, attempt_id=attempt_ids[analysis.attempt_id]) for analysis in analyses],
+        batch_size=batch_size,
+    )
+    restore_auto_timestamps(AttemptAnalysis, target, analyses, analysis_copies, batch_size=batch_size)
+    signatures = list(
+        SubmissionSignature.objects.using(source).filter(attempt_id__in=list(attempt_ids)).order_by("pk")
+    )
+    signature_copies = SubmissionSignature.objects.using(target).bulk_create(
+        [_copy(signature, attempt_id=attempt_ids[signature.attempt_id]) for signature in signatures],
+        batch_size=batch_size,
+    )
+    signature_ids = {signature.pk: copy.pk for signature, copy in zip(signatures, signature_copies)}
+    buckets = SubmissionBucket.objects.using(source).filter(signature_id__in=list(signature_ids))
+    SubmissionBucket.objects.using(target).bulk_create(
+        [_copy(bucket, signature_id=signature_ids[bucket.signature_id]) for bucket in buckets],
+        batch_size=batch_size,
+    )
+
+    for model in _AGGREGATES:
+        model.objects.using(target).filter(student_id__in=student_ids).delete()
+        model.objects.using(target).bulk_create(
+            [_copy(row) for row in model.objects.using(source).filter(student_id__in=student_ids)],
+            batch_size=batch_size,
+        )
+
+
+def _delete_students(source: str, student_ids: List[int]) -> None:
+    # Deleting the attempts cascades to their analysis and index rows.
+    with moving_attempts():
+        Attempt.objects.using(source).filter(student_id__in=student_ids).delete()
+    for model in _AGGREGATES:
+        model.objects.using(source).filter(student_id__in=student_ids).delete()
+    if source != DEFAULT_DB_ALIAS:
+        Student.objects.using(source).filter(pk__in=student_ids).delete()
+
+
+def rebalance_shards(*, batch_size: int = 200, dry_run: bool = False) -> RebalancePlan:
+    """Bring every shard in line with ``STUDENT_SHARDS``; returns the moves made (or planned, with ``dry_run``)."""
+
+    plan = plan_rebalance()
+    if dry_run:
+        return plan
+    reset_attempt_sequences()
+    replicate_catalog()
+    mirror_students()
+    for (source, target), student_ids in plan.moves.items():
+        for offset in range(0, len(student_ids), batch_size):
+            batch = student_ids[offset : offset + batch_size]
+            with transaction.atomic(using=target):
+                _copy_students(source, target, batch, batch_size=1000)
+            with transaction.atomic(using=source):
+                _delete_students(source, batch)
+    return plan
+
+
+__all__ = [
+    "RebalancePlan",
+    "mirror_students",
+    "plan_rebalance",
+    "rebalance_shards",
+    "replicate_catalog",
+    "reset_attempt_sequences",
+]
@@ -10,13 +10,26 @@ def _clamp(value: float, *, lower: float = 0.0, upper: float = 1.0) -> float:
     return max(lower, min(upper, value))
 
 
+@dataclass(frozen=True)
+class ClampedNormalizer:
+    """``transform(value)`` clamped to ``[0, 1]``.
+
+    ``transform`` only uses arithmetic, so it also maps whole NumPy arrays.
+    """
+
+    transform: Callable[[float], float]
+
+    def __call__(self, value: float) -> float:
+        return _clamp(self.transform(value))
+
+
 @dataclass(frozen=True)
 class FeatureDefinition:
     """Metadata describing how a particular feature contributes to the score."""
 
     key: str
     weight: float
-    normalizer: Callable[[float], float]
+    normalizer: ClampedNormalizer
     formatter: Callable[[float], str]
 
 
@@ -49,13 +62,13 @@ FEATURES: Iterable[FeatureDefinition] = (
     FeatureDefinition(
         key="progress_gap",
         weight=0.4,
-        normalizer=lambda progress_percent: _clamp((100.0 - progress_percent) / 100.0),
+        normalizer=ClampedNormalizer(lambda progress_percent: (100.0 - progress_percent) / 100.0),
         formatter=lambda progress_percent: f"{100 - round(progress_percent)}% of lessons still to go",
     ),
     FeatureDefinition(
         key="recency_gap",
         weight=0.25,
-        normalizer=lambda gap_days: _clamp(gap_days / 14.0),
+        normalizer=ClampedNormalizer(lambda gap_days: gap_days / 14.0),
         formatter=lambda gap_days: (
             "No activity yet" if gap_days == float("inf") else f"Last activity {gap_days:.1f} days ago"
         ),
@@ -63,13 +76,13 @@ FEATURES: Iterable[FeatureDefinition] = (
     FeatureDefinition(
         key="tag_alignment",
         weight=0.2,
-        normalizer=lambda alignment: _clamp(alignment),
+        normalizer=ClampedNormalizer(lambda alignment: alignment),
         formatter=lambda alignment: f"Covers {round(alignment * 100)}% of focus areas",
     ),
     FeatureDefinition(
         key="support_need",
         weight=0.15,
-        normalizer=lambda hint_rate: _clamp(hint_rate / 3.0),
+        normalizer=ClampedNormalizer(lambda hint_rate: hint_rate / 3.0),
         formatter=lambda hint_rate: f"Average of {hint_rate:.1f} hints used per attempt",
     ),
 )
@@ -131,6 +144,7 @@ def score_candidate(
 
 
 __all__ = [
+    "ClampedNormalizer",
     "FeatureDefinition",
     "FeatureResult",
     "RecommendationResult",
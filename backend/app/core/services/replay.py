@@ -0,0 +1,365 @@
+"""Offline replay of attempt history against alternative recommender weights.
+
+The replay walks every attempt once in ``(timestamp, id)`` order. It keeps the
+same per-(student, course) state the live views derive: lessons completed,
+last activity, attempts and hints. Each *decision point* is an attempt that
+starts a session, meaning the student's first attempt or one that follows a
+gap of at least ``session_gap`` seconds. At that point the engine ranks every
+course under each weight set from the state as it was just before the
+attempt. It then checks whether the course the student actually opened was
+the top pick (hit@1) or among the three courses the API shows (hit@N).
+
+Nothing is recomputed from scratch per event. Touched courses are scored from
+their running state. Untouched courses score the same for every student with
+the same ``weak_tags``, so their ranking is computed once per tag set and
+weight set and then merged in. A decision costs O(touched courses + N) per
+weight set, and memory is O(students x touched courses).
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ..models import Course, Lesson, Student
+from .archive import iter_attempt_records
+from .recommender import FEATURES
+
+# Recency assumed for a course without activity, as in the live views.
+UNTOUCHED_RECENCY_DAYS = 30.0
+_FEATURE_KEYS = tuple(feature.key for feature in FEATURES)
+_NORMALIZERS = tuple(feature.normalizer for feature in FEATURES)
+# The only input that changes without a new attempt; everything else is cached.
+_TIME_INDEX = _FEATURE_KEYS.index("recency_gap")
+_recency_normalizer = _NORMALIZERS[_TIME_INDEX]
+
+
+@dataclass(frozen=True)
+class WeightSet:
+    name: str
+    weights: Tuple[float, ...]
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(zip(_FEATURE_KEYS, self.weights))
+
+
+def baseline_weights() -> WeightSet:
+    return WeightSet("baseline", tuple(feature.weight for feature in FEATURES))
+
+
+def parse_weight_set(spec: str) -> WeightSet:
+    """``"name:recency_gap=0.4,progress_gap=0.25"``; unnamed features keep their current weight."""
+
+    name, separator, assignments = spec.partition(":")
+    if not separator or not name:
+        raise ValueError(f"Weight set {spec!r} must look like name:feature=weight,...")
+    weights = dict(zip(_FEATURE_KEYS, baseline_weights().weights))
+    for assignment in filter(None, assignments.split(",")):
+        key, _, value = assignment.partition("=")
+        key = key.strip()
+        if key not in weights:
+            raise ValueError(f"Unknown feature {key!r}; expected one of {', '.join(_FEATURE_KEYS)}.")
+        try:
+            weights[key] = float(value)
+        except ValueError:
+            raise ValueError(f"Weight for {key!r} must be a number, got {value!r}.") from None
+    return WeightSet(name, tuple(weights[key] for key in _FEATURE_KEYS))
+
+
+def _raw_inputs(progress_percent: float, recency_gap_days: float, tag_alignment: float, hint_rate: float):
+    # Keyed like score_candidate's inputs, in FEATURES order.
+    raw = {
+        "progress_gap": progress_percent,
+        "recency_gap": recency_gap_days,
+        "tag_alignment": tag_alignment,
+        "support_need": hint_rate,
+    }
+    return [raw[key] for key in _FEATURE_KEYS]
+
+
+def _score(weights: Sequence[float], raw_values: Sequence[float]) -> float:
+    # Same operations in the same order as score_candidate, so ties match.
+    return sum(weight * normalizer(value) for weight, normalizer, value in zip(weights, _NORMALIZERS, raw_values))
+
+
+class ReplayCatalog:
+    """Course facts the replay needs, keyed for O(1) lookup per attempt."""
+
+    def __init__(
+        self,
+        courses: Iterable[Tuple[int, Iterable[str], Sequence[int]]],
+        order_masks: Optional[Dict[int, int]] = None,
+    ) -> None:
+        # ``courses`` must be in the order the views list them (by name); ties
+        # in score keep that order, as the views' stable sort does.
+        # ``order_masks`` has each course's lesson ``order_index`` bitmap, for
+        # reading lesson-completion rows.
+        self.order_masks: Dict[int, int] = dict(order_masks or {})
+        self.rank: Dict[int, int] = {}
+        self.tags: Dict[int, FrozenSet[str]] = {}
+        self.lesson_totals: Dict[int, int] = {}
+        self.lessons: Dict[int, Tuple[int, int]] = {}
+        for rank, (course_id, tags, lesson_ids) in enumerate(courses):
+            self.rank[course_id] = rank
+            self.tags[course_id] = frozenset(tags or ())
+            self.lesson_totals[course_id] = len(lesson_ids)
+            for position, lesson_id in enumerate(lesson_ids):
+                self.lessons[lesson_id] = (course_id, 1 << position)
+
+    @classmethod
+    def load(cls) -> "ReplayCatalog":
+        lesson_ids: Dict[int, List[int]] = {}
+        order_masks: Dict[int, int] = {}
+        for lesson_id, course_id, order_index in Lesson.objects.order_by("course_id", "order_index").values_list(
+            "pk", "course_id", "order_index"
+        ):
+            lesson_ids.setdefault(course_id, []).append(lesson_id)
+            order_masks[course_id] = order_masks.get(course_id, 0) | 1 << order_index
+        return cls(
+            (
+                (course_id, tags, lesson_ids.get(course_id, []))
+                for course_id, tags in Course.objects.order_by("name").values_list("pk", "tags")
+            ),
+            order_masks,
+        )
+
+    def alignment(self, course_id: int, focus: FrozenSet[str]) -> float:
+        course_tags = self.tags[course_id]
+        if not course_tags or not focus:
+            return 0.0
+        return len(course_tags & focus) / len(focus)
+
+
+class _CourseState:
+    __slots__ = ("completed_mask", "completed", "last_seen", "attempts", "hints", "terms")
+
+    def __init__(self) -> None:
+        self.completed_mask = 0
+        self.completed = 0
+        self.last_seen = 0.0
+        self.attempts = 0
+        self.hints = 0
+        # Per weight set: (sum of contributions before recency, recency weight,
+        # contributions after recency). Cleared by each attempt on the course
+        # and rebuilt at the next decision point that needs it.
+        self.terms: Optional[List[Tuple[float, float, Tuple[float, ...]]]] = None
+
+
+class _StudentState:
+    __slots__ = ("focus", "last_seen", "courses")
+
+    def __init__(self, focus: FrozenSet[str]) -> None:
+        self.focus = focus
+        self.last_seen: Optional[float] = None
+        self.courses: Dict[int, _CourseState] = {}
+
+
+@dataclass
+class ReplayStats:
+    name: str
+    weights: Dict[str, float]
+    decisions: int = 0
+    hits_at_1: int = 0
+    hits_at_n: int = 0
+    changed_from_baseline: int = 0
+
+    def _rate(self, count: int) -> float:
+        return round(count / self.decisions, 4) if self.decisions else 0.0
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "name": self.name,
+            "weights": self.weights,
+            "decisions": self.decisions,
+            "hit_rate_at_1": self._rate(self.hits_at_1),
+            "hit_rate_at_n": self._rate(self.hits_at_n),
+            "changed_from_baseline": self._rate(self.changed_from_baseline),
+        }
+
+
+class ReplayEngine:
+    """Incremental replay state; feed attempts in timestamp order."""
+
+    def __init__(
+        self,
+        catalog: ReplayCatalog,
+        weight_sets: Sequence[WeightSet],
+        *,
+        student_focus: Optional[Dict[int, Iterable[str]]] = None,
+        session_gap: float = 3600.0,
+        top_n: int = 3,
+    ) -> None:
+        if not weight_sets:
+            raise ValueError("At least one weight set is required.")
+        self.catalog = catalog
+        self.weight_sets = list(weight_sets)
+        self.session_gap = session_gap
+        self.top_n = top_n
+        self.events = 0
+        self.stats = [ReplayStats(weights.name, weights.as_dict()) for weights in self.weight_sets]
+        self._focus = {student_id: frozenset(tags or ()) for student_id, tags in (student_focus or {}).items()}
+        self._students: Dict[int, _StudentState] = {}
+        self._untouched: Dict[FrozenSet[str], List[List[Tuple[float, int, int]]]] = {}
+
+    def _untouched_rankings(self, focus: FrozenSet[str]) -> List[List[Tuple[float, int, int]]]:
+        rankings = self._untouched.get(focus)
+        if rankings is None:
+            catalog = self.catalog
+            raw = {
+                course_id: _raw_inputs(0.0, UNTOUCHED_RECENCY_DAYS, catalog.alignment(course_id, focus), 0.0)
+                for course_id in catalog.rank
+            }
+            rankings = self._untouched[focus] = [
+                sorted(
+                    (-_score(weights.weights, values), catalog.rank[course_id], course_id)
+                    for course_id, values in raw.items()
+                )
+                for weights in self.weight_sets
+            ]
+        return rankings
+
+    def _refresh_terms(self, course_id: int, course: _CourseState, focus: FrozenSet[str]) -> List[tuple]:
+        total = self.catalog.lesson_totals[course_id]
+        raw = _raw_inputs(
+            course.completed / total * 100.0 if total else 0.0,
+            0.0,
+            self.catalog.alignment(course_id, focus),
+            course.hints / course.attempts,
+        )
+        normalized = [normalizer(value) for normalizer, value in zip(_NORMALIZERS, raw)]
+        terms = []
+        for weights in self.weight_sets:
+            contributions = [weight * value for weight, value in zip(weights.weights, normalized)]
+            terms.append(
+                (
+                    sum(contributions[:_TIME_INDEX]),
+                    weights.weights[_TIME_INDEX],
+                    tuple(contributions[_TIME_INDEX + 1:]),
+                )
+            )
+        course.terms = terms
+        return terms
+
+    def _rank(self, student: _StudentState, now: float) -> List[List[int]]:
+        rank = self.catalog.rank
+        touched = [
+            (
+                course_id,
+                rank[course_id],
+                _recency_normalizer((now - course.last_seen) / 86400.0),
+                course.terms or self._refresh_terms(course_id, course, student.focus),
+            )
+            for course_id, course in student.courses.items()
+        ]
+        picks = []
+        top_n = self.top_n
+        for index, untouched in enumerate(self._untouched_rankings(student.focus)):
+            candidates = [
+                (-sum(terms[index][2], terms[index][0] + terms[index][1] * recency), course_rank, course_id)
+                for course_id, course_rank, recency, terms in touched
+            ]
+            needed = top_n
+            for entry in untouched:
+                if entry[2] not in student.courses:
+                    candidates.append(entry)
+                    needed -= 1
+                    if needed == 0:
+                        break
+            candidates.sort()
+            picks.append([course_id for _, _, course_id in candidates[:top_n]])
+        return picks
+
+    def recommend(self, student_id: int, now: float) -> List[List[int]]:
+        """Top course ids per weight set for ``student_id`` at ``now`` (epoch seconds)."""
+
+        return self._rank(self._student(student_id), now)
+
+    def _student(self, student_id: int) -> _StudentState:
+        student = self._students.get(student_id)
+        if student is None:
+            student = self._students[student_id] = _StudentState(self._focus.get(student_id, frozenset()))
+        return student
+
+    def feed(self, student_id: int, lesson_id: int, when: float, hints_used: int) -> None:
+        located = self.catalog.lessons.get(lesson_id)
+        if located is None:
+            return
+        course_id, lesson_bit = located
+        self.events += 1
+        student = self._student(student_id)
+
+        if student.last_seen is None or when - student.last_seen >= self.session_gap:
+            picks = self._rank(student, when)
+            baseline_top = picks[0][0] if picks[0] else None
+            for stats, top in zip(self.stats, picks):
+                stats.decisions += 1
+                if top and top[0] == course_id:
+                    stats.hits_at_1 += 1
+                if course_id in top:
+                    stats.hits_at_n += 1
+                if top and top[0] != baseline_top:
+                    stats.changed_from_baseline += 1
+        student.last_seen = when
+
+        course = student.courses.get(course_id)
+        if course is None:
+            course = student.courses[course_id] = _CourseState()
+        if not course.completed_mask & lesson_bit:
+            course.completed_mask |= lesson_bit
+            course.completed += 1
+        if when > course.last_seen:
+            course.last_seen = when
+        course.attempts += 1
+        course.hints += hints_used
+        course.terms = None
+
+
+def iter_attempt_history(chunk_size: int = 10000, limit: Optional[int] = None) -> Iterator[Tuple[int, int, float, int]]:
+    """``(student_id, lesson_id, epoch seconds, hints_used)`` for every attempt, archived ones too, oldest first."""
+
+    records = iter_attempt_records(with_code=False, chunk_size=chunk_size)
+    for record in islice(records, limit):
+        yield record.student_id, record.lesson_id, record.timestamp.timestamp(), record.hints_used
+
+
+def replay_history(
+    weight_sets: Sequence[WeightSet],
+    *,
+    session_gap: float = 3600.0,
+    top_n: int = 3,
+    chunk_size: int = 10000,
+    limit: Optional[int] = None,
+    progress: Optional[Callable[[int], None]] = None,
+    progress_every: int = 1_000_000,
+) -> Tuple[ReplayEngine, float]:
+    """Replay the stored attempts once; returns the engine and elapsed seconds."""
+
+    started = time.perf_counter()
+    engine = ReplayEngine(
+        ReplayCatalog.load(),
+        weight_sets,
+        student_focus=dict(Student.objects.values_list("pk", "weak_tags").iterator(chunk_size=chunk_size)),
+        session_gap=session_gap,
+        top_n=top_n,
+    )
+    feed = engine.feed
+    for index, (student_id, lesson_id, when, hints_used) in enumerate(
+        iter_attempt_history(chunk_size, limit), start=1
+    ):
+        feed(student_id, lesson_id, when, hints_used)
+        if progress is not None and index % progress_every == 0:
+            progress(index)
+    return engine, time.perf_counter() - started
+
+
+__all__ = [
+    "ReplayCatalog",
+    "ReplayEngine",
+    "ReplayStats",
+    "WeightSet",
+    "baseline_weights",
+    "iter_attempt_history",
+    "parse_weight_set",
+    "replay_history",
+]
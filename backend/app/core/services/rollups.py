@@ -0,0 +1,218 @@
+"""Daily activity rollups per (student, course) and per lesson.
+
+Every new attempt adds its counts to two rows: the student's day in the
+lesson's course, and the lesson's day. Each write is a single
+``INSERT ... ON CONFLICT DO UPDATE`` that adds to the stored totals, so
+concurrent inserts never lose counts. SQLite and PostgreSQL both support that
+statement. Days are calendar dates in the project ``TIME_ZONE``.
+
+Student days live on the student's shard and lesson days on ``default`` (see
+``core.sharding``).
+
+An attempt edited or deleted through the ORM is subtracted from both rows in
+SQL (:func:`remove_attempt_activity`), and days left with no attempts are
+deleted; an edit then adds the new version. Moves to the
+archive or another shard leave the rollups as they are.
+
+A timeline reads at most one row per day per course, however many attempts
+those days hold. Bulk loads and queryset ``update()`` calls that bypass
+signals call :func:`rebuild_rollups`, as the ``rebuild_rollups`` command does.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from itertools import chain
+from typing import Dict, List, Optional
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import F, Max, Min
+from django.utils import timezone
+
+from ..models import Attempt, AttemptArchiveSegment, Lesson, LessonDailyActivity, StudentDailyActivity
+from ..sharding import shard_aliases, student_connection
+from .archive import iter_archived_records
+
+_TOTALS = ("attempts", "duration_total", "correctness_total", "hints_total")
+
+
+def _upsert_sql(model, key_columns) -> str:
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = list(key_columns) + list(_TOTALS)
+    return "INSERT INTO {table} ({columns}) VALUES ({values}) ON CONFLICT ({keys}) DO UPDATE SET {updates}".format(
+        table=table,
+        columns=", ".join(quote(column) for column in columns),
+        values=", ".join(["%s"] * len(columns)),
+        keys=", ".join(quote(column) for column in key_columns),
+        updates=", ".join(
+            f"{quote(column)} = {table}.{quote(column)} + excluded.{quote(column)}" for column in _TOTALS
+        ),
+    )
+
+
+def record_attempt_activity(attempt: Attempt) -> None:
+    """Add one new attempt to its student-course day and its lesson day."""
+
+    day = connection.ops.adapt_datefield_value(timezone.localdate(attempt.timestamp))
+    totals = [1, attempt.duration_sec, attempt.correctness, attempt.hints_used]
+    with student_connection(attempt.student_id).cursor() as cursor:
+        cursor.execute(
+            _upsert_sql(StudentDailyActivity, ("student_id", "course_id", "day")),
+            [attempt.student_id, attempt.lesson.course_id, day] + totals,
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(_upsert_sql(LessonDailyActivity, ("lesson_id", "day")), [attempt.lesson_id, day] + totals)
+
+
+def remove_attempt_activity(attempt: Attempt, *, student_day: bool = True, lesson_day: bool = True) -> None:
+    """Take one attempt back out of its student-course day and its lesson day.
+
+    Pass ``student_day=False`` or ``lesson_day=False`` when that row is being
+    deleted along with the attempt's student, course or lesson.
+    """
+
+    day = timezone.localdate(attempt.timestamp)
+    changes = {
+        "attempts": F("attempts") - 1,
+        "duration_total": F("duration_total") - attempt.duration_sec,
+        "correctness_total": F("correctness_total") - attempt.correctness,
+        "hints_total": F("hints_total") - attempt.hints_used,
+    }
+    days = []
+    if student_day:
+        days.append(
+            StudentDailyActivity.objects.for_student(attempt.student_id).filter(
+                course_id=attempt.lesson.course_id, day=day
+            )
+        )
+    if lesson_day:
+        days.append(LessonDailyActivity.objects.using(DEFAULT_DB_ALIAS).filter(lesson_id=attempt.lesson_id, day=day))
+    for rows in days:
+        rows.update(**changes)
+        rows.filter(attempts__lte=0).delete()
+
+
+def _insert_sql(model, key_columns) -> str:
+    quote = connection.ops.quote_name
+    columns = list(key_columns) + list(_TOTALS)
+    return "INSERT INTO {} ({}) VALUES ({})".format(
+        quote(model._meta.db_table),
+        ", ".join(quote(column) for column in columns),
+        ", ".join(["%s"] * len(columns)),
+    )
+
+
+def _add(rollup: Dict[tuple, list], key: tuple, duration: int, correctness: float, hints: int) -> None:
+    totals = rollup.get(key)
+    if totals is None:
+        rollup[key] = [1, duration, correctness, hints]
+        return
+    totals[0] += 1
+    totals[1] += duration
+    totals[2] += correctness
+    totals[3] += hints
+
+
+def _write(cursor, sql: str, rollup: Dict[tuple, list], batch_size: int) -> int:
+    adapt_day = connection.ops.adapt_datefield_value
+    rows = [key[:-1] + (adapt_day(key[-1]),) + tuple(totals) for key, totals in rollup.items()]
+    for offset in range(0, len(rows), batch_size):
+        cursor.executemany(sql, rows[offset : offset + batch_size])
+    return len(rows)
+
+
+def rebuild_rollups(since: Optional[date] = None, *, batch_size: int = 2000) -> Dict[str, int]:
+    """Recompute both rollup tables from attempts, for every day or from ``since`` on.
+
+    Hot and archived attempts are read once, shard by shard and a range of
+    student ids at a time, and the days are totalled in Python. Student-course
+    days are written to their shard after each range. Lesson days are bounded
+    by lessons x days, so they are written to ``default`` once at the end.
+    """
+
+    cutoff = timezone.make_aware(datetime.combine(since, time.min)) if since is not None else None
+    zone = timezone.get_current_timezone()
+    student_sql = _insert_sql(StudentDailyActivity, ("student_id", "course_id", "day"))
+    lesson_sql = _insert_sql(LessonDailyActivity, ("lesson_id", "day"))
+    written = {"student_days": 0, "lesson_days": 0}
+    lesson_rollup: Dict[tuple, list] = {}
+
+    with transaction.atomic():
+        for alias in shard_aliases():
+            attempts = Attempt.objects.on_shard(alias).order_by()
+            segments = AttemptArchiveSegment.objects.on_shard(alias).order_by()
+            student_days = StudentDailyActivity.objects.on_shard(alias)
+            if since is not None:
+                attempts = attempts.filter(timestamp__gte=cutoff)
+                segments = segments.filter(last_at__gte=cutoff)
+                student_days = student_days.filter(day__gte=since)
+            courses = dict(Lesson.objects.using(attempts.db).values_list("pk", "course_id"))
+            with transaction.atomic(using=attempts.db), connections[attempts.db].cursor() as cursor:
+                student_days.delete()
+                hot = attempts.aggregate(first=Min("student_id"), last=Max("student_id"))
+                cold = segments.aggregate(first=Min("student_id"), last=Max("student_id"))
+                firsts = [bound for bound in (hot["first"], cold["first"]) if bound is not None]
+                if not firsts:
+                    continue
+                last = max(bound for bound in (hot["last"], cold["last"]) if bound is not None)
+                for start in range(min(firsts), last + 1, batch_size):
+                    student_rollup: Dict[tuple, list] = {}
+                    in_range = {"student_id__gte": start, "student_id__lt": start + batch_size}
+                    fields = ("student_id", "lesson_id", "timestamp", "duration_sec", "correctness", "hints_used")
+                    rows = attempts.filter(**in_range).values_list(*fields).iterator(chunk_size=10000)
+                    # Archived attempts of deleted lessons have no course left to count towards.
+                    archived = (
+                        tuple(getattr(record, field) for field in fields)
+                        for record in iter_archived_records(segments.filter(**in_range), start=cutoff)
+                        if record.lesson_id in courses
+                    )
+                    for student_id, lesson_id, timestamp, duration, correctness, hints in chain(rows, archived):
+                        day = timestamp.astimezone(zone).date()
+                        _add(student_rollup, (student_id, courses[lesson_id], day), duration, correctness, hints)
+                        _add(lesson_rollup, (lesson_id, day), duration, correctness, hints)
+                    written["student_days"] += _write(cursor, student_sql, student_rollup, batch_size)
+
+        lesson_days = LessonDailyActivity.objects.using(DEFAULT_DB_ALIAS)
+        if since is not None:
+            lesson_days = lesson_days.filter(day__gte=since)
+        lesson_days.delete()
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            written["lesson_days"] = _write(cursor, lesson_sql, lesson_rollup, batch_size)
+    return written
+
+
+@dataclass
+class TimelineDay:
+    day: date
+    attempts: int
+    duration_total: int
+    correctness_total: float
+    hints_total: int
+
+    @property
+    def mean_correctness(self) -> float:
+        return self.correctness_total / self.attempts if self.attempts else 0.0
+
+
+def load_student_timeline(
+    student_id: int, start: date, end: date, *, course_id: Optional[int] = None
+) -> Dict[int, List[TimelineDay]]:
+    """``course_id -> active days`` between ``start`` and ``end`` inclusive, oldest first."""
+
+    rows = StudentDailyActivity.objects.for_student(student_id).filter(day__gte=start, day__lte=end)
+    if course_id is not None:
+        rows = rows.filter(course_id=course_id)
+    timeline: Dict[int, List[TimelineDay]] = {}
+    for course, day, *totals in rows.order_by("course_id", "day").values_list("course_id", "day", *_TOTALS):
+        timeline.setdefault(course, []).append(TimelineDay(day, *totals))
+    return timeline
+
+
+__all__ = [
+    "TimelineDay",
+    "load_student_timeline",
+    "rebuild_rollups",
+    "record_attempt_activity",
+    "remove_attempt_activity",
+]
@@ -0,0 +1,220 @@
+"""Full-text search over the course catalog.
+
+Every course and every lesson has a :class:`SearchDocument` row. Signals keep
+the rows current on save, and foreign-key cascades remove them on delete.
+Migration 0008 adds a database-specific index over them:
+
+* SQLite: an FTS5 external-content table, maintained by triggers, with
+  prefix indexes for 2- and 3-character prefixes. Results are ranked with
+  ``bm25``, weighting title over tags over body.
+* PostgreSQL: a generated ``tsvector`` column weighted the same way, with a
+  GIN index, ranked with ``ts_rank``. Tag filters use a second GIN index on
+  ``tag_keys``, a generated column of the lower-cased tags (migration 0010).
+
+Other databases fall back to ``icontains`` scans. Every query term matches
+as a prefix ("loo" finds "Loops"), and all terms must match. Tags match
+whole and ignore case on every backend.
+"""
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from ..models import Course, Lesson, SearchDocument
+
+MAX_TERMS = 8
+_TERM = re.compile(r"\w+")
+_FTS_TABLE = "core_searchdocument_fts"
+# bm25 column weights for (title, body, tags_text).
+_FTS_WEIGHTS = (10.0, 2.0, 4.0)
+_fts_available: Dict[Tuple[str, str], bool] = {}
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    course_id: int
+    course_name: str
+    lesson_id: Optional[int]
+    title: str
+    tags: List[str]
+    score: float
+
+    @property
+    def kind(self) -> str:
+        return "course" if self.lesson_id is None else "lesson"
+
+
+def search_terms(text: str) -> List[str]:
+    """Lower-cased word tokens of ``text``, de-duplicated, at most ``MAX_TERMS``."""
+
+    terms: List[str] = []
+    for term in _TERM.findall(text.lower()):
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+def _tags_text(tags: Sequence[str]) -> str:
+    return " ".join(str(tag).lower() for tag in tags or [])
+
+
+def _course_document(course: Course) -> Dict[str, object]:
+    return {
+        "title": course.name,
+        "body": course.description,
+        "tags": list(course.tags or []),
+        "tags_text": _tags_text(course.tags),
+    }
+
+
+def _lesson_document(lesson: Lesson, course_name: str) -> Dict[str, object]:
+    # The course name goes in the body so "python loops" finds the Loops lesson of Python Basics.
+    return {
+        "course_id": lesson.course_id,
+        "title": lesson.title,
+        "body": course_name,
+        "tags": list(lesson.tags or []),
+        "tags_text": _tags_text(lesson.tags),
+    }
+
+
+def index_course(course: Course) -> None:
+    with transaction.atomic():
+        SearchDocument.objects.update_or_create(
+            course_id=course.pk, lesson__isnull=True, defaults=_course_document(course)
+        )
+        SearchDocument.objects.filter(course_id=course.pk, lesson__isnull=False).exclude(body=course.name).update(
+            body=course.name
+        )
+
+
+def index_lesson(lesson: Lesson) -> None:
+    SearchDocument.objects.update_or_create(lesson_id=lesson.pk, defaults=_lesson_document(lesson, lesson.course.name))
+
+
+def rebuild_search_index(*, batch_size: int = 1000) -> int:
+    """Recreate every search document from the catalog; returns documents written."""
+
+    course_names: Dict[int, str] = {}
+    documents: List[SearchDocument] = []
+    for course in Course.objects.order_by("pk").only("pk", "name", "description", "tags"):
+        course_names[course.pk] = course.name
+        documents.append(SearchDocument(course_id=course.pk, **_course_document(course)))
+    for lesson in Lesson.objects.order_by("pk").only("pk", "course_id", "title", "tags"):
+        documents.append(SearchDocument(lesson_id=lesson.pk, **_lesson_document(lesson, course_names[lesson.course_id])))
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        SearchDocument.objects.bulk_create(documents, batch_size=batch_size)
+    return len(documents)
+
+
+def _uses_fts5() -> bool:
+    key = (connection.alias, str(connection.settings_dict["NAME"]))
+    if key not in _fts_available:
+        _fts_available[key] = _FTS_TABLE in connection.introspection.table_names(include_views=False)
+    return _fts_available[key]
+
+
+def _hits(rows: Iterable[tuple]) -> List[SearchHit]:
+    hits = []
+    for course_id, course_name, lesson_id, title, tags, score in rows:
+        if isinstance(tags, str):
+            tags = json.loads(tags)
+        hits.append(SearchHit(course_id, course_name, lesson_id, title, tags, float(score)))
+    return hits
+
+
+def _search_fts5(terms: List[str], tags: List[str], limit: int) -> List[SearchHit]:
+    match = [f'"{term}"*' for term in terms]
+    filters, params = [], []
+    for tag in tags:
+        # The phrase narrows the match through the index; json_each then checks the exact tag.
+        phrase = " ".join(_TERM.findall(tag.lower()))
+        if phrase:
+            match.append(f'tags_text : "{phrase}"')
+        filters.append(
+            "AND EXISTS (SELECT 1 FROM core_searchdocument t, json_each(t.tags)"
+            f" WHERE t.id = {_FTS_TABLE}.rowid AND lower(json_each.value) = %s)"
+        )
+        params.append(tag.lower())
+    # Rank and cut in the index alone, then join only the page of winners.
+    sql = f"""
+        SELECT d.course_id, c.name, d.lesson_id, d.title, d.tags, ranked.score
+        FROM (
+            SELECT rowid, -bm25({_FTS_TABLE}, %s, %s, %s) AS score
+            FROM {_FTS_TABLE}
+            WHERE {_FTS_TABLE} MATCH %s {" ".join(filters)}
+            ORDER BY score DESC, rowid
+            LIMIT %s
+        ) ranked
+        JOIN core_searchdocument d ON d.id = ranked.rowid
+        JOIN core_course c ON c.id = d.course_id
+        ORDER BY ranked.score DESC, d.id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*_FTS_WEIGHTS, " ".join(match), *params, limit])
+        return _hits(cursor.fetchall())
+
+
+def _search_postgres(terms: List[str], tags: List[str], limit: int) -> List[SearchHit]:
+    filters, params = "", [" & ".join(f"{term}:*" for term in terms)]
+    if tags:
+        filters = "AND d.tag_keys @> %s::jsonb"
+        params.append(json.dumps([tag.lower() for tag in tags]))
+    sql = f"""
+        SELECT d.course_id, c.name, d.lesson_id, d.title, d.tags, ts_rank(d.search_vector, query) AS score
+        FROM core_searchdocument d
+        JOIN core_course c ON c.id = d.course_id
+        CROSS JOIN to_tsquery('simple', %s) query
+        WHERE d.search_vector @@ query {filters}
+        ORDER BY score DESC, d.id
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, limit])
+        return _hits(cursor.fetchall())
+
+
+def _search_scan(terms: List[str], tags: List[str], limit: int) -> List[SearchHit]:
+    documents = SearchDocument.objects.all()
+    for term in terms:
+        documents = documents.filter(Q(title__icontains=term) | Q(body__icontains=term) | Q(tags_text__icontains=term))
+    rows = documents.order_by("title", "pk").values_list("course_id", "course__name", "lesson_id", "title", "tags")
+    wanted = {tag.lower() for tag in tags}
+    hits = []
+    for course_id, course_name, lesson_id, title, document_tags in rows.iterator():
+        if wanted <= {str(tag).lower() for tag in document_tags or []}:
+            hits.append(SearchHit(course_id, course_name, lesson_id, title, document_tags, 0.0))
+            if len(hits) == limit:
+                break
+    return hits
+
+
+def search_catalog(query: str, *, tags: Sequence[str] = (), limit: int = 20) -> List[SearchHit]:
+    """Courses and lessons matching every term of ``query`` (as prefixes) and every tag, best first."""
+
+    terms = search_terms(query)
+    if not terms:
+        return []
+    tags = [tag for tag in tags if tag]
+    if connection.vendor == "sqlite" and _uses_fts5():
+        return _search_fts5(terms, tags, limit)
+    if connection.vendor == "postgresql":
+        return _search_postgres(terms, tags, limit)
+    return _search_scan(terms, tags, limit)
+
+
+__all__ = [
+    "MAX_TERMS",
+    "SearchHit",
+    "index_course",
+    "index_lesson",
+    "rebuild_search_index",
+    "search_catalog",
+    "search_terms",
+]
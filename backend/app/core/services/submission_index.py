@@ -0,0 +1,214 @@
+"""Persistence and lookups for the per-lesson submission similarity index.
+
+Index rows live on their attempt's shard. Lookups probe the buckets of every
+shard, so near-identical submissions are found across students on any shard.
+
+Saved attempts are indexed after their transaction commits, by a small thread
+pool (``settings.SUBMISSION_INDEX_WORKERS``) rather than the request thread;
+0 indexes inline. The worker re-reads the attempt, so it indexes the snapshot
+as committed. An attempt saved while the process exits may be left out;
+``manage.py index_submissions`` rebuilds the index.
+"""
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q
+
+from ..models import Attempt, SubmissionBucket, SubmissionSignature
+from ..sharding import across_shards
+from .similarity import band_buckets, estimate_similarity, minhash, pack_signature, unpack_signature
+
+
+@dataclass(frozen=True)
+class SimilarSubmission:
+    attempt_id: int
+    student_id: int
+    similarity: float
+
+
+def index_attempt(attempt: Attempt, *, created: bool = False) -> Optional[SubmissionSignature]:
+    """Add (or refresh) ``attempt`` in its lesson's index; a blank snippet removes it.
+
+    ``created`` marks a brand-new attempt, which cannot have index rows yet, so
+    the lookup and cleanup of a previous signature are skipped.
+    """
+
+    alias = attempt._state.db or DEFAULT_DB_ALIAS
+    signature = minhash(attempt.code_snapshot) if attempt.code_snapshot else None
+    if signature is None:
+        if not created:
+            # Cascades to the signature's buckets.
+            SubmissionSignature.objects.db_manager(alias).filter(attempt_id=attempt.pk).delete()
+        return None
+    signatures = SubmissionSignature.objects.db_manager(alias)
+    with transaction.atomic(using=alias):
+        if created:
+            record = signatures.create(attempt=attempt, lesson_id=attempt.lesson_id, minhash=pack_signature(signature))
+        else:
+            record, _ = signatures.update_or_create(
+                attempt=attempt,
+                defaults={"lesson_id": attempt.lesson_id, "minhash": pack_signature(signature)},
+            )
+            record.buckets.all().delete()
+        SubmissionBucket.objects.db_manager(alias).bulk_create(
+            SubmissionBucket(signature=record, lesson_id=attempt.lesson_id, band=band, bucket=bucket)
+            for band, bucket in band_buckets(signature)
+        )
+    return record
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="submission-index")
+        return _executor
+
+
+def _index_committed(attempt_id: int, alias: str) -> None:
+    try:
+        # The shard router reads student_id to place the signature rows.
+        attempts = Attempt.objects.db_manager(alias).filter(pk=attempt_id)
+        attempt = attempts.only("pk", "student_id", "lesson_id", "code_snapshot").first()
+        if attempt is not None:
+            index_attempt(attempt)
+    finally:
+        # Worker threads keep no connections between tasks.
+        connections.close_all()
+
+
+def schedule_index_attempt(attempt: Attempt, *, created: bool = False) -> None:
+    """Index ``attempt`` once the current transaction on its database commits."""
+
+    alias = attempt._state.db or DEFAULT_DB_ALIAS
+    workers = getattr(settings, "SUBMISSION_INDEX_WORKERS", 1)
+    if workers > 0:
+        transaction.on_commit(lambda: _get_executor(workers).submit(_index_committed, attempt.pk, alias), using=alias)
+    else:
+        transaction.on_commit(lambda: index_attempt(attempt, created=created), using=alias)
+
+
+def index_attempts(attempts: Iterable[Attempt]) -> int:
+    indexed = 0
+    for attempt in attempts:
+        if index_attempt(attempt) is not None:
+            indexed += 1
+    return indexed
+
+
+def similar_to_attempt(
+    attempt_id: int, *, threshold: float = 0.8, limit: int = 20
+) -> Optional[List[SimilarSubmission]]:
+    """Submissions in the same lesson that look like ``attempt_id``; ``None`` if not indexed."""
+
+    for signatures in across_shards(SubmissionSignature.objects.filter(attempt_id=attempt_id)):
+        record = signatures.first()
+        if record is not None:
+            break
+    else:
+        return None
+    signature = unpack_signature(record.minhash)
+    bucket_filter = Q()
+    for band, bucket in band_buckets(signature):
+        bucket_filter |= Q(band=band, bucket=bucket)
+    matches = []
+    for buckets in across_shards(SubmissionBucket.objects.filter(bucket_filter, lesson_id=record.lesson_id)):
+        if buckets.db == record._state.db:
+            buckets = buckets.exclude(signature_id=record.pk)
+        candidate_ids = buckets.values_list("signature_id", flat=True).distinct()
+        rows = SubmissionSignature.objects.using(buckets.db).filter(pk__in=candidate_ids).values_list(
+            "attempt_id", "attempt__student_id", "minhash"
+        )
+        for candidate_attempt_id, student_id, raw in rows:
+            similarity = estimate_similarity(signature, unpack_signature(raw))
+            if similarity >= threshold:
+                matches.append(SimilarSubmission(candidate_attempt_id, student_id, similarity))
+    matches.sort(key=lambda match: (-match.similarity, match.attempt_id))
+    return matches[:limit]
+
+
+def similar_groups(lesson_id: int, *, threshold: float = 0.8, limit: int = 20) -> List[List[SimilarSubmission]]:
+    """Groups of near-identical submissions in a lesson, largest first.
+
+    Submissions sharing any LSH bucket are merged with a union-find pass over the
+    bucket rows, then each member is verified against the group's earliest
+    submission, so the cost stays linear in the number of indexed submissions.
+    """
+
+    # Signatures are keyed by (shard position, signature id), since ids repeat across shards.
+    Key = Tuple[int, int]
+    parent: Dict[Key, Key] = {}
+
+    def find(item: Key) -> Key:
+        root = item
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while parent.get(item, item) != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    first_in_bucket: Dict[tuple, Key] = {}
+    shards = across_shards(SubmissionBucket.objects.filter(lesson_id=lesson_id))
+    for position, buckets in enumerate(shards):
+        rows = buckets.values_list("band", "bucket", "signature_id").iterator(chunk_size=5000)
+        for band, bucket, signature_id in rows:
+            item = (position, signature_id)
+            first = first_in_bucket.setdefault((band, bucket), item)
+            if first != item:
+                left, right = find(first), find(item)
+                if left != right:
+                    parent[max(left, right)] = min(left, right)
+
+    members_by_root: Dict[Key, List[Key]] = {}
+    for item in parent:
+        members_by_root.setdefault(find(item), []).append(item)
+    for root, members in members_by_root.items():
+        if root not in members:
+            members.append(root)
+
+    wanted: Dict[int, List[int]] = {}
+    for members in members_by_root.values():
+        for position, pk in members:
+            wanted.setdefault(position, []).append(pk)
+    signatures = {}
+    for position, pks in wanted.items():
+        rows = SubmissionSignature.objects.using(shards[position].db).filter(pk__in=pks)
+        for pk, attempt_id, student_id, raw in rows.values_list("pk", "attempt_id", "attempt__student_id", "minhash"):
+            signatures[(position, pk)] = (attempt_id, student_id, unpack_signature(raw))
+
+    groups: List[List[SimilarSubmission]] = []
+    for members in members_by_root.values():
+        # Attempts deleted or archived since the buckets were read have no signature left.
+        ordered = sorted((pk for pk in members if pk in signatures), key=lambda pk: signatures[pk][0])
+        if len(ordered) < 2:
+            continue
+        anchor = signatures[ordered[0]][2]
+        group = [
+            SimilarSubmission(attempt_id, student_id, estimate_similarity(anchor, signature))
+            for attempt_id, student_id, signature in (signatures[pk] for pk in ordered)
+        ]
+        group = [member for member in group if member.similarity >= threshold]
+        if len(group) > 1:
+            groups.append(group)
+    groups.sort(key=lambda group: (-len(group), group[0].attempt_id))
+    return groups[:limit]
+
+
+__all__ = [
+    "SimilarSubmission",
+    "index_attempt",
+    "index_attempts",
+    "schedule_index_attempt",
+    "similar_groups",
+    "similar_to_attempt",
+]
@@ -0,0 +1,332 @@
+"""Deterministic synthetic datasets for load testing and benchmarks.
+
+Randomness comes from the same linear congruential generator as
+``frontend/src/lib/seededRandom.ts`` so a seed produces the same sequence on
+every machine and in both halves of the stack.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from ..models import Attempt, Course, Lesson, Student
+from ..sharding import shard_for_student, sharding_enabled
+from .completion import rebuild_completions
+from .lesson_stats import rebuild_sketches
+from .rebalance import mirror_students, replicate_catalog
+from .rollups import rebuild_rollups
+from .search import rebuild_search_index
+
+T = TypeVar("T")
+
+EMAIL_DOMAIN = "scale.example"
+COURSE_PREFIX = "Scale: "
+
+TAG_POOL = (
+    "variables",
+    "loops",
+    "conditions",
+    "functions",
+    "arrays",
+    "strings",
+    "recursion",
+    "dom",
+    "logic",
+    "data",
+    "classes",
+    "events",
+)
+
+_SNIPPETS = (
+    "def {name}(values):\n    total = 0\n    for value in values:\n        total += value\n    return total\n",
+    "def {name}(items):\n    for index in range(len(items) + 1):\n        print(items[index])\n",
+    "{name} = 0\nfor step in range({count}):\n    print(step)\n",
+    "def {name}(flag):\n    if flag:\n        print('yes')\n    else:\n        print('yes')\n",
+    "def {name}(numbers):\n    best = None\n    for number in numbers:\n        if best is None or number > best:\n            best = number\n",
+    "def {name}(text):\n    return text[::-1] == text\n",
+    "def {name}(n):\n    if n < 2:\n        return n\n    return {name}(n - 1) + {name}(n - 2)\n",
+    "print('hello world')\n",
+)
+_NAMES = ("solve", "compute", "helper", "answer", "check", "run", "process", "total")
+
+
+def make_rng(seed: int = 123456789) -> Callable[[], float]:
+    """Port of ``makeRng`` from the frontend: uniform floats in ``[0, 1)``."""
+
+    state = seed & 0xFFFFFFFF
+
+    def rng() -> float:
+        nonlocal state
+        state = (1664525 * state + 1013904223) & 0xFFFFFFFF
+        return state / 0x100000000
+
+    return rng
+
+
+def _randint(rng: Callable[[], float], low: int, high: int) -> int:
+    return low + int(rng() * (high - low + 1))
+
+
+def _choice(rng: Callable[[], float], options: Sequence[T]) -> T:
+    return options[int(rng() * len(options))]
+
+
+def _sample(rng: Callable[[], float], options: Sequence[T], count: int) -> List[T]:
+    pool = list(options)
+    picked = []
+    for _ in range(min(count, len(pool))):
+        picked.append(pool.pop(int(rng() * len(pool))))
+    return picked
+
+
+@dataclass(frozen=True)
+class ScalePreset:
+    students: int
+    courses: int
+    lessons_per_course: int
+    mean_attempts: float
+
+
+PRESETS: Dict[str, ScalePreset] = {
+    "small": ScalePreset(students=200, courses=10, lessons_per_course=8, mean_attempts=20),
+    "medium": ScalePreset(students=5_000, courses=40, lessons_per_course=12, mean_attempts=30),
+    "huge": ScalePreset(students=100_000, courses=200, lessons_per_course=15, mean_attempts=30),
+}
+
+# Shape of the Lomax distribution used for attempts per student: most students
+# make a handful of attempts while a long tail makes hundreds.
+_ACTIVITY_SHAPE = 1.6
+
+
+def _attempt_count(rng: Callable[[], float], mean: float) -> int:
+    scale = mean * (_ACTIVITY_SHAPE - 1)
+    draw = scale * ((1.0 - rng()) ** (-1.0 / _ACTIVITY_SHAPE) - 1.0)
+    return min(int(draw), int(mean * 20))
+
+
+def _popular_course(rng: Callable[[], float], count: int) -> int:
+    # Squaring a uniform draw skews enrolment towards low (popular) course indexes.
+    return min(count - 1, int(count * rng() ** 2))
+
+
+def _snippet(rng: Callable[[], float]) -> str:
+    return _choice(rng, _SNIPPETS).format(name=_choice(rng, _NAMES), count=_randint(rng, 2, 20))
+
+
+def _iter_attempts(
+    rng: Callable[[], float],
+    preset: ScalePreset,
+    student_ids: Sequence[int],
+    lesson_ids: Sequence[Sequence[int]],
+) -> Iterator[Tuple[object, ...]]:
+    now = timezone.now()
+    adapt_timestamp = connection.ops.adapt_datetimefield_value
+    for student_id in student_ids:
+        remaining = _attempt_count(rng, preset.mean_attempts)
+        if not remaining:
+            continue
+        enrolments = sorted({_popular_course(rng, preset.courses) for _ in range(_randint(rng, 1, 4))})
+        moment = now - timedelta(days=365 * rng())
+        step = max(60.0, (now - moment).total_seconds() / (remaining + 1))
+        per_course = max(1, remaining // len(enrolments))
+        for course_index in enrolments:
+            lessons = lesson_ids[course_index]
+            position = 0
+            for _ in range(min(per_course, remaining)):
+                remaining -= 1
+                moment += timedelta(seconds=step * (0.5 + rng()))
+                skill = rng()
+                yield (
+                    student_id,
+                    lessons[position],
+                    adapt_timestamp(min(moment, now)),
+                    round(min(1.0, 0.3 + 0.7 * skill * (0.6 + 0.4 * rng())), 3),
+                    int(4 * (1.0 - skill) ** 3),
+                    _randint(rng, 60, 3600),
+                    _snippet(rng),
+                )
+                if position < len(lessons) - 1 and rng() < 0.6:
+                    position += 1
+
+
+_ATTEMPT_COLUMNS = (
+    "student_id",
+    "lesson_id",
+    "timestamp",
+    "correctness",
+    "hints_used",
+    "duration_sec",
+    "code_snapshot",
+)
+
+
+def _chunks(items, size: int):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _bulk_insert(model, objects, batch_size: int, progress=None) -> int:
+    inserted = 0
+    for chunk in _chunks(objects, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(chunk, batch_size=len(chunk))
+        inserted += len(chunk)
+        if progress:
+            progress(model.__name__, inserted)
+    return inserted
+
+
+def _insert_attempt_rows(rows, batch_size: int, progress=None) -> int:
+    # Attempts dominate the row count. ``bulk_create`` spends most of its time
+    # compiling per-value SQL (and SQLite caps a statement at 999 parameters),
+    # so rows go through one prepared ``executemany`` per chunk instead, on
+    # the student's shard.
+    pending: Dict[str, list] = {}
+    inserted = 0
+
+    def flush(alias: str) -> None:
+        nonlocal inserted
+        chunk = pending.pop(alias)
+        target = connections[alias]
+        quote = target.ops.quote_name
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            quote(Attempt._meta.db_table),
+            ", ".join(quote(column) for column in _ATTEMPT_COLUMNS),
+            ", ".join(["%s"] * len(_ATTEMPT_COLUMNS)),
+        )
+        with transaction.atomic(using=alias), target.cursor() as cursor:
+            cursor.executemany(sql, chunk)
+        inserted += len(chunk)
+        if progress:
+            progress(Attempt.__name__, inserted)
+
+    for row in rows:
+        alias = shard_for_student(row[0])
+        chunk = pending.setdefault(alias, [])
+        chunk.append(row)
+        if len(chunk) >= batch_size:
+            flush(alias)
+    for alias in list(pending):
+        flush(alias)
+    return inserted
+
+
+def dataset_exists() -> bool:
+    """Whether rows from an earlier :func:`generate_dataset` run are still present."""
+
+    return (
+        Course.objects.filter(name__startswith=COURSE_PREFIX).exists()
+        or Student.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").exists()
+    )
+
+
+def clear_dataset() -> None:
+    """Remove rows created by :func:`generate_dataset` (attempts cascade)."""
+
+    Student.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").delete()
+    Course.objects.filter(name__startswith=COURSE_PREFIX).delete()
+
+
+def generate_dataset(
+    preset: ScalePreset,
+    *,
+    seed: int = 123456789,
+    batch_size: int = 5000,
+    progress: Optional[Callable[[str, int], None]] = None,
+) -> Dict[str, int]:
+    """Insert a synthetic catalog, students and skewed attempt history.
+
+    Rows are inserted in chunks without per-row ``post_save`` handlers, and
+    attempts on their student's shard. The lesson-completion bitmaps, daily
+    rollups, lesson sketches and catalog search documents, which API reads
+    depend on, are rebuilt at the end; backfill the similarity index with its
+    management command.
+    """
+
+    rng = make_rng(seed)
+
+    courses = [
+        Course(
+            name=f"{COURSE_PREFIX}Course {index:04d}",
+            description=f"Synthetic course {index}",
+            difficulty=_randint(rng, 1, 3),
+            tags=_sample(rng, TAG_POOL, _randint(rng, 1, 3)),
+        )
+        for index in range(preset.courses)
+    ]
+    with transaction.atomic():
+        Course.objects.bulk_create(courses, batch_size=batch_size)
+    course_ids = list(
+        Course.objects.filter(name__startswith=COURSE_PREFIX).order_by("name").values_list("pk", flat=True)
+    )
+
+    lessons = (
+        Lesson(
+            course_id=course_id,
+            title=f"Lesson {order}",
+            tags=_sample(rng, TAG_POOL, _randint(rng, 1, 2)),
+            order_index=order,
+            estimated_minutes=_randint(rng, 10, 45),
+        )
+        for course_id in course_ids
+        for order in range(1, preset.lessons_per_course + 1)
+    )
+    lesson_total = _bulk_insert(Lesson, lessons, batch_size, progress)
+    lesson_ids: Dict[int, List[int]] = {course_id: [] for course_id in course_ids}
+    for course_id, lesson_id in (
+        Lesson.objects.filter(course_id__in=course_ids)
+        .order_by("course_id", "order_index")
+        .values_list("course_id", "pk")
+    ):
+        lesson_ids[course_id].append(lesson_id)
+
+    students = (
+        Student(
+            name=f"Student {index:07d}",
+            email=f"student{index}@{EMAIL_DOMAIN}",
+            weak_tags=_sample(rng, TAG_POOL, _randint(rng, 0, 3)),
+        )
+        for index in range(preset.students)
+    )
+    student_total = _bulk_insert(Student, students, batch_size, progress)
+    student_ids = list(
+        Student.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").order_by("pk").values_list("pk", flat=True)
+    )
+    if sharding_enabled():
+        # Bulk inserts send no signals, so copy the catalog and students to the shards here.
+        replicate_catalog(batch_size=batch_size)
+        mirror_students(batch_size=batch_size)
+
+    attempts = _iter_attempts(rng, preset, student_ids, [lesson_ids[pk] for pk in course_ids])
+    attempt_total = _insert_attempt_rows(attempts, batch_size, progress)
+    rebuild_completions(student_ids, batch_size=min(batch_size, 500))
+    rebuild_rollups(batch_size=batch_size)
+    rebuild_sketches()
+    rebuild_search_index()
+
+    return {
+        "courses": len(course_ids),
+        "lessons": lesson_total,
+        "students": student_total,
+        "attempts": attempt_total,
+    }
+
+
+__all__ = [
+    "PRESETS",
+    "ScalePreset",
+    "clear_dataset",
+    "dataset_exists",
+    "generate_dataset",
+    "make_rng",
+]
@@ -0,0 +1,299 @@
+"""Horizontal partitioning of student-owned rows across database aliases.
+
+``STUDENT_SHARDS`` lists the aliases that hold student data, ``default``
+first. A student lives on ``STUDENT_SHARDS[jump_hash(student_id, N)]``, and so
+do their attempts, the attempts' analysis and similarity-index rows, their
+archived attempt segments, and the per-student aggregates (lesson completion
+bitmaps, daily activity, nightly recommendations). Jump consistent hashing
+moves only about ``1/N`` of the students when an N-th shard is added;
+``rebalance_shards`` moves them.
+
+Everything else stays on ``default``. The catalog (``Course``, ``Lesson``) is
+copied to every shard, and each student row to its home shard, so foreign keys
+hold within each database. The copies are written once the ``default``
+transaction commits (:func:`copy_after_commit`), so a rolled-back save never
+reaches a shard. A copy that still fails after retries is logged, and
+``rebalance_shards --copies-only`` rewrites every copy from ``default``.
+``default`` keeps every student row as the directory: it allocates student
+ids, and lists, searches and throttles never need to fan out. Per-lesson
+aggregates (daily activity, sketches) and the search index are global and stay
+on ``default`` too.
+
+Each shard allocates attempt ids from its own block of ``ID_BLOCK`` ids,
+starting at the shard's position in ``STUDENT_SHARDS`` times the block size,
+so attempt ids stay unique across shards. ``rebalance_shards`` sets the
+sequences, so run it before a new shard takes writes. Attempts it moves get
+new ids on their new shard.
+
+With a single shard (the default) every helper here is a no-op, and queries
+are routed exactly as before. With several, student-owned reads go to the
+shard primaries; the read replica serves only the ``default`` database.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, models, transaction
+
+logger = logging.getLogger("core.sharding")
+
+ID_BLOCK = 1 << 40
+COPY_ATTEMPTS = 3
+
+# Models partitioned by student, by ``app_label.model_name``.
+SHARDED_MODELS = frozenset(
+    {
+        "core.attempt",
+        "core.attemptanalysis",
+        "core.attemptarchivesegment",
+        "core.submissionsignature",
+        "core.submissionbucket",
+        "core.lessoncompletion",
+        "core.studentdailyactivity",
+        "core.nightlyrecommendation",
+    }
+)
+
+_JUMP_MULTIPLIER = 2862933555777941757
+_UINT64 = (1 << 64) - 1
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Lamping and Veach's jump consistent hash of ``key`` into ``range(buckets)``."""
+
+    if buckets < 1:
+        raise ValueError("buckets must be at least 1.")
+    key &= _UINT64
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * _JUMP_MULTIPLIER + 1) & _UINT64
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_aliases() -> Tuple[str, ...]:
+    return tuple(getattr(settings, "STUDENT_SHARDS", None) or (DEFAULT_DB_ALIAS,))
+
+
+def sharding_enabled() -> bool:
+    return len(shard_aliases()) > 1
+
+
+def shard_for_student(student_id: int, aliases: Optional[Sequence[str]] = None) -> str:
+    aliases = tuple(aliases) if aliases is not None else shard_aliases()
+    return aliases[jump_hash(int(student_id), len(aliases))]
+
+
+def student_connection(student_id: int):
+    """Connection holding ``student_id``'s rows, for raw SQL."""
+
+    return connections[shard_for_student(student_id)]
+
+
+def across_shards(queryset: models.QuerySet) -> List[models.QuerySet]:
+    """``queryset`` once per shard; unchanged (routed as usual) without sharding."""
+
+    if not sharding_enabled():
+        return [queryset]
+    return [queryset.using(alias) for alias in shard_aliases()]
+
+
+def students_by_shard(student_ids: Iterable[int]) -> Dict[str, List[int]]:
+    """Group student ids by home shard, keeping their order within each shard."""
+
+    grouped: Dict[str, List[int]] = {}
+    for student_id in student_ids:
+        grouped.setdefault(shard_for_student(student_id), []).append(student_id)
+    return grouped
+
+
+class StudentShardQuerySet(models.QuerySet):
+    """Queryset for models with a ``student`` foreign key, partitioned by student."""
+
+    def on_shard(self, alias: str) -> "StudentShardQuerySet":
+        return self.using(alias) if sharding_enabled() else self
+
+    def student_shard(self, student_id: int) -> "StudentShardQuerySet":
+        return self.on_shard(shard_for_student(student_id))
+
+    def for_student(self, student_id: int) -> "StudentShardQuerySet":
+        return self.student_shard(student_id).filter(student_id=student_id)
+
+    def create(self, **kwargs):
+        if self._db is None and sharding_enabled():
+            student = kwargs.get("student")
+            student_id = kwargs.get("student_id", student.pk if student is not None else None)
+            if student_id is not None:
+                return super(StudentShardQuerySet, self.student_shard(student_id)).create(**kwargs)
+        return super().create(**kwargs)
+
+
+def _instance_shard(instance) -> Optional[str]:
+    if instance._meta.label_lower == "core.student" and instance.pk is not None:
+        return shard_for_student(instance.pk)
+    student_id = getattr(instance, "student_id", None)
+    if student_id is not None:
+        return shard_for_student(student_id)
+    # Rows hanging off an attempt inherit the attempt's database on assignment.
+    return instance._state.db
+
+
+class ShardRouter:
+    """Send student-owned rows to their shard; everything else to ``default``.
+
+    Querysets carry no student, so shard-aware code picks the alias itself
+    (``for_student``, ``across_shards``); the router covers instance saves and
+    related-object access.
+    """
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        instance = hints.get("instance")
+        if instance is None or not sharding_enabled() or model._meta.label_lower not in SHARDED_MODELS:
+            return None
+        return _instance_shard(instance)
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        if not sharding_enabled():
+            return None
+        if model._meta.label_lower not in SHARDED_MODELS:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get("instance")
+        return _instance_shard(instance) if instance is not None else None
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        if sharding_enabled() and {obj1._state.db, obj2._state.db} <= set(shard_aliases()):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints) -> Optional[bool]:
+        return None
+
+
+def _field_values(instance) -> Dict[str, object]:
+    return {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+
+
+def restore_auto_timestamps(
+    model, alias: str, originals: Sequence[models.Model], copies: Sequence[models.Model], *, batch_size: int = 1000
+) -> None:
+    """Put back the ``auto_now``/``auto_now_add`` values that ``bulk_create`` stamped over on ``copies``."""
+
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    if not fields or not copies:
+        return
+    for original, copy in zip(originals, copies):
+        for field in fields:
+            setattr(copy, field.attname, getattr(original, field.attname))
+    # bulk_update writes attribute values as they are, without pre_save().
+    model.objects.using(alias).bulk_update(copies, [field.name for field in fields], batch_size=batch_size)
+
+
+def upsert_rows(model, alias: str, instances: Iterable[models.Model], *, batch_size: int = 1000) -> None:
+    """Insert or overwrite ``instances`` on ``alias``, keeping their primary keys and timestamps."""
+
+    instances = list(instances)
+    fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+    copies = [model(**_field_values(instance)) for instance in instances]
+    model.objects.using(alias).bulk_create(
+        copies, batch_size=batch_size, update_conflicts=True, unique_fields=["id"], update_fields=fields
+    )
+    restore_auto_timestamps(model, alias, instances, copies, batch_size=batch_size)
+
+
+def copy_after_commit(copy: Callable[[models.Model], None], instance, using: str = DEFAULT_DB_ALIAS) -> None:
+    """Run ``copy(instance)`` once ``using`` commits, retrying database errors ``COPY_ATTEMPTS`` times.
+
+    The saved row has committed by then, so a final failure is logged rather
+    than raised; ``rebalance_shards --copies-only`` repairs the copy. A student
+    saved inside an atomic block reaches its shard when the block commits, so
+    write their attempts after that.
+    """
+
+    def run() -> None:
+        for attempt in range(1, COPY_ATTEMPTS + 1):
+            try:
+                copy(instance)
+                return
+            except DatabaseError:
+                if attempt == COPY_ATTEMPTS:
+                    logger.exception(
+                        "%s(%s %s) failed %d times; run rebalance_shards --copies-only to repair the shard copies.",
+                        copy.__name__,
+                        instance._meta.label,
+                        instance.pk,
+                        attempt,
+                    )
+                    return
+                time.sleep(0.05 * 2**attempt)
+
+    transaction.on_commit(run, using=using)
+
+
+def _committed(instance):
+    # The latest committed version, so a retried or late copy never writes an older one.
+    return type(instance).objects.using(DEFAULT_DB_ALIAS).filter(pk=instance.pk).first()
+
+
+def replicate_catalog_row(instance) -> None:
+    """Copy a saved ``Course`` or ``Lesson`` from ``default`` to every other shard."""
+
+    current = _committed(instance)
+    if current is None:
+        return
+    for alias in shard_aliases():
+        if alias != DEFAULT_DB_ALIAS:
+            upsert_rows(type(instance), alias, [current])
+
+
+def delete_replicated_row(instance) -> None:
+    for alias in shard_aliases():
+        if alias != DEFAULT_DB_ALIAS:
+            type(instance).objects.using(alias).filter(pk=instance.pk).delete()
+
+
+def mirror_student(student) -> None:
+    """Copy a saved student from the ``default`` directory to its home shard."""
+
+    home = shard_for_student(student.pk)
+    if home == DEFAULT_DB_ALIAS:
+        return
+    current = _committed(student)
+    if current is not None:
+        upsert_rows(type(student), home, [current])
+
+
+def delete_student_mirror(student) -> None:
+    home = shard_for_student(student.pk)
+    if home != DEFAULT_DB_ALIAS:
+        type(student).objects.using(home).filter(pk=student.pk).delete()
+
+
+__all__ = [
+    "COPY_ATTEMPTS",
+    "ID_BLOCK",
+    "SHARDED_MODELS",
+    "ShardRouter",
+    "StudentShardQuerySet",
+    "across_shards",
+    "copy_after_commit",
+    "delete_replicated_row",
+    "delete_student_mirror",
+    "jump_hash",
+    "mirror_student",
+    "replicate_catalog_row",
+    "restore_auto_timestamps",
+    "shard_aliases",
+    "shard_for_student",
+    "sharding_enabled",
+    "student_connection",
+    "students_by_shard",
+    "upsert_rows",
+]
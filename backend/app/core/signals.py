@@ -0,0 +1,198 @@
+"""Keep derived attempt and catalog indexes in sync as rows are saved, and announce new attempts."""
+from __future__ import annotations
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .db_routing import pin_student
+from .models import Attempt, Course, Lesson, Student
+from .sharding import (
+    copy_after_commit,
+    delete_replicated_row,
+    delete_student_mirror,
+    mirror_student,
+    replicate_catalog_row,
+    sharding_enabled,
+)
+from .services.archive import attempts_moving
+from .services.completion import record_attempt, schedule_course_rebuild, schedule_rebuild
+from .services.lesson_stats import record_attempt_sketch
+from .services.rollups import record_attempt_activity, remove_attempt_activity
+from .services.search import index_course, index_lesson
+from .services.submission_index import schedule_index_attempt
+from .streaming import get_broadcaster
+
+
+@receiver(post_save, sender=Attempt, dispatch_uid="core.index_attempt_submission")
+def index_attempt_submission(
+    sender, instance: Attempt, created: bool = False, raw: bool = False, **kwargs
+) -> None:
+    if not raw:
+        schedule_index_attempt(instance, created=created)
+
+
+_ATTEMPT_TOTAL_FIELDS = frozenset({"lesson", "lesson_id", "hints_used", "timestamp"})
+_ATTEMPT_ACTIVITY_FIELDS = _ATTEMPT_TOTAL_FIELDS | {"duration_sec", "correctness"}
+
+
+@receiver(pre_save, sender=Attempt, dispatch_uid="core.remember_saved_attempt")
+def remember_saved_attempt(
+    sender, instance: Attempt, raw: bool = False, update_fields=None, using: str = DEFAULT_DB_ALIAS, **kwargs
+) -> None:
+    # An edit takes the stored version back out of the rollups before adding the new one.
+    if (
+        not raw
+        and instance.pk is not None
+        and (update_fields is None or _ATTEMPT_ACTIVITY_FIELDS & set(update_fields))
+    ):
+        instance._saved_version = Attempt.objects.using(using).select_related("lesson").filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=Attempt, dispatch_uid="core.record_attempt_totals")
+def record_attempt_totals(
+    sender,
+    instance: Attempt,
+    created: bool = False,
+    raw: bool = False,
+    update_fields=None,
+    using: str = DEFAULT_DB_ALIAS,
+    **kwargs,
+) -> None:
+    # Completion, daily rollups and sketches in one pass, sharing the loaded
+    # lesson. They run in the saver's transaction, if any: the attempt API
+    # opens one on the student's shard, so the attempt, its completion row and
+    # its student day commit or roll back together. Lesson days and sketches
+    # live on ``default``, so on another shard they commit on their own.
+    # Deferring the writes to on_commit could lose them.
+    saved = instance.__dict__.pop("_saved_version", None)
+    if raw:
+        return
+    if created:
+        record_attempt(instance)
+        record_attempt_activity(instance)
+        record_attempt_sketch(instance)
+        return
+    if update_fields is None or _ATTEMPT_TOTAL_FIELDS & set(update_fields):
+        schedule_rebuild(instance.student_id, using)
+    if saved is not None:
+        remove_attempt_activity(saved)
+        record_attempt_activity(instance)
+
+
+@receiver(post_delete, sender=Attempt, dispatch_uid="core.rebuild_deleted_attempt_totals")
+def rebuild_deleted_attempt_totals(
+    sender, instance: Attempt, origin=None, using: str = DEFAULT_DB_ALIAS, **kwargs
+) -> None:
+    if attempts_moving():
+        return
+    # Rows owned by a deleted student, course or lesson go with it.
+    deleted_with = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if deleted_with not in (Student, Course):
+        schedule_rebuild(instance.student_id, using)
+    remove_attempt_activity(
+        instance, student_day=deleted_with not in (Student, Course), lesson_day=deleted_with not in (Course, Lesson)
+    )
+
+
+@receiver(post_save, sender=Attempt, dispatch_uid="core.announce_attempt")
+def announce_attempt(
+    sender, instance: Attempt, created: bool = False, raw: bool = False, using: str = DEFAULT_DB_ALIAS, **kwargs
+) -> None:
+    if created and not raw:
+        transaction.on_commit(get_broadcaster().notify, using=using)
+
+
+@receiver(post_save, sender=Attempt, dispatch_uid="core.pin_attempt_student")
+def pin_attempt_student(
+    sender, instance: Attempt, raw: bool = False, using: str = DEFAULT_DB_ALIAS, **kwargs
+) -> None:
+    if not raw:
+        transaction.on_commit(lambda: pin_student(instance.student_id), using=using)
+
+
+@receiver(post_save, sender=Student, dispatch_uid="core.pin_student")
+def pin_saved_student(sender, instance: Student, raw: bool = False, **kwargs) -> None:
+    if not raw:
+        transaction.on_commit(lambda: pin_student(instance.pk))
+
+
+def _replicates(raw: bool, using: str) -> bool:
+    # Copies written by the replication itself go through bulk_create and send no signals.
+    return not raw and using == DEFAULT_DB_ALIAS and sharding_enabled()
+
+
+@receiver(post_save, sender=Student, dispatch_uid="core.mirror_student")
+def mirror_saved_student(sender, instance: Student, raw: bool = False, using: str = DEFAULT_DB_ALIAS, **kwargs) -> None:
+    if _replicates(raw, using):
+        copy_after_commit(mirror_student, instance, using)
+
+
+@receiver(post_delete, sender=Student, dispatch_uid="core.delete_student_mirror")
+def delete_deleted_student_mirror(sender, instance: Student, using: str = DEFAULT_DB_ALIAS, **kwargs) -> None:
+    if _replicates(False, using):
+        copy_after_commit(delete_student_mirror, instance, using)
+
+
+@receiver(post_save, sender=Course, dispatch_uid="core.replicate_course")
+@receiver(post_save, sender=Lesson, dispatch_uid="core.replicate_lesson")
+def replicate_catalog(sender, instance, raw: bool = False, using: str = DEFAULT_DB_ALIAS, **kwargs) -> None:
+    if _replicates(raw, using):
+        copy_after_commit(replicate_catalog_row, instance, using)
+
+
+@receiver(post_delete, sender=Course, dispatch_uid="core.delete_replicated_course")
+@receiver(post_delete, sender=Lesson, dispatch_uid="core.delete_replicated_lesson")
+def delete_replicated_catalog(sender, instance, using: str = DEFAULT_DB_ALIAS, **kwargs) -> None:
+    if _replicates(False, using):
+        copy_after_commit(delete_replicated_row, instance, using)
+
+
+_LESSON_POSITION_FIELDS = frozenset({"course", "course_id", "order_index"})
+
+
+@receiver(pre_save, sender=Lesson, dispatch_uid="core.remember_lesson_position")
+def remember_lesson_position(
+    sender, instance: Lesson, raw: bool = False, update_fields=None, using: str = DEFAULT_DB_ALIAS, **kwargs
+) -> None:
+    if (
+        not raw
+        and instance.pk is not None
+        and using == DEFAULT_DB_ALIAS
+        and (update_fields is None or _LESSON_POSITION_FIELDS & set(update_fields))
+    ):
+        instance._saved_position = (
+            Lesson.objects.using(using).filter(pk=instance.pk).values_list("course_id", "order_index").first()
+        )
+
+
+@receiver(post_save, sender=Lesson, dispatch_uid="core.rebuild_moved_lesson_completions")
+def rebuild_moved_lesson_completions(
+    sender, instance: Lesson, using: str = DEFAULT_DB_ALIAS, **kwargs
+) -> None:
+    # Completion bits are keyed by order_index. A deleted lesson needs nothing
+    # here: its attempts cascade, and each deleted attempt rebuilds its student.
+    saved = instance.__dict__.pop("_saved_position", None)
+    if saved is not None and saved != (instance.course_id, instance.order_index):
+        schedule_course_rebuild({saved[0], instance.course_id}, using)
+
+
+_COURSE_SEARCH_FIELDS = frozenset({"name", "description", "tags"})
+_LESSON_SEARCH_FIELDS = frozenset({"course", "title", "tags"})
+
+
+@receiver(post_save, sender=Course, dispatch_uid="core.index_course_search")
+def index_course_search(
+    sender, instance: Course, raw: bool = False, update_fields=None, using: str = DEFAULT_DB_ALIAS, **kwargs
+) -> None:
+    if not raw and using == DEFAULT_DB_ALIAS and (update_fields is None or _COURSE_SEARCH_FIELDS & set(update_fields)):
+        index_course(instance)
+
+
+@receiver(post_save, sender=Lesson, dispatch_uid="core.index_lesson_search")
+def index_lesson_search(
+    sender, instance: Lesson, raw: bool = False, update_fields=None, using: str = DEFAULT_DB_ALIAS, **kwargs
+) -> None:
+    if not raw and using == DEFAULT_DB_ALIAS and (update_fields is None or _LESSON_SEARCH_FIELDS & set(update_fields)):
+        index_lesson(instance)
@@ -0,0 +1,350 @@
+"""Server-Sent Events feed of new attempts.
+
+``GET /api/attempts/stream/`` keeps a connection open and pushes each new
+attempt as an ``attempt`` event. Clients can filter with ``?course=`` and/or
+``?student=``. After a reconnect, the browser sends ``Last-Event-ID`` (or the
+client passes ``?last_event_id=``), and the stream first replays the matching
+attempts the client may have missed.
+
+Connections do not query the database themselves. Each process runs one
+:class:`AttemptBroadcaster` task. The task fetches attempts past its cursor,
+serializes each once, and hands the encoded event to every matching
+subscriber's queue. It polls every ``ATTEMPT_STREAM_POLL_INTERVAL`` seconds,
+which also picks up writes from other processes. Attempts committed in this
+process wake it immediately. An idle connection costs one suspended coroutine
+and an empty queue, so the endpoint must be served from the ASGI entry point
+(``app.asgi``). Under WSGI, each stream would occupy a worker thread.
+
+Attempt ids are handed out when a row is inserted, but on PostgreSQL the
+transactions can commit in a different order. An attempt whose id is below
+the cursor may only become visible after the cursor has passed it. So each
+poll re-reads every id above a *floor*: the cursor as it stood
+``ATTEMPT_STREAM_COMMIT_WINDOW`` seconds ago. Ids already delivered above the
+floor are remembered and skipped. An attempt whose transaction stays open for
+longer than the window can still be missed. An event's ``id`` is
+``<attempt id>:<floor>``. A reconnect replays every matching attempt above the
+floor it carries, so attempts near the end of a broken stream can arrive
+twice. Clients deduplicate by the ``id`` in the payload. A bare attempt id is
+accepted as ``Last-Event-ID`` and taken as its own floor.
+
+The stream reads ``default`` only, so it answers 503 when ``STUDENT_SHARDS``
+spreads attempts over several databases.
+
+A subscriber that falls ``ATTEMPT_STREAM_QUEUE_SIZE`` events behind is
+disconnected instead of buffering without bound. Its client reconnects and
+catches up from ``Last-Event-ID``.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+from collections import deque
+from typing import Container, Deque, List, NamedTuple, Optional, Set, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Max
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Attempt
+from .sharding import sharding_enabled
+
+_EVENT_FIELDS = (
+    "id",
+    "student_id",
+    "student__name",
+    "lesson_id",
+    "lesson__title",
+    "lesson__course_id",
+    "lesson__course__name",
+    "timestamp",
+    "correctness",
+    "hints_used",
+    "duration_sec",
+)
+_BATCH_SIZE = 500
+_KEEPALIVE = b": keep-alive\n\n"
+
+
+class AttemptEvent(NamedTuple):
+    id: int
+    student_id: int
+    course_id: int
+    payload: bytes
+
+
+def _encode(row, floor: int) -> AttemptEvent:
+    (pk, student_id, student_name, lesson_id, lesson_title, course_id, course_name,
+     timestamp, correctness, hints_used, duration_sec) = row
+    data = json.dumps(
+        {
+            "id": pk,
+            "student": {"id": student_id, "name": student_name},
+            "lesson": {"id": lesson_id, "title": lesson_title, "course": course_name, "course_id": course_id},
+            "timestamp": timezone.localtime(timestamp).isoformat(),
+            "correctness": correctness,
+            "hints_used": hints_used,
+            "duration_sec": duration_sec,
+        },
+        separators=(",", ":"),
+    )
+    return AttemptEvent(pk, student_id, course_id, f"id: {pk}:{floor}\nevent: attempt\ndata: {data}\n\n".encode())
+
+
+def attempts_after(
+    cursor: int,
+    *,
+    limit: int = _BATCH_SIZE,
+    student_id: Optional[int] = None,
+    course_id: Optional[int] = None,
+    skip: Container[int] = frozenset(),
+    floor: Optional[int] = None,
+) -> List[AttemptEvent]:
+    """Encoded events for attempts with ``id > cursor`` and not in ``skip``, oldest first.
+
+    Event ids carry ``floor``, which defaults to ``cursor``.
+    """
+
+    queryset = Attempt.objects.filter(pk__gt=cursor)
+    if student_id is not None:
+        queryset = queryset.filter(student_id=student_id)
+    if course_id is not None:
+        queryset = queryset.filter(lesson__course_id=course_id)
+    queryset = queryset.order_by("pk")
+    if skip:
+        # Every skipped id lies above the cursor, so this many ids always hold
+        # ``limit`` new ones when there are that many.
+        candidates = queryset.values_list("pk", flat=True)[: len(skip) + limit]
+        queryset = Attempt.objects.filter(pk__in=[pk for pk in candidates if pk not in skip][:limit]).order_by("pk")
+    floor = cursor if floor is None else floor
+    return [_encode(row, floor) for row in queryset.values_list(*_EVENT_FIELDS)[:limit]]
+
+
+def latest_attempt_id() -> int:
+    return Attempt.objects.aggregate(latest=Max("pk"))["latest"] or 0
+
+
+class Subscription:
+    __slots__ = ("student_id", "course_id", "queue", "overflowed")
+
+    def __init__(self, student_id: Optional[int], course_id: Optional[int], queue_size: int) -> None:
+        self.student_id = student_id
+        self.course_id = course_id
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.overflowed = False
+
+    def offer(self, event: AttemptEvent) -> None:
+        if self.overflowed:
+            return
+        if self.student_id is not None and event.student_id != self.student_id:
+            return
+        if self.course_id is not None and event.course_id != self.course_id:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class AttemptBroadcaster:
+    """Single per-process reader fanning new attempts out to subscribers."""
+
+    def __init__(self, poll_interval: float = 1.0, queue_size: int = 1000, commit_window: float = 10.0) -> None:
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.commit_window = commit_window
+        self.cursor: Optional[int] = None
+        self.floor: Optional[int] = None
+        # Ids delivered above the floor, and the cursor after each recent poll.
+        self._delivered: Set[int] = set()
+        self._marks: Deque[Tuple[float, int]] = deque()
+        self._subscribers: Set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    async def subscribe(self, student_id: Optional[int] = None, course_id: Optional[int] = None) -> Subscription:
+        """Register a subscriber and return once the broadcaster's cursor is set.
+
+        Every attempt after :attr:`cursor` is delivered to the subscription,
+        and so is any attempt above :attr:`floor` that commits late; callers
+        replaying history should read up to at least the cursor themselves.
+        """
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._subscribers = set()
+            self._wakeup = asyncio.Event()
+            self._ready = asyncio.Event()
+            self._task = None
+            self._reset()
+        subscription = Subscription(student_id, course_id, self.queue_size)
+        self._subscribers.add(subscription)
+        if self._task is None or self._task.done():
+            self._ready.clear()
+            self._task = loop.create_task(self._run())
+        await self._ready.wait()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+        if not self._subscribers and self._wakeup is not None:
+            self._wakeup.set()
+
+    def notify(self) -> None:
+        """Wake the reader now; safe to call from any thread."""
+
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    def _reset(self) -> None:
+        self.cursor = self.floor = None
+        self._delivered = set()
+        self._marks.clear()
+
+    def _advance_floor(self, now: float) -> None:
+        self._marks.append((now, self.cursor))
+        floor = self.floor
+        while self._marks and self._marks[0][0] <= now - self.commit_window:
+            floor = self._marks.popleft()[1]
+        if floor != self.floor:
+            self.floor = floor
+            self._delivered = {pk for pk in self._delivered if pk > floor}
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self.cursor is None:
+            self.cursor = self.floor = await sync_to_async(latest_attempt_id)()
+        self._ready.set()
+        while self._subscribers:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._subscribers:
+                break
+            events = await sync_to_async(attempts_after)(self.floor, skip=self._delivered)
+            for event in events:
+                self._delivered.add(event.id)
+                self.cursor = max(self.cursor, event.id)
+                for subscription in tuple(self._subscribers):
+                    subscription.offer(event)
+            self._advance_floor(loop.time())
+            if len(events) == _BATCH_SIZE:
+                self._wakeup.set()
+        # Restarting later begins from the then-latest attempt, not from here.
+        self._reset()
+
+
+_broadcaster: Optional[AttemptBroadcaster] = None
+
+
+def get_broadcaster() -> AttemptBroadcaster:
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = AttemptBroadcaster(
+            poll_interval=getattr(settings, "ATTEMPT_STREAM_POLL_INTERVAL", 1.0),
+            queue_size=getattr(settings, "ATTEMPT_STREAM_QUEUE_SIZE", 1000),
+            commit_window=getattr(settings, "ATTEMPT_STREAM_COMMIT_WINDOW", 10.0),
+        )
+    return _broadcaster
+
+
+def _optional_id(value: Optional[str], name: str) -> Optional[int]:
+    if value in (None, ""):
+        return None
+    if not value.isdigit():
+        raise ValueError(f"{name} must be a non-negative integer.")
+    return int(value)
+
+
+def _event_floor(value: Optional[str]) -> Optional[int]:
+    """The floor in a ``Last-Event-ID`` of ``<attempt id>:<floor>`` or a bare attempt id."""
+
+    if value in (None, ""):
+        return None
+    pk, _, floor = value.partition(":")
+    _optional_id(pk, "Last-Event-ID")
+    return _optional_id(floor or pk, "Last-Event-ID")
+
+
+async def _event_stream(
+    broadcaster: AttemptBroadcaster,
+    student_id: Optional[int],
+    course_id: Optional[int],
+    floor: Optional[int],
+):
+    heartbeat = getattr(settings, "ATTEMPT_STREAM_HEARTBEAT", 15.0)
+    subscription = await broadcaster.subscribe(student_id=student_id, course_id=course_id)
+    replayed: Set[int] = set()
+    try:
+        yield f"retry: {int(broadcaster.poll_interval * 1000) + 2000}\n\n".encode()
+        if floor is not None:
+            # Replay everything the broadcaster will not deliver: attempts up to
+            # its cursor (and possibly a little beyond, deduplicated below).
+            sent = floor
+            while True:
+                backlog = await sync_to_async(attempts_after)(
+                    sent, student_id=student_id, course_id=course_id, floor=floor
+                )
+                for event in backlog:
+                    yield event.payload
+                    replayed.add(event.id)
+                    sent = event.id
+                if len(backlog) < _BATCH_SIZE:
+                    break
+        else:
+            floor = 0
+        while True:
+            if subscription.overflowed and subscription.queue.empty():
+                return
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield _KEEPALIVE
+                continue
+            if event.id > floor and event.id not in replayed:
+                yield event.payload
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+async def attempt_stream_view(request):
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    if sharding_enabled():
+        # One id cursor cannot follow attempts written to several shards.
+        return JsonResponse({"detail": "The attempt stream is unavailable while attempts are sharded."}, status=503)
+    try:
+        student_id = _optional_id(request.GET.get("student"), "student")
+        course_id = _optional_id(request.GET.get("course"), "course")
+        floor = _event_floor(request.headers.get("Last-Event-ID") or request.GET.get("last_event_id"))
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+
+    response = StreamingHttpResponse(
+        _event_stream(get_broadcaster(), student_id, course_id, floor),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+__all__ = [
+    "AttemptBroadcaster",
+    "AttemptEvent",
+    "attempt_stream_view",
+    "attempts_after",
+    "get_broadcaster",
+    "latest_attempt_id",
+]
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from core.management.commands import analyze_snapshots
+from core.models import Attempt, AttemptAnalysis, Course, Lesson, Student
+
+
+@pytest.fixture
+def snapshot_attempts(db):
+    student = Student.objects.create(name="Student", email="s@example.com")
+    course = Course.objects.create(name="Course", description="", difficulty=1)
+    lesson = Lesson.objects.create(course=course, title="Loops", order_index=1)
+    snippets = [
+        "spare = 1\nprint('hi')\n",
+        "def total(items):\n    for i in range(len(items) + 1):\n        print(items[i])\n",
+        "def broken(:\n    pass\n",
+        "",
+    ]
+    for snippet in snippets:
+        Attempt.objects.create(
+            student=student,
+            lesson=lesson,
+            timestamp=timezone.now(),
+            correctness=0.5,
+            duration_sec=60,
+            code_snapshot=snippet,
+        )
+    return lesson
+
+
+def _run(**options) -> str:
+    out = StringIO()
+    call_command("analyze_snapshots", "--workers", "1", stdout=out, **options)
+    return out.getvalue()
+
+
+@pytest.mark.django_db
+def test_analyze_snapshots_stores_issue_summaries(snapshot_attempts):
+    output = _run(chunk_size=2)
+    assert "snippets/s" in output
+    analyses = AttemptAnalysis.objects.all()
+    # Blank snapshots are skipped entirely.
+    assert analyses.count() == 3
+    by_rules = [analysis.issue_counts for analysis in analyses.order_by("attempt_id")]
+    assert by_rules[0] == {"unused-variable": 1}
+    assert by_rules[1]["for-loop-off-by-one"] == 1
+    assert by_rules[2] == {"syntax-error": 1}
+
+
+@pytest.mark.django_db
+def test_analyze_snapshots_skips_rows_already_analyzed(snapshot_attempts, monkeypatch):
+    _run(limit=1)
+    assert AttemptAnalysis.objects.count() == 1
+    output = _run()
+    assert "Analyzed 2 snapshots under rule version" in output
+    assert "Analyzed 0 snapshots" in _run()
+
+    monkeypatch.setattr(analyze_snapshots, "RULE_VERSION", "next")
+    assert "Analyzed 3 snapshots" in _run()
+    assert set(AttemptAnalysis.objects.values_list("rule_version", flat=True)) == {"next"}
+
+
+@pytest.mark.django_db
+def test_lesson_issue_frequencies_reports_share_of_snippets(snapshot_attempts):
+    _run()
+    frequencies = analyze_snapshots.lesson_issue_frequencies()
+    summary = frequencies[snapshot_attempts.id]
+    assert summary["snippets"] == 3
+    assert summary["rules"]["syntax-error"] == pytest.approx(1 / 3, rel=1e-3)
@@ -5,6 +5,7 @@ from django.urls import reverse
 from django.utils import timezone
 
 from core.models import Attempt, Course, Lesson, Student
+from core.querybudget import query_budget
 
 
 @pytest.fixture
@@ -43,6 +44,120 @@ def sample_data():
     return student, python, js
 
 
+@pytest.fixture(params=[1, 6], ids=["small", "scaled"])
+def scaled_data(request, db):
+    """The same shape of data at two sizes, so query counts must not grow with it."""
+
+    scale = request.param
+    student = Student.objects.create(name="Scaled", email="scaled@example.com", weak_tags=["loops"])
+    lessons = []
+    for course_index in range(2 * scale):
+        course = Course.objects.create(name=f"Course {course_index}", tags=["loops"])
+        for order in range(1, 4):
+            lessons.append(Lesson.objects.create(course=course, title=f"Lesson {order}", order_index=order))
+    for attempt_index in range(5 * scale):
+        Attempt.objects.create(
+            student=student,
+            lesson=lessons[attempt_index % len(lessons)],
+            timestamp=timezone.now() - timezone.timedelta(hours=attempt_index),
+            correctness=0.5,
+            hints_used=attempt_index % 3,
+            duration_sec=120,
+            code_snapshot=f"value = {attempt_index}\nprint(value)\n",
+        )
+    return student, lessons
+
+
+@pytest.mark.django_db
+def test_student_overview_stays_within_query_budget(client, scaled_data):
+    student, _ = scaled_data
+    with query_budget(5):
+        response = client.get(reverse("student-overview", args=[student.pk]))
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_student_recommendation_stays_within_query_budget(client, scaled_data):
+    student, _ = scaled_data
+    with query_budget(5):
+        response = client.get(reverse("student-recommendation", args=[student.pk]))
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_student_dashboard_loads_once_for_both_views(client, scaled_data):
+    student, _ = scaled_data
+    with query_budget(5):
+        response = client.get(reverse("student-dashboard", args=[student.pk]))
+    assert response.status_code == 200
+    payload = response.json()
+
+    overview = client.get(reverse("student-overview", args=[student.pk])).json()
+    recommendation = client.get(reverse("student-recommendation", args=[student.pk])).json()
+    assert payload["student"] == overview["student"]
+    assert payload["courses"] == overview["courses"]
+    assert payload["recommendation"]["recommendation"]["course_id"] == (
+        recommendation["recommendation"]["course_id"]
+    )
+    assert [item["course_id"] for item in payload["recommendation"]["alternatives"]] == [
+        item["course_id"] for item in recommendation["alternatives"]
+    ]
+
+
+@pytest.mark.django_db
+def test_student_dashboard_returns_404_for_unknown_student(client, db):
+    response = client.get(reverse("student-dashboard", args=[999]))
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_attempt_listing_stays_within_query_budget(client, scaled_data):
+    with query_budget(1):
+        response = client.get(reverse("attempt-collection"))
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_attempt_creation_stays_within_query_budget(client, scaled_data):
+    student, lessons = scaled_data
+    payload = {
+        "student": student.id,
+        "lesson": lessons[-1].id,
+        "timestamp": (timezone.now() - timezone.timedelta(minutes=1)).isoformat(),
+        "correctness": 0.9,
+        "hints_used": 0,
+        "duration_sec": 60,
+        "code_snapshot": "def f(items):\n    return len(items)\n",
+    }
+    # Validation lookups for student and lesson, the insert (the similarity index
+    # is written after commit, off the request), up to four for the
+    # lesson-completion row (read, insert, re-read, update),
+    # one upsert into each daily rollup, and up to four for the lesson sketch
+    # (read, insert, re-read, update) plus the read behind the response percentiles.
+    with query_budget(16):
+        response = client.post(reverse("attempt-collection"), data=payload, content_type="application/json")
+    assert response.status_code == 201
+
+
+@pytest.mark.django_db
+def test_similar_submissions_stays_within_query_budget(client, scaled_data):
+    _, lessons = scaled_data
+    with query_budget(3):
+        response = client.get(reverse("lesson-similar-submissions", args=[lessons[0].id]))
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_code_analysis_endpoints_do_not_query(client, scaled_data):
+    with query_budget(0):
+        response = client.post(reverse("analyze-code"), data={"code": "x = 1\n"}, content_type="application/json")
+        assert response.status_code == 200
+        response = client.post(
+            reverse("analyze-project"), data={"files": {"a.py": "y = 2\n"}}, content_type="application/json"
+        )
+    assert response.status_code == 200
+
+
 @pytest.mark.django_db
 def test_student_overview_returns_progress(client, sample_data):
     student, python, _ = sample_data
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import json
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Attempt, AttemptArchiveSegment, Course, Lesson, LessonCompletion, Student, StudentDailyActivity
+from core.services.archive import AttemptRecord, decode_segment, encode_segment, iter_attempt_records
+from core.services.completion import rebuild_completions
+from core.services.lesson_stats import lesson_sketches, rebuild_sketches
+from core.services.rollups import rebuild_rollups
+
+COMPLETION_FIELDS = ("student_id", "course_id", "bits", "attempts_count", "hints_total", "last_attempt_at")
+
+
+@pytest.fixture
+def history(db):
+    course = Course.objects.create(name="Python Basics", tags=["loops"])
+    lessons = [Lesson.objects.create(course=course, title=f"Lesson {index}", order_index=index) for index in range(4)]
+    students = [Student.objects.create(name=f"Student {index}", email=f"s{index}@example.com") for index in range(3)]
+    now = timezone.now()
+    # Every student has attempts spread over the last year, a third of them recent.
+    for index, student in enumerate(students):
+        for step in range(9):
+            Attempt.objects.create(
+                student=student,
+                lesson=lessons[(index + step) % 4],
+                timestamp=now - timedelta(days=40 * step + index, minutes=step),
+                correctness=round(0.1 * step, 2),
+                hints_used=step % 3,
+                duration_sec=30 + 10 * step,
+                code_snapshot=f"print({index}, {step})  # ünïcode\n",
+            )
+    return course, lessons, students
+
+
+def _completions():
+    return sorted(LessonCompletion.objects.values_list(*COMPLETION_FIELDS))
+
+
+def _overview(client, student):
+    return client.get(reverse("student-overview", args=[student.pk])).json()
+
+
+def test_segments_round_trip():
+    now = timezone.now().replace(microsecond=123456)
+    records = [
+        AttemptRecord(7, 3, 11, now, 0.75, 2, 90, "for i in range(3):\n    print(i)\n"),
+        AttemptRecord(5, 3, 12, now - timedelta(hours=1), 1.0, 0, 15, ""),
+    ]
+    assert decode_segment(3, encode_segment(records)) == sorted(records, key=lambda record: record.sort_key)
+    assert decode_segment(3, encode_segment([])) == []
+
+
+def test_archiving_keeps_progress_listing_and_export(client, history, django_capture_on_commit_callbacks):
+    course, lessons, students = history
+    completions = _completions()
+    overviews = [_overview(client, student) for student in students]
+    exported = [record._asdict() for record in iter_attempt_records()]
+    total = Attempt.objects.count()
+
+    output = StringIO()
+    with django_capture_on_commit_callbacks() as callbacks:
+        call_command("archive_attempts", "--older-than-days", "100", "--batch-size", "2", stdout=output)
+    # Archived attempts are not deletions from history: no completion rebuild is scheduled.
+    assert not callbacks
+    hot = Attempt.objects.count()
+    assert f"Archived {total - hot} attempts" in output.getvalue()
+    assert 0 < hot < total
+    assert not Attempt.objects.filter(timestamp__lt=timezone.now() - timedelta(days=101)).exists()
+    assert AttemptArchiveSegment.objects.exists()
+
+    assert _completions() == completions
+    assert [_overview(client, student) for student in students] == overviews
+    assert [record._asdict() for record in iter_attempt_records()] == exported
+
+    # Archiving again finds nothing; a shorter window merges into existing segments.
+    call_command("archive_attempts", "--older-than-days", "100", stdout=StringIO())
+    assert Attempt.objects.count() == hot
+    call_command("archive_attempts", "--older-than-days", "0", stdout=StringIO())
+    assert [record._asdict() for record in iter_attempt_records()] == exported
+
+    student = students[1]
+    listing = client.get(reverse("attempt-collection"), {"student": student.pk, "archived": "1"}).json()["results"]
+    mine = sorted((row for row in exported if row["student_id"] == student.pk), key=lambda row: row["timestamp"])
+    assert [row["id"] for row in listing] == [row["id"] for row in reversed(mine)]
+    assert all(row["archived"] and row["student"]["name"] == student.name for row in listing)
+    assert client.get(reverse("attempt-collection")).json()["count"] == Attempt.objects.count() < 3
+    cutoff = mine[-3]["timestamp"]
+    older = client.get(reverse("attempt-collection"), {"archived": "true", "before": cutoff.isoformat()}).json()
+    assert [row["id"] for row in older["results"]] == [
+        row["id"] for row in sorted(exported, key=lambda row: row["timestamp"], reverse=True) if row["timestamp"] < cutoff
+    ]
+
+    response = client.get(reverse("attempt-export"), {"student": student.pk, "code": "1"})
+    assert response["Content-Type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+    assert [(row["id"], row["code_snapshot"]) for row in rows] == [(row["id"], row["code_snapshot"]) for row in mine]
+    hot_only = client.get(reverse("attempt-export"), {"archived": "0"})
+    assert [json.loads(line)["id"] for line in b"".join(hot_only.streaming_content).splitlines()] == list(
+        Attempt.objects.values_list("pk", flat=True)
+    )
+
+
+def test_rebuilds_read_the_archive(history):
+    course, lessons, students = history
+    completions = _completions()
+    rollups = sorted(StudentDailyActivity.objects.values_list("student_id", "day", "attempts", "hints_total"))
+    counts = {lesson.pk: lesson_sketches(lesson.pk).duration.n for lesson in lessons}
+
+    call_command("archive_attempts", "--older-than-days", "30", stdout=StringIO())
+    LessonCompletion.objects.all().delete()
+    StudentDailyActivity.objects.all().delete()
+    rebuild_completions()
+    rebuild_rollups()
+    rebuild_sketches()
+
+    assert _completions() == completions
+    assert sorted(StudentDailyActivity.objects.values_list("student_id", "day", "attempts", "hints_total")) == rollups
+    assert {lesson.pk: lesson_sketches(lesson.pk).duration.n for lesson in lessons} == counts
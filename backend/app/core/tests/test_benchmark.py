@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from core.services.benchmark import BenchmarkCase, compare, measure
+from core.services.synthetic import ScalePreset, generate_dataset
+
+
+def test_compare_flags_slowdowns_beyond_threshold_and_any_extra_query():
+    baseline = {
+        "overview": {"wall_ms_p50": 10.0, "queries": 4, "peak_memory_kb": 100.0},
+        "removed": {"wall_ms_p50": 1.0, "queries": 1, "peak_memory_kb": 1.0},
+    }
+    current = {
+        "overview": {"wall_ms_p50": 11.5, "queries": 5, "peak_memory_kb": 130.0},
+        "added": {"wall_ms_p50": 99.0, "queries": 9, "peak_memory_kb": 9.0},
+    }
+    regressions = compare(current, baseline, threshold=0.2)
+    assert {(item.case, item.metric) for item in regressions} == {
+        ("overview", "queries"),
+        ("overview", "peak_memory_kb"),
+    }
+    assert "+30.0%" in str(next(item for item in regressions if item.metric == "peak_memory_kb"))
+
+
+@pytest.mark.django_db
+def test_measure_reports_per_operation_timings():
+    calls = []
+    result = measure(BenchmarkCase("noop", lambda: calls.append(1), operations=10), repeat=3, warmup=1)
+    # warmup + timed iterations + one query capture + one memory capture
+    assert len(calls) == 6
+    assert result.iterations == 3
+    assert result.queries == 0
+    assert result.wall_ms_p50 <= result.wall_ms_p95
+
+
+@pytest.mark.django_db
+def test_benchmark_command_writes_and_compares_baseline(tmp_path):
+    generate_dataset(ScalePreset(students=12, courses=3, lessons_per_course=4, mean_attempts=6), seed=3)
+    baseline = tmp_path / "baseline.json"
+    out = StringIO()
+    call_command("benchmark_api", "--in-place", "--repeat", "2", "--output", str(baseline), stdout=out)
+    report = json.loads(baseline.read_text())
+    assert {"student_overview.heavy", "attempt_collection.post", "score_candidate"} <= set(report["cases"])
+    assert report["cases"]["attempt_collection.get"]["queries"] == 1
+
+    report["cases"]["student_overview.heavy"]["queries"] -= 1
+    baseline.write_text(json.dumps(report))
+    with pytest.raises(CommandError, match="regression"):
+        call_command(
+            "benchmark_api",
+            "--in-place",
+            "--repeat",
+            "1",
+            "--case",
+            "student_overview",
+            "--compare",
+            str(baseline),
+            "--threshold",
+            "100",
+            stdout=StringIO(),
+        )
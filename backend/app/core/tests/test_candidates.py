@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Attempt, Course, Lesson, Student
+from core.querybudget import query_budget
+from core.services import candidates
+from core.services.candidates import rank_course_candidates, score_columns
+from core.services.recommender import score_candidate
+
+
+@pytest.fixture
+def cohort(db):
+    course = Course.objects.create(name="Python", tags=["loops", "functions"])
+    lessons = [Lesson.objects.create(course=course, title=f"L{order}", order_index=order) for order in range(1, 5)]
+    other = Course.objects.create(name="Web", tags=["dom"])
+    other_lesson = Lesson.objects.create(course=other, title="DOM", order_index=1)
+    tag_sets = [["loops"], ["dom"], [], ["functions", "dom"], ["loops", "functions"]]
+    students = []
+    for index in range(25):
+        student = Student.objects.create(
+            name=f"Student {index}", email=f"s{index}@example.com", weak_tags=tag_sets[index % len(tag_sets)]
+        )
+        students.append(student)
+        for attempt_index in range(index % 4):
+            Attempt.objects.create(
+                student=student,
+                lesson=lessons[attempt_index],
+                timestamp=timezone.now() - timezone.timedelta(days=index, hours=attempt_index),
+                correctness=0.5,
+                hints_used=(index + attempt_index) % 3,
+                duration_sec=60,
+            )
+        if index % 3 == 0:
+            Attempt.objects.create(
+                student=student,
+                lesson=other_lesson,
+                timestamp=timezone.now(),
+                correctness=1.0,
+                duration_sec=60,
+            )
+    return course, students
+
+
+def _brute_force(course, now):
+    lessons_total = course.lessons.count()
+    expected = []
+    for student in Student.objects.all():
+        rows = list(Attempt.objects.filter(student=student, lesson__course=course))
+        focus = set(student.weak_tags)
+        inputs = {
+            "progress_percent": len({row.lesson_id for row in rows}) / lessons_total * 100.0,
+            "recency_gap_days": (now - max(row.timestamp for row in rows)).total_seconds() / 86400.0
+            if rows
+            else 30.0,
+            "tag_alignment": len(set(course.tags) & focus) / len(focus) if focus else 0.0,
+            "hint_rate": sum(row.hints_used for row in rows) / len(rows) if rows else 0.0,
+        }
+        expected.append((score_candidate(**inputs).score, student.pk))
+    expected.sort(key=lambda item: (-item[0], item[1]))
+    return expected
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("chunk_size", [4, 1000])
+def test_rank_matches_per_student_scoring(cohort, chunk_size):
+    course, _ = cohort
+    now = timezone.now()
+    ranked = rank_course_candidates(course, limit=7, now=now, chunk_size=chunk_size)
+    expected = _brute_force(course, now)[:7]
+    assert [features.student_id for _, features in ranked] == [student_id for _, student_id in expected]
+    assert [score for score, _ in ranked] == pytest.approx([score for score, _ in expected])
+
+
+@pytest.mark.django_db
+def test_candidates_endpoint_runs_a_fixed_number_of_queries(client, cohort):
+    course, _ = cohort
+    # Course, lesson count, progress aggregate, student stream, names of the top N.
+    with query_budget(5):
+        response = client.get(reverse("course-candidates", args=[course.pk]), {"limit": 3})
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["course"] == {"id": course.pk, "name": "Python"}
+    assert len(payload["candidates"]) == 3
+    top = payload["candidates"][0]
+    assert set(top["student"]) == {"id", "name", "email"}
+    assert set(top["reason_features"]) == {"progress_gap", "recency_gap", "tag_alignment", "support_need"}
+    scores = [candidate["score"] for candidate in payload["candidates"]]
+    assert scores == sorted(scores, reverse=True)
+
+
+@pytest.mark.django_db
+def test_candidates_endpoint_validates_input(client, cohort):
+    course, _ = cohort
+    assert client.get(reverse("course-candidates", args=[999999])).status_code == 404
+    assert client.get(reverse("course-candidates", args=[course.pk]), {"limit": 0}).status_code == 400
+
+
+def test_numpy_scoring_matches_the_feature_normalizers(monkeypatch):
+    pytest.importorskip("numpy")
+    columns = {
+        "progress_gap": [0.0, 37.5, 100.0, 120.0],
+        "recency_gap": [0.0, 3.2, 30.0, float("inf")],
+        "tag_alignment": [0.0, 0.5, 1.0, 1.5],
+        "support_need": [0.0, 1.2, 3.0, 9.0],
+    }
+    vectorized = list(score_columns(columns))
+    monkeypatch.setattr(candidates, "np", None)
+    assert vectorized == score_columns(columns)
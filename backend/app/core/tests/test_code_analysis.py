@@ -1,6 +1,11 @@
 from __future__ import annotations
 
+import io
+import zipfile
+
 import pytest
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 
 
@@ -71,3 +76,86 @@ def summarise(values):
     response = client.post(reverse("analyze-code"), data={"code": code}, format="json")
     assert response.status_code == 200
     assert response.json()["issues"] == []
+
+
+@pytest.fixture
+def empty_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def _project(count: int) -> dict:
+    return {
+        f"pkg/module_{index}.py": f"def compute_{index}(values):\n    return sum(values) + {index}\n"
+        for index in range(count)
+    }
+
+
+@pytest.mark.django_db
+def test_analyze_project_reports_issues_with_paths(client, empty_cache):
+    files = {
+        "app/main.py": "unused = 1\nprint('hi')\n",
+        "app/util.py": "def helper(x):\n    return x\n",
+        "app/broken.py": "def broken(:\n",
+    }
+    response = client.post(reverse("analyze-project"), data={"files": files}, content_type="application/json")
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["summary"] == {"files": 3, "analyzed": 3, "cached": 0, "issues": 2}
+    located = {(issue["path"], issue["rule"]) for issue in payload["issues"]}
+    assert located == {("app/main.py", "unused-variable"), ("app/broken.py", "syntax-error")}
+
+
+@pytest.mark.django_db
+def test_analyze_project_only_reanalyzes_changed_files(client, empty_cache):
+    files = _project(50)
+    url = reverse("analyze-project")
+    first = client.post(url, data={"files": files}, content_type="application/json").json()
+    assert first["summary"]["analyzed"] == 50
+
+    files["pkg/module_7.py"] = "value = 1\n"
+    second = client.post(url, data={"files": files}, content_type="application/json").json()
+    assert second["summary"]["analyzed"] == 1
+    assert second["summary"]["cached"] == 49
+    changed = next(item for item in second["files"] if item["path"] == "pkg/module_7.py")
+    assert changed["cached"] is False
+
+
+@pytest.mark.django_db
+def test_analyze_project_in_worker_processes_matches_inline(client, empty_cache, settings):
+    files = {**_project(6), "pkg/broken.py": "def broken(:\n"}
+    url = reverse("analyze-project")
+    settings.CODE_ANALYSIS_WORKERS = 2
+    pooled = client.post(url, data={"files": files}, content_type="application/json").json()
+    cache.clear()
+    settings.CODE_ANALYSIS_WORKERS = 0
+    inline = client.post(url, data={"files": files}, content_type="application/json").json()
+    assert pooled == inline and pooled["summary"]["analyzed"] == 7
+
+
+@pytest.mark.django_db
+def test_analyze_project_accepts_zip_archive(client, empty_cache):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("project/main.py", "spare = 2\nprint('x')\n")
+        archive.writestr("project/README.md", "not python")
+    upload = SimpleUploadedFile("project.zip", buffer.getvalue(), content_type="application/zip")
+    response = client.post(reverse("analyze-project"), data={"archive": upload})
+    assert response.status_code == 200
+    payload = response.json()
+    assert [item["path"] for item in payload["files"]] == ["project/main.py"]
+    assert payload["issues"][0]["rule"] == "unused-variable"
+
+
+@pytest.mark.django_db
+def test_analyze_project_rejects_invalid_payloads(client, empty_cache):
+    url = reverse("analyze-project")
+    assert client.post(url, data={}, content_type="application/json").status_code == 400
+    escaping = {"files": {"../secrets.py": "print(1)\n"}}
+    assert client.post(url, data=escaping, content_type="application/json").status_code == 400
+    duplicated = {"files": {"pkg/main.py": "print(1)\n", "pkg/./main.py": "print(2)\n"}}
+    response = client.post(url, data=duplicated, content_type="application/json")
+    assert response.status_code == 400 and "pkg/main.py" in str(response.json())
+    bad_zip = SimpleUploadedFile("project.zip", b"not a zip", content_type="application/zip")
+    assert client.post(url, data={"archive": bad_zip}).status_code == 400
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+import numpy as np
+import pytest
+from django.core.management import call_command
+
+from core.models import Attempt, AttemptArchiveSegment
+from core.services.archive import iter_attempt_records
+from core.services.columnar import MANIFEST, load_columnar_export, write_columnar_export
+from core.services.synthetic import ScalePreset, generate_dataset
+
+
+@pytest.fixture
+def history(db):
+    generate_dataset(ScalePreset(students=10, courses=3, lessons_per_course=4, mean_attempts=8), seed=5)
+    call_command("archive_attempts", "--older-than-days", "20", stdout=StringIO())
+    assert Attempt.objects.exists() and AttemptArchiveSegment.objects.exists()
+    return list(iter_attempt_records(with_code=False))
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _micros(timestamp):
+    return (timestamp - EPOCH) // timedelta(microseconds=1)
+
+
+def test_export_round_trips_hot_and_archived_attempts(tmp_path, history):
+    output = StringIO()
+    call_command("export_attempt_columns", "--output", str(tmp_path), "--chunk-size", "7", stdout=output)
+    assert f"Exported {len(history)} attempts" in output.getvalue()
+    manifest = json.loads((tmp_path / MANIFEST).read_text())
+    assert manifest["rows"] == len(history)
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        [MANIFEST] + [column["file"] for column in manifest["columns"]]
+    )
+
+    columns = load_columnar_export(tmp_path, use_numpy=False)
+    assert list(columns["id"]) == [record.id for record in history]
+    assert list(columns["student_id"]) == [record.student_id for record in history]
+    assert list(columns["lesson_id"]) == [record.lesson_id for record in history]
+    assert list(columns["timestamp"]) == [_micros(record.timestamp) for record in history]
+    assert list(columns["correctness"]) == [record.correctness for record in history]
+    assert list(columns["hints_used"]) == [record.hints_used for record in history]
+    assert list(columns["duration_sec"]) == [record.duration_sec for record in history]
+
+    hot = write_columnar_export(tmp_path, include_archived=False)
+    assert hot["rows"] == Attempt.objects.count()
+    with pytest.raises(ValueError):
+        (tmp_path / "hints_used.bin").write_bytes(b"\0" * 3)
+        load_columnar_export(tmp_path, use_numpy=False)
+
+
+def test_numpy_loader_maps_the_columns(tmp_path, history):
+    start = history[len(history) // 2].timestamp
+    write_columnar_export(tmp_path, start=start)
+    columns = load_columnar_export(tmp_path)
+    kept = [record for record in history if record.timestamp >= start]
+    assert isinstance(columns["duration_sec"], np.memmap)
+    assert columns["timestamp"].dtype == np.dtype("datetime64[us]")
+    assert columns["id"].tolist() == [record.id for record in kept]
+    assert columns["timestamp"].astype("int64").tolist() == [_micros(record.timestamp) for record in kept]
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Attempt, Course, Lesson, LessonCompletion, Student
+from core.services.completion import (
+    decode_bits,
+    first_missing,
+    lesson_mask,
+    parse_order_ranges,
+    rebuild_completions,
+    student_completions,
+)
+
+
+def test_bitmap_helpers():
+    mask = lesson_mask([1, 2, 3, 5])
+    assert mask == 0b101110
+    assert first_missing(0b000110, mask) == 3
+    assert first_missing(0b101110, mask) is None
+    # Lessons 0 and 4 do not exist, so their bits never count as missing.
+    assert first_missing(0b001111, mask) == 5
+    assert parse_order_ranges("1-3, 7,") == {1, 2, 3, 7}
+    for spec in ("a", "3-1", "1-x", "-2", "1000000000", "100000000-100004096"):
+        with pytest.raises(ValueError):
+            parse_order_ranges(spec)
+    with pytest.raises(ValueError):
+        parse_order_ranges("5-7", highest=6)
+
+
+@pytest.fixture
+def course_with_six_lessons(db):
+    course = Course.objects.create(name="Python Basics", tags=["loops"])
+    lessons = [
+        Lesson.objects.create(course=course, title=f"Lesson {order}", order_index=order) for order in range(1, 7)
+    ]
+    return course, lessons
+
+
+def _attempt(student, lesson):
+    return Attempt.objects.create(
+        student=student,
+        lesson=lesson,
+        timestamp=timezone.now() - timezone.timedelta(hours=1),
+        correctness=0.8,
+        hints_used=0,
+        duration_sec=60,
+    )
+
+
+def test_attempts_maintain_the_bitmap_and_overview(client, course_with_six_lessons):
+    course, lessons = course_with_six_lessons
+    student = Student.objects.create(name="Ananya", email="ananya@example.com")
+    for lesson in (lessons[0], lessons[1], lessons[0], lessons[3]):
+        _attempt(student, lesson)
+
+    assert student_completions(student.pk) == {course.pk: 0b10110}
+    row = client.get(reverse("student-overview", args=[student.pk])).json()["courses"][0]
+    assert row["lessons_completed"] == 3
+    assert row["progress"] == 50.0
+    assert row["next_up"] == "Lesson 3"
+
+    incremental = student_completions(student.pk)
+    assert rebuild_completions() == 1
+    assert student_completions(student.pk) == incremental
+
+
+def test_edited_and_deleted_attempts_rebuild_the_totals(course_with_six_lessons, django_capture_on_commit_callbacks):
+    course, lessons = course_with_six_lessons
+    student = Student.objects.create(name="Ananya", email="ananya@example.com")
+    first, second, third = (_attempt(student, lesson) for lesson in (lessons[0], lessons[1], lessons[1]))
+
+    def totals():
+        return LessonCompletion.objects.values_list("bits", "attempts_count", "hints_total").get(student=student)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        first.hints_used = 3
+        first.save(update_fields=["hints_used"])
+        third.correctness = 1.0
+        third.save(update_fields=["correctness"])
+    assert totals() == (bytes([0b110]), 3, 3)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        second.delete()
+        third.delete()
+    assert totals() == (bytes([0b10]), 1, 3)
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        student.delete()
+    assert not callbacks
+
+
+def test_moving_a_lesson_rebuilds_the_course_bits(client, course_with_six_lessons, django_capture_on_commit_callbacks):
+    course, lessons = course_with_six_lessons
+    student = Student.objects.create(name="Ananya", email="ananya@example.com")
+    _attempt(student, lessons[0])
+    other = Course.objects.create(name="Other")
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        lessons[1].title = "Renamed"
+        lessons[1].save()
+    assert not callbacks
+    with django_capture_on_commit_callbacks(execute=True):
+        lessons[0].order_index = 9
+        lessons[0].save(update_fields=["order_index"])
+    assert student_completions(student.pk) == {course.pk: 1 << 9}
+    rows = client.get(reverse("student-overview", args=[student.pk])).json()["courses"]
+    assert [row["lessons_completed"] for row in rows if row["id"] == course.pk] == [1]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        lessons[0].course = other
+        lessons[0].save()
+    assert student_completions(student.pk) == {other.pk: 1 << 9}
+    with django_capture_on_commit_callbacks(execute=True):
+        lessons[0].delete()
+    assert student_completions(student.pk) == {}
+
+
+def test_cohort_endpoint_filters_with_set_operations(client, course_with_six_lessons):
+    course, lessons = course_with_six_lessons
+    finished = {"Five": 5, "All": 6, "Two": 2}
+    students = {}
+    for name, count in finished.items():
+        students[name] = Student.objects.create(name=name, email=f"{name.lower()}@example.com")
+        for lesson in lessons[:count]:
+            _attempt(students[name], lesson)
+    Student.objects.create(name="Idle", email="idle@example.com")
+
+    url = reverse("course-cohort", args=[course.pk])
+    payload = client.get(url, {"completed": "1-5", "missing": "6"}).json()
+    assert payload["count"] == 1
+    assert [student["name"] for student in payload["students"]] == ["Five"]
+    assert payload["completed"] == [1, 2, 3, 4, 5]
+
+    everyone = client.get(url, {"completed": "1", "limit": 2}).json()
+    assert everyone["count"] == 3
+    assert [student["id"] for student in everyone["students"]] == [students["Five"].pk, students["All"].pk]
+
+    assert client.get(url, {"completed": "1-3", "missing": "3"}).status_code == 400
+    assert client.get(url, {"completed": "one"}).status_code == 400
+    assert client.get(url, {"missing": "7"}).status_code == 400
+    assert client.get(url, {"completed": "100000000-100004096"}).status_code == 400
+    assert client.get(reverse("course-cohort", args=[999])).status_code == 404
+    assert LessonCompletion.objects.filter(course=course).count() == 3
+    assert decode_bits(LessonCompletion.objects.get(student=students["All"]).bits) == lesson_mask(range(1, 7))
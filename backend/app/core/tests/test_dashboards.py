@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import gzip
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Attempt, Lesson, Student
+from core.services.dashboards import MANIFEST, export_dashboards, load_manifest
+from core.services.synthetic import ScalePreset, generate_dataset
+from core.views import student_bundle_payloads
+
+
+@pytest.fixture
+def dataset(db):
+    generate_dataset(ScalePreset(students=8, courses=3, lessons_per_course=4, mean_attempts=6), seed=11)
+    return list(Student.objects.order_by("pk"))
+
+
+def _bundle(root, manifest, student_id, name):
+    path = root / manifest["students"][str(student_id)][name]
+    data = path.read_bytes()
+    assert gzip.decompress(path.with_name(f"{path.name}.gz").read_bytes()) == data
+    return json.loads(data)
+
+
+def test_bundles_match_the_api_and_only_changed_students_are_rewritten(client, tmp_path, dataset):
+    output = StringIO()
+    call_command("export_dashboards", "--output", str(tmp_path), "--batch-size", "3", stdout=output)
+    assert f"Rendered {len(dataset)} of {len(dataset)} students" in output.getvalue()
+    manifest = load_manifest(tmp_path)
+    assert json.loads(gzip.decompress((tmp_path / f"{MANIFEST}.gz").read_bytes())) == manifest
+
+    for student in dataset:
+        overview = client.get(reverse("student-overview", args=[student.pk])).json()
+        assert _bundle(tmp_path, manifest, student.pk, "overview") == overview
+        recommendation = client.get(reverse("student-recommendation", args=[student.pk])).json()
+        bundled = _bundle(tmp_path, manifest, student.pk, "recommendation")
+        assert bundled["recommendation"] == recommendation["recommendation"]
+        assert bundled["alternatives"] == recommendation["alternatives"]
+
+    files = sorted(path for path in tmp_path.rglob("*") if path.is_file())
+    again = export_dashboards(tmp_path, student_bundle_payloads)
+    assert again == {"students": len(dataset), "rendered": 0, "written": 0, "removed": 0}
+    assert sorted(path for path in tmp_path.rglob("*") if path.is_file()) == files
+
+    student = dataset[0]
+    lesson = Lesson.objects.exclude(attempts__student=student).first()
+    Attempt.objects.create(
+        student=student, lesson=lesson, timestamp=timezone.now(), correctness=1.0, hints_used=2, duration_sec=40
+    )
+    changed = export_dashboards(tmp_path, student_bundle_payloads)
+    assert changed["rendered"] == 1 and changed["written"] >= 2 and changed["removed"] == 0
+    updated = load_manifest(tmp_path)
+    previous_overview = manifest["students"][str(student.pk)]["overview"]
+    assert updated["students"][str(student.pk)]["overview"] != previous_overview
+    assert _bundle(tmp_path, updated, student.pk, "overview") == client.get(
+        reverse("student-overview", args=[student.pk])
+    ).json()
+    assert all(updated["students"][key] == entry for key, entry in manifest["students"].items() if key != str(student.pk))
+    # The previous generation stays for clients still holding the old manifest.
+    assert previous_overview in updated["retired"] and _bundle(tmp_path, manifest, student.pk, "overview")
+
+    # Stale bundles are rendered again; retired bundles go once the grace period is over.
+    later = timezone.now() + timedelta(days=2)
+    stale = export_dashboards(tmp_path, student_bundle_payloads, now=later)
+    assert stale["rendered"] == len(dataset) and stale["removed"] >= 2
+    assert not (tmp_path / previous_overview).exists() and previous_overview not in load_manifest(tmp_path)["retired"]
+    dataset[-1].delete()
+    export_dashboards(tmp_path, student_bundle_payloads, now=later, grace=timedelta(0))
+    assert not (tmp_path / "students" / str(dataset[-1].pk)).exists()
+
+
+def test_leftover_brotli_variants_are_removed(tmp_path, dataset):
+    export_dashboards(tmp_path, student_bundle_payloads)
+    manifest = load_manifest(tmp_path)
+    leftovers = [tmp_path / f"{MANIFEST}.br"] + [
+        tmp_path / f"{entry['overview']}.br" for entry in manifest["students"].values()
+    ]
+    for path in leftovers:
+        path.write_bytes(b"stale")
+    with mock.patch("core.services.dashboards.brotli", None):
+        counts = export_dashboards(tmp_path, student_bundle_payloads)
+    assert counts["removed"] == len(leftovers)
+    assert not any(path.exists() for path in leftovers)
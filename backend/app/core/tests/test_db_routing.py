@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import pytest
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.db_routing import PIN_COOKIE, REPLICA_ALIAS, pin_student
+from core.management.commands.sync_sqlite_replica import copy_sqlite_database
+from core.models import Attempt, Course, Lesson, Student
+
+
+@pytest.fixture
+def replica(tmp_path, transactional_db, settings):
+    """A second SQLite file registered as the replica alias, as REPLICA_DATABASE_URL would."""
+
+    settings.REPLICA_STICKY_SECONDS = 5.0
+    connections.settings[REPLICA_ALIAS] = {
+        **connections[DEFAULT_DB_ALIAS].settings_dict,
+        "NAME": str(tmp_path / "replica.sqlite3"),
+    }
+    # Connect up front: the test case only allows lazily opened connections on the aliases it declares.
+    connections[REPLICA_ALIAS].connect()
+    yield connections[REPLICA_ALIAS]
+    connections[REPLICA_ALIAS].close()
+    del connections[REPLICA_ALIAS]
+    del connections.settings[REPLICA_ALIAS]
+    cache.clear()
+
+
+@pytest.fixture
+def catalog(replica):
+    student = Student.objects.create(name="Ananya", email="ananya@example.com")
+    course = Course.objects.create(name="Python Basics")
+    lessons = [Lesson.objects.create(course=course, title=title, order_index=index) for index, title in enumerate("ABC")]
+    Attempt.objects.create(
+        student=student, lesson=lessons[0], timestamp=timezone.now(), correctness=1.0, hints_used=0, duration_sec=60
+    )
+    copy_sqlite_database()
+    cache.clear()  # the replica has caught up, so no pin is needed
+    return student, lessons
+
+
+def _completed(client, student):
+    return client.get(reverse("student-overview", args=[student.pk])).json()["courses"][0]["lessons_completed"]
+
+
+def test_reads_go_to_the_replica_until_the_student_writes(client, replica, catalog):
+    student, lessons = catalog
+    with CaptureQueriesContext(replica) as replica_queries:
+        assert _completed(client, student) == 1
+        assert client.get(reverse("student-recommendation", args=[student.pk])).status_code == 200
+    assert len(replica_queries) > 0
+
+    # The replica has not seen this write yet; the student's reads stick to the primary.
+    Attempt.objects.create(
+        student=student, lesson=lessons[1], timestamp=timezone.now(), correctness=1.0, hints_used=0, duration_sec=60
+    )
+    with CaptureQueriesContext(replica) as replica_queries:
+        assert _completed(client, student) == 2
+    assert len(replica_queries) == 0
+
+    cache.clear()
+    assert _completed(client, student) == 1
+    pin_student(student.pk)
+    assert _completed(client, student) == 2
+    cache.clear()
+    copy_sqlite_database()
+    assert _completed(client, student) == 2
+
+    # Views without the policy, and all writes, use the primary.
+    with CaptureQueriesContext(replica) as replica_queries:
+        client.get(reverse("student-timeline", args=[student.pk]))
+        loaded = Student.objects.using(REPLICA_ALIAS).get(pk=student.pk)
+        loaded.name = "Ananya S"
+        loaded.save()
+    assert [query["sql"].split()[0] for query in replica_queries] == ["SELECT"]
+    assert Student.objects.get(pk=student.pk).name == "Ananya S"
+
+
+def test_writing_client_reads_its_own_attempt(client, replica, catalog):
+    student, lessons = catalog
+    listing = reverse("attempt-collection")
+    response = client.post(
+        listing,
+        {
+            "student": student.pk,
+            "lesson": lessons[2].pk,
+            "timestamp": timezone.now().isoformat(),
+            "correctness": 0.5,
+            "hints_used": 1,
+            "duration_sec": 30,
+        },
+        content_type="application/json",
+    )
+    assert response.status_code == 201
+    assert response.cookies[PIN_COOKIE]["max-age"] == 5
+    cache.clear()
+
+    assert client.get(listing).json()["count"] == 2
+    client.cookies.pop(PIN_COOKIE)
+    assert client.get(listing).json()["count"] == 1
+    # Another client filtering on the student who just wrote reads the primary.
+    pin_student(student.pk)
+    assert client.get(listing, {"student": student.pk}).json()["count"] == 2
+    assert client.get(listing).json()["count"] == 1
+
+
+def test_failed_replica_reads_fall_back_to_the_primary(client, replica, catalog):
+    student, lessons = catalog
+    Attempt.objects.create(
+        student=student, lesson=lessons[1], timestamp=timezone.now(), correctness=1.0, hints_used=0, duration_sec=60
+    )
+    cache.clear()
+    with open(replica.settings_dict["NAME"], "r+b") as stream:
+        stream.write(b"not a database" * 8)
+    assert _completed(client, student) == 2
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Attempt, Course, Lesson, Student
+from core.querybudget import query_budget
+from core.services.feature_store import FeatureStore, get_feature_store, write_feature_store
+from core.services.synthetic import ScalePreset, generate_dataset
+
+
+@pytest.fixture
+def dataset(db):
+    generate_dataset(ScalePreset(students=12, courses=4, lessons_per_course=4, mean_attempts=9), seed=7)
+    # Leave a hole in the id range the store must skip.
+    Student.objects.order_by("pk")[3].delete()
+    return list(Student.objects.order_by("pk").values_list("pk", flat=True))
+
+
+def _recommendation(client, student_id):
+    payload = client.get(reverse("student-recommendation", args=[student_id])).json()
+    for feature in payload["reason_features"].values():
+        feature.pop("description")
+        if feature["value"] is not None:
+            feature["value"] = round(feature["value"], 4)
+    return payload
+
+
+def test_store_reads_match_the_database_path(client, settings, tmp_path, dataset):
+    path = tmp_path / "features.bin"
+    assert write_feature_store(path, shard_size=5) == {"students": len(dataset), "courses": 4}
+    store = FeatureStore(path)
+    assert dataset[0] - 1 not in store and dataset[3] - 1 not in store and dataset[-1] + 1 not in store
+
+    student_id = dataset[0]
+    attempts = Attempt.objects.filter(student_id=student_id)
+    course_id = attempts.values_list("lesson__course_id", flat=True).first()
+    features = store.features(student_id, course_id)
+    course_attempts = attempts.filter(lesson__course_id=course_id)
+    assert features.attempts == course_attempts.count()
+    assert features.last_activity == max(attempt.timestamp for attempt in course_attempts).timestamp()
+    assert set(store.student_features(student_id)) == set(Course.objects.values_list("pk", flat=True))
+
+    expected = {student_id: _recommendation(client, student_id) for student_id in dataset}
+    settings.FEATURE_STORE_PATH = str(path)
+    settings.FEATURE_STORE_MAX_AGE = 0
+    for student_id in dataset:
+        assert _recommendation(client, student_id) == expected[student_id]
+    with query_budget(2):
+        client.get(reverse("student-recommendation", args=[dataset[0]]))
+
+
+def test_readers_follow_refreshes_and_fall_back_when_unusable(client, settings, tmp_path, dataset):
+    path = tmp_path / "features.bin"
+    settings.FEATURE_STORE_PATH = str(path)
+    settings.FEATURE_STORE_MAX_AGE = 60
+    assert get_feature_store() is None
+
+    call_command("refresh_feature_store", "--shard-size", "4", stdout=StringIO())
+    first = get_feature_store()
+    assert first is not None and get_feature_store() is first
+    write_feature_store(path)
+    assert get_feature_store() not in (None, first)
+
+    write_feature_store(path, now=timezone.now() - timedelta(minutes=2))
+    assert get_feature_store() is None
+    path.write_bytes(b"not a feature store")
+    assert get_feature_store() is None
+
+    # A course created after the refresh is missing from the file: the view reads the database.
+    write_feature_store(path)
+    Course.objects.create(name="Aardvark Studies")
+    with query_budget(5):
+        payload = client.get(reverse("student-recommendation", args=[dataset[0]])).json()
+    assert payload["recommendation"] is not None
+
+
+def test_store_size_follows_students_and_lesson_changes_invalidate_it(client, settings, tmp_path, dataset):
+    outlier = Student.objects.create(pk=10**12, name="Outlier", email="outlier@example.com")
+    path = tmp_path / "features.bin"
+    assert write_feature_store(path)["students"] == len(dataset) + 1
+    # One row per student, however far apart their ids are.
+    assert path.stat().st_size < 4096
+    store = FeatureStore(path)
+    assert outlier.pk in store and outlier.pk - 1 not in store
+    assert set(store.student_features(outlier.pk)) == set(Course.objects.values_list("pk", flat=True))
+
+    settings.FEATURE_STORE_PATH = str(path)
+    settings.FEATURE_STORE_MAX_AGE = 0
+    url = reverse("student-recommendation", args=[dataset[0]])
+    with query_budget(2):
+        client.get(url)
+    # A student who has just written is read from the database, not the snapshot.
+    with mock.patch("core.views.student_pinned", return_value=True), CaptureQueriesContext(connection) as queries:
+        client.get(url)
+    assert len(queries) > 2
+    Lesson.objects.create(course=Course.objects.order_by("pk").first(), title="Bonus", order_index=99)
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url)
+    assert len(queries) > 2
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from core.models import NightlyRecommendation, Student
+from core.services import nightly
+from core.services.synthetic import ScalePreset, generate_dataset
+
+
+def test_shard_ranges_cover_the_id_span_without_overlap():
+    assert nightly.shard_ranges(3, 10, 4) == [(3, 7), (7, 11)]
+    assert nightly.shard_ranges(5, 5, 100) == [(5, 6)]
+
+
+@pytest.mark.django_db
+def test_table_output_matches_the_recommendation_endpoint(client):
+    generate_dataset(ScalePreset(students=12, courses=5, lessons_per_course=4, mean_attempts=9), seed=11)
+    out = StringIO()
+    call_command("generate_recommendations", "--workers", "1", "--shard-size", "5", stdout=out)
+    assert "students/s" in out.getvalue()
+
+    assert NightlyRecommendation.objects.count() == Student.objects.count()
+    for stored in NightlyRecommendation.objects.all():
+        payload = client.get(reverse("student-recommendation", args=[stored.student_id])).json()
+        assert stored.course_id == payload["recommendation"]["course_id"]
+        assert stored.explanation == payload["explanation"]
+        assert [alternative["course_id"] for alternative in stored.alternatives] == [
+            alternative["course_id"] for alternative in payload["alternatives"]
+        ]
+
+
+@pytest.mark.django_db
+def test_ndjson_run_resumes_after_a_crash(tmp_path, monkeypatch):
+    generate_dataset(ScalePreset(students=10, courses=3, lessons_per_course=3, mean_attempts=5), seed=4)
+    output = tmp_path / "recommendations.ndjson"
+    checkpoint = tmp_path / "checkpoint.json"
+    arguments = ["--workers", "1", "--shard-size", "3", "--format", "ndjson", "--output", str(output)]
+    arguments += ["--checkpoint", str(checkpoint)]
+
+    generate_shard = nightly.generate_shard
+    calls = []
+
+    def crash_on_second_shard(start, end, now_timestamp):
+        calls.append(start)
+        if len(calls) == 2:
+            # Simulate output flushed without its checkpoint entry.
+            with open(output, "a") as stream:
+                stream.write('{"partial": true')
+            raise RuntimeError("worker died")
+        return generate_shard(start, end, now_timestamp)
+
+    monkeypatch.setattr(nightly, "generate_shard", crash_on_second_shard)
+    with pytest.raises(RuntimeError):
+        call_command("generate_recommendations", *arguments, stdout=StringIO())
+    assert len(json.loads(checkpoint.read_text())["done"]) == 1
+
+    monkeypatch.setattr(nightly, "generate_shard", generate_shard)
+    out = StringIO()
+    call_command("generate_recommendations", *arguments, stdout=out)
+    assert "Resuming: 1 of" in out.getvalue()
+
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(row["student_id"] for row in rows) == sorted(Student.objects.values_list("pk", flat=True))
+    assert len({row["generated_at"] for row in rows}) == 1
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+from django.urls import reverse
+
+from core.metrics import LATENCY_BUCKETS, MetricsRegistry, RequestMetricsMiddleware, _QueryTimer
+
+
+def _sample_line(text: str, prefix: str) -> float:
+    line = next(line for line in text.splitlines() if line.startswith(prefix))
+    return float(line.rsplit(" ", 1)[1])
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_reports_views_queries_and_statuses(client):
+    before = client.get(reverse("metrics")).content.decode()
+    client.get(reverse("student-overview", args=[424242]))
+    client.get(reverse("attempt-collection"))
+
+    response = client.get(reverse("metrics"))
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    text = response.content.decode()
+
+    prefix = 'codingal_http_requests_total{view="student-overview",status="404"}'
+    previous = _sample_line(before, prefix) if prefix in before else 0
+    assert _sample_line(text, prefix) == previous + 1
+    assert _sample_line(text, 'codingal_db_queries_total{view="attempt-collection"}') >= 1
+    assert _sample_line(text, 'codingal_http_response_bytes_total{view="attempt-collection"}') > 0
+    assert 'codingal_http_request_duration_seconds_bucket{view="attempt-collection",le="+Inf"}' in text
+
+
+def test_registry_merges_worker_files(tmp_path):
+    registry = MetricsRegistry(str(tmp_path), flush_interval=0)
+    registry.observe("student-overview", 200, 0.003, 4, 0.001, 512)
+    other_worker = MetricsRegistry()
+    other_worker.observe("student-overview", 200, 0.2, 5, 0.05, 100)
+    other_worker.observe("student-overview", 500, 9.0, 1, 0.0, 10)
+    (tmp_path / "metrics-999999.json").write_text(json.dumps(other_worker._local_state()))
+
+    state = registry.collect()
+    counters = state["views"]["student-overview"]
+    assert counters[0] == 3
+    assert counters[2] == 10
+    assert state["statuses"]["student-overview"] == {"200": 2, "500": 1}
+
+    text = registry.render()
+    assert 'le="0.005"} 1' in text
+    assert f'le="{LATENCY_BUCKETS[-1]}"}} 2' in text
+    assert 'le="+Inf"} 3' in text
+    assert list(tmp_path.glob("metrics-*.json"))
+
+
+def test_middleware_records_every_request_under_its_labels():
+    registry = MetricsRegistry()
+
+    class _Response:
+        streaming = False
+        status_code = 200
+        content = b"{}"
+
+    class _Request:
+        resolver_match = None
+
+    middleware = RequestMetricsMiddleware(lambda request: _Response())
+    middleware.registry = registry
+    request = _Request()
+    for _ in range(200):
+        middleware(request)
+    state = registry.collect()
+    counters = state["views"]["unresolved"]
+    assert counters[0] == 200
+    assert counters[2] == 0
+    assert state["statuses"]["unresolved"] == {"200": 200}
+    assert 'codingal_http_response_bytes_total{view="unresolved"} 400' in registry.render()
+
+
+def test_query_timer_counts_queries():
+    timer = _QueryTimer()
+    assert timer(lambda sql, params, many, context: "rows", "SELECT 1", (), False, {}) == "rows"
+    assert timer.count == 1
+    assert timer.seconds >= 0
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import pstats
+
+import pytest
+from django.http import HttpRequest
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Attempt, Course, Lesson, Student
+from core.profiling import StageTimer, stage
+
+
+@pytest.fixture
+def student(db):
+    student = Student.objects.create(name="Student", email="s@example.com", weak_tags=["loops"])
+    course = Course.objects.create(name="Course", description="", difficulty=1, tags=["loops"])
+    lesson = Lesson.objects.create(course=course, title="Loops", order_index=1)
+    Attempt.objects.create(
+        student=student, lesson=lesson, timestamp=timezone.now(), correctness=0.5, duration_sec=60
+    )
+    return student
+
+
+def test_stage_is_a_shared_noop_without_a_timer():
+    request = HttpRequest()
+    assert stage(request, "load") is stage(request, "score")
+    with stage(request, "load"):
+        pass
+
+
+def test_stage_timer_formats_server_timing():
+    timer = StageTimer()
+    with timer.stage("load"):
+        pass
+    with timer.stage("load"):
+        pass
+    with timer.stage("score"):
+        pass
+    header = timer.server_timing()
+    assert header.startswith("load;dur=")
+    assert header.count("load") == 1
+    assert ", score;dur=" in header
+
+
+@pytest.mark.django_db
+def test_recommendation_has_no_server_timing_by_default(client, student):
+    response = client.get(reverse("student-recommendation", args=[student.pk]))
+    assert response.status_code == 200
+    assert "Server-Timing" not in response
+
+
+@pytest.mark.django_db
+@override_settings(PROFILING_SERVER_TIMING=True)
+def test_recommendation_reports_stage_breakdown(client, student):
+    response = client.get(reverse("student-recommendation", args=[student.pk]))
+    assert response.status_code == 200
+    stages = [item.split(";")[0] for item in response["Server-Timing"].split(", ")]
+    assert stages == ["load", "aggregate", "score", "serialize", "render"]
+    assert response.json()["recommendation"]["title"] == 'Continue "Course"'
+
+
+@pytest.mark.django_db
+def test_profile_header_dumps_cprofile_capture(client, student, tmp_path):
+    url = reverse("student-recommendation", args=[student.pk])
+    with override_settings(PROFILING_ALLOW_HEADER=False, PROFILING_DIR=str(tmp_path)):
+        client.get(url, HTTP_X_PROFILE="1")
+    assert not list(tmp_path.iterdir())
+
+    with override_settings(PROFILING_ALLOW_HEADER=True, PROFILING_DIR=str(tmp_path)):
+        response = client.get(url, HTTP_X_PROFILE="1")
+    assert "Server-Timing" in response
+    dumps = list(tmp_path.glob("student-recommendation-*.prof"))
+    assert len(dumps) == 1
+    assert pstats.Stats(str(dumps[0])).total_calls > 0
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Attempt, Course, Lesson, LessonSketch, Student
+from core.services.lesson_stats import lesson_sketches, rebuild_sketches
+from core.services.quantiles import KLLSketch
+
+N = 20000
+FRACTIONS = [index / 50 for index in range(1, 50)]
+
+
+def _max_rank_error(sketch: KLLSketch) -> float:
+    return max(abs(sketch.rank(fraction * N - 0.5) - fraction) for fraction in FRACTIONS)
+
+
+@pytest.mark.parametrize("order", ["sorted", "reversed", "random"])
+def test_sketch_rank_error_and_size_stay_bounded(order):
+    values = list(range(N))
+    if order == "reversed":
+        values.reverse()
+    elif order == "random":
+        random.Random(5).shuffle(values)
+    sketch = KLLSketch()
+    for value in values:
+        sketch.update(value)
+
+    assert sketch.n == N and (sketch.min, sketch.max) == (0, N - 1)
+    assert _max_rank_error(sketch) < 0.02
+    assert abs(sketch.quantile(0.5) - N / 2) < 0.02 * N
+    assert sketch.retained < 3 * sketch.k + 50
+    assert len(sketch.to_bytes()) < 3000
+
+
+def test_sketches_merge_and_round_trip():
+    parts = [KLLSketch() for _ in range(4)]
+    for index, value in enumerate(random.Random(9).sample(range(N), N)):
+        parts[index % 4].update(value)
+    merged = KLLSketch.from_bytes(parts[0].to_bytes())
+    for part in parts[1:]:
+        merged.merge(KLLSketch.from_bytes(part.to_bytes()))
+    assert merged.n == N
+    assert _max_rank_error(merged) < 0.02
+
+    small = KLLSketch()
+    for value in (0.5, 0.7, 0.7, 1.0):
+        small.update(value)
+    # Exact while nothing has been compacted; ties count half.
+    assert small.rank(0.7) == 0.5
+    assert small.quantile(0.5) == pytest.approx(0.7)
+    with pytest.raises(ValueError):
+        small.merge(KLLSketch(k=64))
+
+
+@pytest.fixture
+def lesson_attempts(db):
+    course = Course.objects.create(name="Python Basics")
+    lesson = Lesson.objects.create(course=course, title="Loops", order_index=1)
+    student = Student.objects.create(name="Ananya", email="ananya@example.com")
+    for duration in range(60, 1060, 10):
+        Attempt.objects.create(
+            student=student,
+            lesson=lesson,
+            timestamp=timezone.now() - timezone.timedelta(minutes=duration),
+            correctness=duration / 1060,
+            hints_used=0,
+            duration_sec=duration,
+        )
+    return student, lesson
+
+
+def test_lesson_stats_endpoint_and_attempt_percentiles(client, lesson_attempts):
+    student, lesson = lesson_attempts
+    with override_settings(PROFILING_SERVER_TIMING=True):
+        response = client.get(reverse("lesson-stats", args=[lesson.pk]))
+    assert [item.split(";")[0] for item in response["Server-Timing"].split(", ")] == ["load", "serialize", "render"]
+    stats = response.json()
+    assert stats["attempts"] == 100
+    assert stats["duration_sec"]["min"] == 60 and stats["duration_sec"]["max"] == 1050
+    assert stats["duration_sec"]["p50"] == pytest.approx(550, abs=10)
+    assert stats["correctness"]["p90"] == pytest.approx(960 / 1060, abs=0.01)
+
+    response = client.post(
+        reverse("attempt-collection"),
+        data={
+            "student": student.pk,
+            "lesson": lesson.pk,
+            "timestamp": timezone.now().isoformat(),
+            "correctness": 0.5,
+            "hints_used": 0,
+            "duration_sec": 855,
+        },
+        content_type="application/json",
+    )
+    assert response.status_code == 201
+    assert response.json()["percentiles"]["duration"] == pytest.approx(80.0, abs=1.0)
+
+    listed = client.get(reverse("attempt-collection")).json()["results"]
+    assert all(row["percentiles"] is not None for row in listed)
+
+    version = LessonSketch.objects.get(lesson=lesson).version
+    assert version == 101
+    incremental = lesson_sketches(lesson.pk).duration.to_bytes()
+    assert rebuild_sketches() == 1
+    assert lesson_sketches(lesson.pk).duration.to_bytes() == incremental
+
+    empty = Lesson.objects.create(course=lesson.course, title="Functions", order_index=2)
+    assert client.get(reverse("lesson-stats", args=[empty.pk])).json()["attempts"] == 0
+    assert client.get(reverse("lesson-stats", args=[999])).status_code == 404
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import logging
+
+import pytest
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.test import RequestFactory, override_settings
+
+from core.models import Course, Lesson
+from core.querybudget import (
+    QueryBudgetExceeded,
+    RepeatedQueryDetector,
+    RepeatedQueryMiddleware,
+    query_budget,
+    sql_shape,
+)
+
+
+def test_sql_shape_collapses_literals_and_in_lists():
+    first = sql_shape("SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'a'")
+    second = sql_shape("SELECT * FROM t WHERE id IN (%s, %s) AND name = 'bob'")
+    assert first == second == "SELECT * FROM t WHERE id IN (...) AND name = ?"
+
+
+@pytest.mark.django_db
+def test_query_budget_context_manager_and_decorator():
+    with query_budget(1) as budget:
+        list(Course.objects.all())
+    assert len(budget.captured_queries) == 1
+
+    @query_budget(1)
+    def two_queries():
+        list(Course.objects.all())
+        list(Lesson.objects.all())
+
+    with pytest.raises(QueryBudgetExceeded, match="2 queries executed, budget is 1"):
+        two_queries()
+
+
+@pytest.mark.django_db
+def test_repeated_query_detector_reports_n_plus_one_origin():
+    course = Course.objects.create(name="Course")
+    for index in range(4):
+        Lesson.objects.create(course=course, title=f"L{index}", order_index=index)
+    detector = RepeatedQueryDetector(threshold=3)
+    with connection.execute_wrapper(detector):
+        titles = [lesson.course.name for lesson in Lesson.objects.all()]
+    assert len(titles) == 4
+    (shape, count), = detector.repeated().items()
+    assert count == 4
+    assert '"core_course"' in shape
+    assert "test_querybudget.py" in detector.origins[shape]
+
+
+@pytest.mark.django_db
+def test_repeated_query_middleware_logs_in_debug_only(caplog):
+    course = Course.objects.create(name="Course")
+    for index in range(3):
+        Lesson.objects.create(course=course, title=f"L{index}", order_index=index)
+
+    def view(request):
+        return [lesson.course.name for lesson in Lesson.objects.all()]
+
+    request = RequestFactory().get("/api/example/")
+    with override_settings(DEBUG=True, QUERY_REPEAT_THRESHOLD=3):
+        with caplog.at_level(logging.WARNING, "core.queries"):
+            RepeatedQueryMiddleware(view)(request)
+    assert "Possible N+1: 3 identical queries during GET /api/example/" in caplog.text
+
+    with override_settings(DEBUG=False), pytest.raises(MiddlewareNotUsed):
+        RepeatedQueryMiddleware(view)
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import json
+import time
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from core.models import Student
+from core.services.recommender import FEATURES
+from core.services.replay import (
+    ReplayCatalog,
+    ReplayEngine,
+    baseline_weights,
+    parse_weight_set,
+    replay_history,
+)
+from core.services.synthetic import ScalePreset, generate_dataset
+
+DAY = 86400.0
+
+
+def test_parse_weight_set_overrides_named_features_only():
+    weights = parse_weight_set("recent:recency_gap=0.5, support_need=0")
+    current = {feature.key: feature.weight for feature in FEATURES}
+    assert weights.name == "recent"
+    assert weights.as_dict() == {**current, "recency_gap": 0.5, "support_need": 0.0}
+    for spec in ("no-name", ":recency_gap=1", "x:unknown=1", "x:recency_gap=high"):
+        with pytest.raises(ValueError):
+            parse_weight_set(spec)
+
+
+def test_engine_scores_decision_points_before_applying_the_attempt():
+    # Course 1 has two lessons, course 2 one; both untagged, ranked by name order.
+    catalog = ReplayCatalog([(1, [], [11, 12]), (2, [], [21])])
+    progress_only = parse_weight_set("progress:progress_gap=1,recency_gap=0,tag_alignment=0,support_need=0")
+    engine = ReplayEngine(catalog, [baseline_weights(), progress_only], session_gap=3600.0, top_n=1)
+
+    engine.feed(7, 11, 0.0, 0)  # cold start: tie, course 1 listed first -> hit
+    engine.feed(7, 12, 60.0, 0)  # same session, not a decision point
+    engine.feed(7, 21, 2 * DAY, 0)  # course 1 done, course 2 untouched -> hit
+    engine.feed(7, 99, 9 * DAY, 0)  # unknown lesson is ignored
+
+    assert engine.events == 3
+    for stats in engine.stats:
+        assert (stats.decisions, stats.hits_at_1) == (2, 2)
+    # Both courses are complete; the baseline prefers the one idle for longer.
+    assert engine.recommend(7, 3 * DAY) == [[1], [1]]
+
+
+@pytest.mark.django_db
+def test_replay_matches_the_live_recommendation_endpoint(client):
+    generate_dataset(ScalePreset(students=12, courses=5, lessons_per_course=4, mean_attempts=9), seed=7)
+    engine, _ = replay_history([baseline_weights()], chunk_size=50)
+    assert engine.events > 0
+
+    for student_id in Student.objects.values_list("pk", flat=True):
+        now = time.time()
+        payload = client.get(reverse("student-recommendation", args=[student_id])).json()
+        expected = [payload["recommendation"]["course_id"]] + [
+            alternative["course_id"] for alternative in payload["alternatives"]
+        ]
+        assert engine.recommend(student_id, now)[0] == expected
+
+
+@pytest.mark.django_db
+def test_replay_command_reports_each_weight_set(tmp_path):
+    generate_dataset(ScalePreset(students=6, courses=3, lessons_per_course=3, mean_attempts=6), seed=3)
+    output = tmp_path / "replay.json"
+    out = StringIO()
+    call_command(
+        "replay_recommendations",
+        "--weights",
+        "recent:recency_gap=0.6",
+        "--session-gap-minutes",
+        "0",
+        "--output",
+        str(output),
+        stdout=out,
+    )
+    report = json.loads(output.read_text())
+    assert [entry["name"] for entry in report["weight_sets"]] == ["baseline", "recent"]
+    assert report["weight_sets"][0]["decisions"] == report["attempts"]
+    assert report["weight_sets"][0]["changed_from_baseline"] == 0.0
+    assert "attempts/s" in out.getvalue()
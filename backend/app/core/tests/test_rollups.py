@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from datetime import datetime, time, timedelta
+from unittest import mock
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Attempt, Course, Lesson, LessonDailyActivity, Student, StudentDailyActivity
+from core.querybudget import query_budget
+from core.services.rollups import rebuild_rollups
+
+ROLLUP_FIELDS = ("day", "attempts", "duration_total", "correctness_total", "hints_total")
+
+
+@pytest.fixture
+def activity(db):
+    student = Student.objects.create(name="Ananya", email="ananya@example.com")
+    python = Course.objects.create(name="Python Basics")
+    js = Course.objects.create(name="JavaScript")
+    lessons = [
+        Lesson.objects.create(course=python, title="Variables", order_index=1),
+        Lesson.objects.create(course=python, title="Loops", order_index=2),
+        Lesson.objects.create(course=js, title="Syntax", order_index=1),
+    ]
+    early_today = timezone.make_aware(datetime.combine(timezone.localdate(), time(1)))
+    # (days ago, lesson, correctness, hints, duration)
+    for days_ago, lesson, correctness, hints, duration in [
+        (0, 0, 0.5, 1, 100),
+        (0, 1, 1.0, 0, 300),
+        (2, 0, 0.25, 2, 60),
+        (2, 2, 0.75, 1, 120),
+        (40, 2, 1.0, 0, 30),
+    ]:
+        Attempt.objects.create(
+            student=student,
+            lesson=lessons[lesson],
+            timestamp=early_today - timedelta(days=days_ago),
+            correctness=correctness,
+            hints_used=hints,
+            duration_sec=duration,
+        )
+    return student, python, js, lessons
+
+
+def _snapshot():
+    return (
+        sorted(StudentDailyActivity.objects.values_list("student_id", "course_id", *ROLLUP_FIELDS)),
+        sorted(LessonDailyActivity.objects.values_list("lesson_id", *ROLLUP_FIELDS)),
+    )
+
+
+def test_incremental_rollups_match_a_rebuild(activity):
+    incremental = _snapshot()
+    assert len(incremental[0]) == 4 and len(incremental[1]) == 5
+    assert rebuild_rollups() == {"student_days": 4, "lesson_days": 5}
+    assert _snapshot() == incremental
+
+    since = timezone.localdate() - timedelta(days=1)
+    StudentDailyActivity.objects.update(attempts=99)
+    rebuild_rollups(since)
+    assert sorted(StudentDailyActivity.objects.values_list("attempts", flat=True)) == [2, 99, 99, 99]
+
+
+def test_edits_and_deletes_match_a_rebuild(activity):
+    student, python, js, lessons = activity
+
+    def matches_rebuild():
+        incremental = _snapshot()
+        rebuild_rollups()
+        return _snapshot() == incremental
+
+    edited = Attempt.objects.filter(lesson=lessons[0]).order_by("timestamp").first()
+    edited.hints_used, edited.lesson, edited.timestamp = 3, lessons[1], edited.timestamp + timedelta(days=1)
+    edited.save()
+    assert matches_rebuild()
+    edited.duration_sec = 45
+    edited.save(update_fields=["duration_sec"])
+    assert matches_rebuild()
+
+    Attempt.objects.filter(lesson=lessons[0]).delete()
+    assert not LessonDailyActivity.objects.filter(lesson=lessons[0]).exists()
+    assert matches_rebuild()
+    lessons[2].delete()
+    assert matches_rebuild()
+    other = Student.objects.create(name="Ravi", email="ravi@example.com")
+    Attempt.objects.create(
+        student=other, lesson=lessons[1], timestamp=timezone.now(), correctness=0.5, hints_used=0, duration_sec=10
+    )
+    other.delete()
+    assert matches_rebuild()
+    python.delete()
+    assert _snapshot() == ([], [])
+
+
+def test_failed_attempt_create_rolls_back_its_rollups(client, activity):
+    student, python, js, lessons = activity
+    before = (Attempt.objects.count(), _snapshot())
+    payload = {
+        "student": student.pk,
+        "lesson": lessons[1].pk,
+        "timestamp": timezone.now().isoformat(),
+        "correctness": 1.0,
+        "hints_used": 0,
+        "duration_sec": 30,
+    }
+    with mock.patch("core.signals.record_attempt_sketch", side_effect=RuntimeError), pytest.raises(RuntimeError):
+        client.post(reverse("attempt-collection"), payload, content_type="application/json")
+    assert (Attempt.objects.count(), _snapshot()) == before
+
+
+def test_timeline_serves_daily_rows_from_the_rollups(client, activity):
+    student, python, js, _ = activity
+    today = timezone.localdate()
+    url = reverse("student-timeline", args=[student.pk])
+    with query_budget(3):
+        payload = client.get(url).json()
+
+    assert payload["from"] == (today - timedelta(days=29)).isoformat()
+    assert [course["name"] for course in payload["courses"]] == ["JavaScript", "Python Basics"]
+    python_row = payload["courses"][1]
+    assert python_row["attempts"] == 3
+    assert python_row["days"] == [
+        {
+            "date": (today - timedelta(days=2)).isoformat(),
+            "attempts": 1,
+            "duration_sec": 60,
+            "mean_correctness": 0.25,
+            "hints": 2,
+        },
+        {"date": today.isoformat(), "attempts": 2, "duration_sec": 400, "mean_correctness": 0.75, "hints": 1},
+    ]
+
+    year = client.get(url, {"from": (today - timedelta(days=365)).isoformat(), "course": js.pk}).json()
+    assert [course["id"] for course in year["courses"]] == [js.pk]
+    assert len(year["courses"][0]["days"]) == 2
+
+    assert client.get(url, {"from": today.isoformat(), "to": (today - timedelta(days=1)).isoformat()}).status_code == 400
+    assert client.get(url, {"from": (today - timedelta(days=400)).isoformat()}).status_code == 400
+    assert client.get(reverse("student-timeline", args=[999])).status_code == 404
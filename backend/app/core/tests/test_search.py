@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import pytest
+from django.urls import reverse
+
+from core.models import Course, Lesson, SearchDocument
+from core.querybudget import query_budget
+from core.services.search import rebuild_search_index, search_catalog
+
+
+@pytest.fixture
+def catalog(db):
+    python = Course.objects.create(
+        name="Python Basics", description="Start programming with loops and functions.", tags=["python", "beginner"]
+    )
+    games = Course.objects.create(name="Game Design", description="Build small games.", tags=["games"])
+    lessons = {
+        "loops": Lesson.objects.create(course=python, title="Loops", tags=["loops", "control flow"], order_index=1),
+        "functions": Lesson.objects.create(course=python, title="Functions", tags=["functions"], order_index=2),
+        "sprites": Lesson.objects.create(course=games, title="Sprites", tags=["graphics"], order_index=1),
+        "game_loop": Lesson.objects.create(course=games, title="The Game Loop", tags=["loops"], order_index=2),
+    }
+    return python, games, lessons
+
+
+def _titles(hits):
+    return [hit.title for hit in hits]
+
+
+def test_prefix_terms_rank_titles_above_descriptions(catalog):
+    hits = search_catalog("loo")
+    assert set(_titles(hits)) == {"Loops", "The Game Loop", "Python Basics"}
+    # Both lesson titles match; the course only mentions loops in its description.
+    assert _titles(hits)[-1] == "Python Basics"
+    assert hits[0].score >= hits[1].score >= hits[2].score
+
+    assert _titles(search_catalog("python loops")) == ["Loops", "Python Basics"]
+    assert _titles(search_catalog("game LOOP")) == ["The Game Loop"]
+    assert search_catalog("recursion") == []
+    assert search_catalog("  !! ") == []
+
+
+def test_tag_filters_are_exact(catalog):
+    _, games, _ = catalog
+    assert set(_titles(search_catalog("loop", tags=["loops"]))) == {"Loops", "The Game Loop"}
+    assert _titles(search_catalog("loop", tags=["flow"])) == []
+    assert _titles(search_catalog("loop", tags=["control flow"])) == ["Loops"]
+    assert _titles(search_catalog("loop", tags=["Control Flow"])) == ["Loops"]
+    hits = search_catalog("game", tags=["games"])
+    assert [(hit.kind, hit.course_id) for hit in hits] == [("course", games.pk)]
+
+
+def test_documents_follow_catalog_changes(catalog):
+    python, _, lessons = catalog
+    assert SearchDocument.objects.count() == 6
+
+    python.name = "Snake Club"
+    python.save()
+    assert {hit.title for hit in search_catalog("snake")} == {"Snake Club", "Loops", "Functions"}
+    assert _titles(search_catalog("python basics")) == []
+
+    lessons["functions"].title = "Procedures"
+    lessons["functions"].save()
+    assert _titles(search_catalog("proc")) == ["Procedures"]
+
+    python.delete()
+    assert SearchDocument.objects.count() == 3
+    assert _titles(search_catalog("snake")) == []
+
+    SearchDocument.objects.all().delete()
+    assert rebuild_search_index() == 3
+    assert set(_titles(search_catalog("loop"))) == {"The Game Loop"}
+
+
+def test_search_endpoint(client, catalog):
+    python, _, lessons = catalog
+    url = reverse("search")
+    with query_budget(1):
+        payload = client.get(url, {"q": "python lo", "tag": "loops"}).json()
+    assert payload["count"] == 1
+    result = payload["results"][0]
+    assert result["type"] == "lesson"
+    assert result["id"] == lessons["loops"].pk
+    assert result["course"] == {"id": python.pk, "name": "Python Basics"}
+    assert result["tags"] == ["loops", "control flow"]
+
+    assert client.get(url, {"q": "loo", "limit": 1}).json()["count"] == 1
+    assert client.get(url).status_code == 400
+    assert client.get(url, {"q": "?!"}).status_code == 400
+    assert client.get(url, {"q": "loo", "limit": 500}).status_code == 400
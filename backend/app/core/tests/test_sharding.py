@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from core.management.commands.sync_sqlite_replica import copy_sqlite_database
+from core.models import (
+    Attempt,
+    AttemptAnalysis,
+    Course,
+    Lesson,
+    LessonCompletion,
+    Student,
+    StudentDailyActivity,
+    SubmissionSignature,
+)
+from core.querybudget import wrap_all_connections
+from core.services.completion import progress_for_students, rebuild_completions
+from core.services.synthetic import ScalePreset, generate_dataset
+from core import sharding
+from core.sharding import ID_BLOCK, jump_hash, shard_for_student
+
+SHARDS = ("shard_1", "shard_2")
+SNIPPET = "total = 0\nfor value in values:\n    total += value\nprint(total)\n"
+
+
+def test_jump_hash_only_moves_keys_to_the_new_shard():
+    moved = 0
+    for key in range(10000):
+        before, after = jump_hash(key, 2), jump_hash(key, 3)
+        assert after in (before, 2)
+        moved += after != before
+    assert 0.3 < moved / 10000 < 0.37
+
+
+@pytest.fixture
+def shards(tmp_path, transactional_db, settings):
+    """Two more SQLite files with default's (still empty) schema, as SHARD_DATABASE_URLS would add."""
+
+    for alias in SHARDS:
+        connections.settings[alias] = {
+            **connections[DEFAULT_DB_ALIAS].settings_dict,
+            "NAME": str(tmp_path / f"{alias}.sqlite3"),
+        }
+        connections[alias].connect()
+        copy_sqlite_database(DEFAULT_DB_ALIAS, alias)
+    yield settings
+    for alias in SHARDS:
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+
+@pytest.fixture
+def school(shards):
+    course = Course.objects.create(name="Python Basics", tags=["loops"])
+    lessons = [Lesson.objects.create(course=course, title=f"Lesson {index}", order_index=index) for index in range(3)]
+    students = [Student.objects.create(name=f"Student {index:02}", email=f"s{index}@example.com") for index in range(12)]
+    start = timezone.now() - timedelta(days=3)
+    for index, student in enumerate(students):
+        for step in range(index % 3 + 1):
+            Attempt.objects.create(
+                student=student,
+                lesson=lessons[step],
+                timestamp=start + timedelta(minutes=10 * index + step),
+                correctness=0.5 + step / 10,
+                hints_used=step,
+                duration_sec=60 * (step + 1),
+                code_snapshot=SNIPPET if index < 4 else "",
+            )
+    return course, lessons, students
+
+
+def _views(client, course, students):
+    student_views = {
+        student.pk: [
+            client.get(reverse("student-overview", args=[student.pk])).json(),
+            client.get(reverse("student-timeline", args=[student.pk])).json(),
+            client.get(reverse("student-recommendation", args=[student.pk])).json()["recommendation"],
+        ]
+        for student in students
+    }
+    listing = client.get(reverse("attempt-collection")).json()["results"]
+    for attempt in listing:
+        attempt.pop("id")
+    groups = client.get(reverse("lesson-similar-submissions", args=[course.lessons.first().pk])).json()["groups"]
+    return {
+        "students": student_views,
+        "listing": listing,
+        "cohort": client.get(reverse("course-cohort", args=[course.pk]), {"completed": "0-1"}).json(),
+        "similar": [sorted(member["student_id"] for member in group["submissions"]) for group in groups],
+    }
+
+
+def test_rebalance_moves_students_without_changing_responses(client, shards, school):
+    course, lessons, students = school
+    before = _views(client, course, students)
+    assert before["similar"] == [[student.pk for student in students[:4]]]
+
+    shards.STUDENT_SHARDS = [DEFAULT_DB_ALIAS, *SHARDS]
+    homes = {student.pk: shard_for_student(student.pk) for student in students}
+    assert set(homes.values()) == {DEFAULT_DB_ALIAS, *SHARDS}
+    dry_run = StringIO()
+    call_command("rebalance_shards", "--dry-run", stdout=dry_run)
+    moving = sum(home != DEFAULT_DB_ALIAS for home in homes.values())
+    assert f"Would move {moving} students" in dry_run.getvalue()
+    assert Attempt.objects.using("shard_1").count() == 0
+    call_command("rebalance_shards", "--batch-size", "2", stdout=StringIO())
+
+    for alias in (DEFAULT_DB_ALIAS, *SHARDS):
+        owners = set(Attempt.objects.using(alias).values_list("student_id", flat=True))
+        owners |= set(LessonCompletion.objects.using(alias).values_list("student_id", flat=True))
+        owners |= set(StudentDailyActivity.objects.using(alias).values_list("student_id", flat=True))
+        assert owners == {pk for pk, home in homes.items() if home == alias}
+        assert Lesson.objects.using(alias).count() == 3
+        ids = Attempt.objects.using(alias).values_list("pk", flat=True)
+        position = (DEFAULT_DB_ALIAS, *SHARDS).index(alias)
+        assert all(position * ID_BLOCK < pk < (position + 1) * ID_BLOCK for pk in ids)
+    assert sum(SubmissionSignature.objects.using(alias).count() for alias in (DEFAULT_DB_ALIAS, *SHARDS)) == 7
+
+    assert _views(client, course, students) == before
+    again = StringIO()
+    call_command("rebalance_shards", stdout=again)
+    assert "Moved 0 students" in again.getvalue()
+
+
+def test_new_students_and_attempts_land_on_their_shard(client, shards, school):
+    course, lessons, students = school
+    shards.STUDENT_SHARDS = [DEFAULT_DB_ALIAS, *SHARDS]
+    call_command("rebalance_shards", stdout=StringIO())
+
+    newcomers = [Student.objects.create(name=f"New {index}", email=f"new{index}@example.com") for index in range(6)]
+    newcomer = next(student for student in newcomers if shard_for_student(student.pk) != DEFAULT_DB_ALIAS)
+    home = shard_for_student(newcomer.pk)
+    assert Student.objects.using(home).get(pk=newcomer.pk).created_at == newcomer.created_at
+    Lesson.objects.filter(pk=lessons[2].pk).update(title="Loops")
+    lessons[2].refresh_from_db()
+    lessons[2].save()
+    assert Lesson.objects.using(home).get(pk=lessons[2].pk).title == "Loops"
+
+    response = client.post(
+        reverse("attempt-collection"),
+        {
+            "student": newcomer.pk,
+            "lesson": lessons[2].pk,
+            "timestamp": timezone.now().isoformat(),
+            "correctness": 0.9,
+            "hints_used": 0,
+            "duration_sec": 45,
+            "code_snapshot": SNIPPET,
+        },
+        content_type="application/json",
+    )
+    assert response.status_code == 201
+    attempt_id = response.json()["id"]
+    assert Attempt.objects.using(home).filter(pk=attempt_id, student=newcomer).exists()
+    assert not Attempt.objects.using(DEFAULT_DB_ALIAS).filter(student=newcomer).exists()
+
+    listing = client.get(reverse("attempt-collection")).json()["results"]
+    assert listing[0]["id"] == attempt_id and listing[0]["percentiles"] is not None
+    overview = client.get(reverse("student-overview", args=[newcomer.pk])).json()
+    assert overview["courses"][0]["lessons_completed"] == 1
+    cohort = client.get(reverse("course-cohort", args=[course.pk]), {"completed": "2"}).json()
+    assert newcomer.pk in [student["id"] for student in cohort["students"]]
+    matches = client.get(
+        reverse("lesson-similar-submissions", args=[lessons[2].pk]), {"attempt": attempt_id}
+    ).json()["matches"]
+    assert [match["student_id"] for match in matches] == [students[2].pk]
+
+
+def test_request_query_wrappers_cover_every_shard(shards, school):
+    _, _, students = school
+    shards.STUDENT_SHARDS = [DEFAULT_DB_ALIAS, *SHARDS]
+    call_command("rebalance_shards", stdout=StringIO())
+    aliases = []
+
+    def wrapper(execute, sql, params, many, context):
+        aliases.append(context["connection"].alias)
+        return execute(sql, params, many, context)
+
+    with wrap_all_connections(wrapper):
+        progress_for_students(student.pk for student in students)
+    assert sorted(aliases) == sorted([DEFAULT_DB_ALIAS, *SHARDS])
+
+
+def test_backfill_commands_cover_every_shard_and_the_stream_refuses(client, shards, school):
+    shards.STUDENT_SHARDS = [DEFAULT_DB_ALIAS, *SHARDS]
+    call_command("rebalance_shards", stdout=StringIO())
+    aliases = (DEFAULT_DB_ALIAS, *SHARDS)
+    for alias in aliases:
+        SubmissionSignature.objects.using(alias).all().delete()
+
+    call_command("index_submissions", stdout=StringIO())
+    signatures = {alias: SubmissionSignature.objects.using(alias).count() for alias in aliases}
+    call_command("analyze_snapshots", "--workers", "1", stdout=StringIO())
+    analyses = {alias: AttemptAnalysis.objects.using(alias).count() for alias in aliases}
+    snippets = {alias: Attempt.objects.using(alias).exclude(code_snapshot="").count() for alias in aliases}
+    assert signatures == analyses == snippets and sum(snippets.values()) == 7
+    assert sum(1 for count in snippets.values() if count) > 1
+
+    assert client.get(reverse("attempt-stream")).status_code == 503
+
+
+def test_catalog_copies_follow_commits_retry_and_are_repaired(shards, school, monkeypatch, caplog):
+    _, lessons, _ = school
+    shards.STUDENT_SHARDS = [DEFAULT_DB_ALIAS, *SHARDS]
+    call_command("rebalance_shards", stdout=StringIO())
+    monkeypatch.setattr(sharding.time, "sleep", lambda seconds: None)
+    upsert_rows = sharding.upsert_rows
+    failures = []
+
+    def flaky_upsert(model, alias, instances, **kwargs):
+        if failures:
+            failures.pop()
+            raise DatabaseError("shard unavailable")
+        upsert_rows(model, alias, instances, **kwargs)
+
+    monkeypatch.setattr(sharding, "upsert_rows", flaky_upsert)
+
+    with pytest.raises(RuntimeError), transaction.atomic():
+        Course.objects.create(name="Rolled back")
+        raise RuntimeError
+    assert not Course.objects.using("shard_1").filter(name="Rolled back").exists()
+
+    failures.extend([True] * (sharding.COPY_ATTEMPTS - 1))
+    lessons[0].title = "Variables"
+    lessons[0].save()
+    assert Lesson.objects.using("shard_2").get(pk=lessons[0].pk).title == "Variables"
+
+    failures.extend([True] * sharding.COPY_ATTEMPTS)
+    lessons[1].title = "Conditions"
+    lessons[1].save()
+    assert Lesson.objects.using("shard_1").get(pk=lessons[1].pk).title == "Lesson 1"
+    assert "rebalance_shards --copies-only" in caplog.text
+
+    failures.clear()
+    Lesson.objects.using("shard_1").create(course=lessons[0].course, title="Orphan", order_index=9)
+    out = StringIO()
+    call_command("rebalance_shards", "--copies-only", stdout=out)
+    assert "catalog rows" in out.getvalue()
+    for alias in SHARDS:
+        titles = set(Lesson.objects.using(alias).values_list("title", flat=True))
+        assert titles == {"Variables", "Conditions", "Lesson 2"}
+
+
+def test_synthetic_seed_writes_attempts_to_their_shard(shards):
+    shards.STUDENT_SHARDS = [DEFAULT_DB_ALIAS, *SHARDS]
+    generate_dataset(ScalePreset(students=12, courses=2, lessons_per_course=3, mean_attempts=6), seed=3)
+    students = list(Student.objects.values_list("pk", flat=True))
+    for alias in (DEFAULT_DB_ALIAS, *SHARDS):
+        owners = set(Attempt.objects.using(alias).values_list("student_id", flat=True))
+        assert all(shard_for_student(student_id) == alias for student_id in owners)
+        assert Course.objects.using(alias).count() == 2 and Lesson.objects.using(alias).count() == 6
+        homed = [student_id for student_id in students if shard_for_student(student_id) == alias]
+        assert Student.objects.using(alias).filter(pk__in=homed).count() == len(homed)
+    assert sum(Attempt.objects.using(alias).count() for alias in SHARDS) > 0
+    progress = progress_for_students(students)
+    assert sum(entry.attempts_count for courses in progress.values() for entry in courses.values()) == sum(
+        Attempt.objects.using(alias).count() for alias in (DEFAULT_DB_ALIAS, *SHARDS)
+    )
+
+
+def test_rebuilds_skip_lessons_missing_from_a_shard_copy(shards, school):
+    course, lessons, students = school
+    shards.STUDENT_SHARDS = [DEFAULT_DB_ALIAS, *SHARDS]
+    call_command("rebalance_shards", stdout=StringIO())
+    alias = next(alias for alias in SHARDS if Attempt.objects.using(alias).filter(lesson=lessons[1]).exists())
+    # As if the copy of a new lesson had not reached the shard yet.
+    with connections[alias].constraint_checks_disabled(), connections[alias].cursor() as cursor:
+        cursor.execute("DELETE FROM core_lesson WHERE id = %s", [lessons[1].pk])
+    rebuild_completions()
+    call_command("rebalance_shards", "--copies-only", stdout=StringIO())
+    rebuild_completions()
+    progress = progress_for_students(student.pk for student in students)
+    assert sum(entry.attempts_count for courses in progress.values() for entry in courses.values()) == 24
+
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from unittest import mock
+
+import pytest
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Attempt, Course, Lesson, Student, SubmissionBucket, SubmissionSignature
+from core.services import submission_index
+from core.services.similarity import estimate_similarity, minhash, normalized_tokens
+
+ORIGINAL = """
+def total(values):
+    result = 0
+    for value in values:
+        if value > 0:
+            result += value
+    return result
+"""
+
+RENAMED = """
+def add_up(numbers):
+    acc = 0
+    for n in numbers:
+        if n > 10:
+            acc += n
+    return acc
+"""
+
+UNRELATED = """
+class Greeter:
+    def greet(self, name):
+        message = f"Hello {name}"
+        print(message.upper())
+        return {"greeting": message, "length": len(message)}
+"""
+
+
+def test_normalized_tokens_ignore_identifiers_and_literals():
+    assert normalized_tokens(ORIGINAL) == normalized_tokens(RENAMED)
+    assert "range" in normalized_tokens("for i in range(3):\n    print(i)\n")
+
+
+def test_minhash_estimates_similarity():
+    assert estimate_similarity(minhash(ORIGINAL), minhash(RENAMED)) == 1.0
+    assert estimate_similarity(minhash(ORIGINAL), minhash(UNRELATED)) < 0.3
+    assert minhash("") is None
+
+
+@pytest.fixture
+def lesson_with_submissions(db, django_capture_on_commit_callbacks):
+    course = Course.objects.create(name="Course", description="", difficulty=1)
+    lesson = Lesson.objects.create(course=course, title="Loops", order_index=1)
+    attempts = []
+    # Attempts are indexed once their transaction commits.
+    with django_capture_on_commit_callbacks(execute=True):
+        for index, code in enumerate([ORIGINAL, RENAMED, UNRELATED, ""]):
+            student = Student.objects.create(name=f"S{index}", email=f"s{index}@example.com")
+            attempts.append(
+                Attempt.objects.create(
+                    student=student,
+                    lesson=lesson,
+                    timestamp=timezone.now(),
+                    correctness=0.5,
+                    duration_sec=60,
+                    code_snapshot=code,
+                )
+            )
+    return lesson, attempts
+
+
+@pytest.mark.django_db
+def test_attempts_are_indexed_on_insert(lesson_with_submissions, django_capture_on_commit_callbacks):
+    _, attempts = lesson_with_submissions
+    indexed = set(SubmissionSignature.objects.values_list("attempt_id", flat=True))
+    assert indexed == {attempt.id for attempt in attempts[:3]}
+
+    blanked = attempts[0]
+    blanked.code_snapshot = ""
+    with django_capture_on_commit_callbacks(execute=True):
+        blanked.save()
+    assert not SubmissionSignature.objects.filter(attempt=blanked).exists()
+    assert not SubmissionBucket.objects.filter(signature__attempt=blanked).exists()
+
+
+def test_worker_thread_indexes_after_commit(transactional_db, settings):
+    settings.SUBMISSION_INDEX_WORKERS = 1
+    course = Course.objects.create(name="Course", description="", difficulty=1)
+    lesson = Lesson.objects.create(course=course, title="Loops", order_index=1)
+    student = Student.objects.create(name="S", email="s@example.com")
+    # Commit the attempt and its rollups together: shared-cache in-memory SQLite
+    # fails concurrent writers instead of waiting for them.
+    with transaction.atomic():
+        attempt = Attempt.objects.create(
+            student=student, lesson=lesson, timestamp=timezone.now(), correctness=0.5, duration_sec=60, code_snapshot=ORIGINAL
+        )
+        assert not SubmissionSignature.objects.exists()
+    # One worker runs tasks in order, so an empty task finishes after the attempt's.
+    submission_index._get_executor(1).submit(lambda: None).result(timeout=10)
+    assert SubmissionSignature.objects.filter(attempt=attempt).exists()
+
+
+@pytest.mark.django_db
+def test_similar_submissions_for_attempt(client, lesson_with_submissions):
+    lesson, attempts = lesson_with_submissions
+    url = reverse("lesson-similar-submissions", args=[lesson.id])
+    response = client.get(url, {"attempt": attempts[0].id})
+    assert response.status_code == 200
+    matches = response.json()["matches"]
+    assert [match["attempt_id"] for match in matches] == [attempts[1].id]
+    assert matches[0]["student_id"] == attempts[1].student_id
+
+
+@pytest.mark.django_db
+def test_similar_submissions_groups_lesson(client, lesson_with_submissions):
+    lesson, attempts = lesson_with_submissions
+    response = client.get(reverse("lesson-similar-submissions", args=[lesson.id]))
+    assert response.status_code == 200
+    groups = response.json()["groups"]
+    assert len(groups) == 1
+    assert {item["attempt_id"] for item in groups[0]["submissions"]} == {attempts[0].id, attempts[1].id}
+
+
+@pytest.mark.django_db
+def test_groups_skip_attempts_deleted_after_the_bucket_read(client, lesson_with_submissions):
+    lesson, attempts = lesson_with_submissions
+    signatures = SubmissionSignature.objects
+
+    def without_second(alias):
+        # As if attempts[1] were deleted between the bucket and signature queries.
+        return signatures.db_manager(alias).exclude(attempt_id=attempts[1].pk)
+
+    with mock.patch.object(signatures, "using", without_second):
+        response = client.get(reverse("lesson-similar-submissions", args=[lesson.id]))
+    assert response.status_code == 200
+    assert response.json()["groups"] == []
+
+
+@pytest.mark.django_db
+def test_similar_submissions_validates_lookup(client, lesson_with_submissions):
+    lesson, _ = lesson_with_submissions
+    url = reverse("lesson-similar-submissions", args=[lesson.id])
+    assert client.get(url, {"threshold": 2}).status_code == 400
+    assert client.get(url, {"attempt": 999999}).status_code == 404
+    assert client.get(reverse("lesson-similar-submissions", args=[999999])).status_code == 404
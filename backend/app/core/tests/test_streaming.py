@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import AsyncClient
+from django.urls import reverse
+from django.utils import timezone
+
+from core import streaming
+from core.models import Attempt, Course, Lesson, Student
+from core.streaming import AttemptBroadcaster, AttemptEvent, Subscription
+
+
+@pytest.fixture
+def broadcaster(monkeypatch):
+    # A long poll interval, so events only arrive promptly when notified.
+    instance = AttemptBroadcaster(poll_interval=30.0, queue_size=10)
+    monkeypatch.setattr(streaming, "_broadcaster", instance)
+    return instance
+
+
+@pytest.fixture
+def feed_data(db):
+    ada = Student.objects.create(name="Ada", email="ada@example.com")
+    alan = Student.objects.create(name="Alan", email="alan@example.com")
+    python = Course.objects.create(name="Python")
+    web = Course.objects.create(name="Web")
+    python_lesson = Lesson.objects.create(course=python, title="Loops", order_index=1)
+    web_lesson = Lesson.objects.create(course=web, title="DOM", order_index=1)
+    return ada, alan, python_lesson, web_lesson
+
+
+def _attempt(student, lesson) -> Attempt:
+    return Attempt.objects.create(
+        student=student, lesson=lesson, timestamp=timezone.now(), correctness=1.0, hints_used=0, duration_sec=30
+    )
+
+
+def _event_data(chunk: bytes) -> dict:
+    lines = chunk.decode().splitlines()
+    assert lines[1] == "event: attempt"
+    return json.loads(lines[2][len("data: "):])
+
+
+@pytest.mark.django_db
+def test_stream_replays_matching_attempts_after_last_event_id(feed_data, broadcaster):
+    ada, alan, python_lesson, web_lesson = feed_data
+    first = _attempt(ada, python_lesson)
+    _attempt(ada, web_lesson)
+    second = _attempt(alan, python_lesson)
+    third = _attempt(ada, python_lesson)
+
+    async def scenario():
+        response = await AsyncClient().get(
+            reverse("attempt-stream"),
+            {"course": python_lesson.course_id},
+            headers={"Last-Event-ID": str(first.pk)},
+        )
+        assert response["Content-Type"] == "text/event-stream"
+        chunks = response.streaming_content
+        assert (await chunks.__anext__()).startswith(b"retry: ")
+        return [await asyncio.wait_for(chunks.__anext__(), 5) for _ in range(2)]
+
+    replayed = async_to_sync(scenario)()
+    assert [chunk.split(b"\n", 1)[0] for chunk in replayed] == [
+        f"id: {second.pk}:{first.pk}".encode(),
+        f"id: {third.pk}:{first.pk}".encode(),
+    ]
+    payload = _event_data(replayed[0])
+    assert payload["student"] == {"id": alan.pk, "name": "Alan"}
+    assert payload["lesson"]["course_id"] == python_lesson.course_id
+
+
+@pytest.mark.django_db
+def test_stream_pushes_new_attempts_once_committed(feed_data, broadcaster, django_capture_on_commit_callbacks):
+    ada, alan, python_lesson, _ = feed_data
+
+    def record_attempts():
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            _attempt(alan, python_lesson)
+            attempt = _attempt(ada, python_lesson)
+        assert broadcaster.notify in callbacks
+        return attempt
+
+    async def scenario():
+        response = await AsyncClient().get(reverse("attempt-stream"), {"student": ada.pk})
+        chunks = response.streaming_content
+        await chunks.__anext__()
+        attempt = await sync_to_async(record_attempts)()
+        return attempt, await asyncio.wait_for(chunks.__anext__(), 5)
+
+    attempt, chunk = async_to_sync(scenario)()
+    assert _event_data(chunk)["id"] == attempt.pk
+
+
+@pytest.mark.django_db
+def test_broadcaster_fans_out_one_read_to_many_idle_subscribers(feed_data, broadcaster):
+    ada, alan, python_lesson, _ = feed_data
+    broadcaster.queue_size = 1
+
+    async def scenario():
+        subscriptions = [
+            await broadcaster.subscribe(student_id=ada.pk if index % 2 else alan.pk) for index in range(2000)
+        ]
+        await sync_to_async(_attempt)(ada, python_lesson)
+        broadcaster.notify()
+        await asyncio.wait_for(subscriptions[1].queue.get(), 5)
+        sizes = [subscription.queue.qsize() for subscription in subscriptions]
+        for subscription in subscriptions:
+            broadcaster.unsubscribe(subscription)
+        return sizes
+
+    sizes = async_to_sync(scenario)()
+    assert sum(sizes) == 999
+    assert sizes[0] == 0
+    assert broadcaster.subscriber_count == 0
+
+
+@pytest.mark.django_db
+def test_broadcaster_delivers_attempts_committed_behind_its_cursor(feed_data, broadcaster):
+    ada, _, python_lesson, _ = feed_data
+    base = _attempt(ada, python_lesson).pk
+
+    def record(pk):
+        return Attempt.objects.create(
+            pk=pk, student=ada, lesson=python_lesson, timestamp=timezone.now(), correctness=1.0, hints_used=0,
+            duration_sec=30,
+        )
+
+    async def scenario():
+        subscription = await broadcaster.subscribe(student_id=ada.pk)
+        await sync_to_async(record)(base + 5)
+        broadcaster.notify()
+        first = await asyncio.wait_for(subscription.queue.get(), 5)
+        # The transaction holding the lower id commits only after the cursor passed it.
+        await sync_to_async(record)(base + 2)
+        broadcaster.notify()
+        late = await asyncio.wait_for(subscription.queue.get(), 5)
+        broadcaster.notify()
+        await asyncio.sleep(0.2)
+        repeated = subscription.queue.qsize()
+        broadcaster.unsubscribe(subscription)
+
+        response = await AsyncClient().get(
+            reverse("attempt-stream"), headers={"Last-Event-ID": first.payload.split(b"\n", 1)[0][4:].decode()}
+        )
+        chunks = response.streaming_content
+        await chunks.__anext__()
+        replayed = [await asyncio.wait_for(chunks.__anext__(), 5) for _ in range(2)]
+        return first, late, repeated, replayed
+
+    first, late, repeated, replayed = async_to_sync(scenario)()
+    assert (first.id, late.id, repeated) == (base + 5, base + 2, 0)
+    assert first.payload.startswith(f"id: {base + 5}:{base}\n".encode())
+    assert [_event_data(chunk)["id"] for chunk in replayed] == [base + 2, base + 5]
+
+
+def test_broadcaster_floor_trails_the_cursor_by_the_commit_window():
+    broadcaster = AttemptBroadcaster(commit_window=5.0)
+    broadcaster.cursor = broadcaster.floor = 10
+    broadcaster._delivered = {11, 12}
+    broadcaster.cursor = 12
+    broadcaster._advance_floor(100.0)
+    assert broadcaster.floor == 10
+    broadcaster._delivered.add(20)
+    broadcaster.cursor = 20
+    broadcaster._advance_floor(105.0)
+    assert (broadcaster.floor, broadcaster._delivered) == (12, {20})
+
+
+def test_subscription_filters_and_marks_overflow():
+    subscription = Subscription(student_id=None, course_id=7, queue_size=1)
+    subscription.offer(AttemptEvent(1, 1, 8, b""))
+    assert subscription.queue.empty()
+    subscription.offer(AttemptEvent(2, 1, 7, b""))
+    subscription.offer(AttemptEvent(3, 2, 7, b""))
+    assert subscription.queue.qsize() == 1
+    assert subscription.overflowed
+
+
+@pytest.mark.django_db
+def test_stream_rejects_malformed_filters(client):
+    response = client.get(reverse("attempt-stream"), {"course": "abc"})
+    assert response.status_code == 400
+    assert client.post(reverse("attempt-stream")).status_code == 405
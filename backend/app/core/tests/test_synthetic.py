@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from core.models import Attempt, Course, Lesson, Student
+from core.services.synthetic import ScalePreset, clear_dataset, generate_dataset, make_rng
+
+
+def test_make_rng_matches_frontend_sequence():
+    rng = make_rng(1)
+    # makeRng(1) in seededRandom.ts: s = (1664525 * 1 + 1013904223) >>> 0
+    assert rng() == 1015568748 / 0x100000000
+    assert make_rng(42)() == make_rng(42)()
+    values = [rng() for _ in range(1000)]
+    assert all(0.0 <= value < 1.0 for value in values)
+
+
+def _attempt_fingerprint():
+    return list(
+        Attempt.objects.order_by("pk").values_list(
+            "student__email", "lesson__title", "correctness", "hints_used", "duration_sec", "code_snapshot"
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_generate_dataset_is_deterministic():
+    preset = ScalePreset(students=30, courses=4, lessons_per_course=5, mean_attempts=8)
+    counts = generate_dataset(preset, seed=7, batch_size=50)
+    assert counts["courses"] == 4
+    assert counts["lessons"] == 20
+    assert counts["students"] == 30
+    assert counts["attempts"] == Attempt.objects.count() > 0
+    first = _attempt_fingerprint()
+
+    clear_dataset()
+    assert not Student.objects.exists()
+    assert not Course.objects.exists()
+    generate_dataset(preset, seed=7, batch_size=13)
+    assert _attempt_fingerprint() == first
+
+
+@pytest.mark.django_db
+def test_seed_scale_command_overrides_preset():
+    out = StringIO()
+    call_command("seed_scale", "--preset", "small", "--students", "10", "--courses", "2", stdout=out)
+    assert Student.objects.count() == 10
+    assert Lesson.objects.count() == 16
+    assert "Seeded" in out.getvalue()
+
+    with pytest.raises(CommandError, match="--flush"):
+        call_command("seed_scale", "--preset", "small", "--students", "10", "--courses", "2", stdout=StringIO())
+    call_command("seed_scale", "--preset", "small", "--students", "4", "--courses", "2", "--flush", stdout=StringIO())
+    assert Student.objects.count() == 4
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from unittest import mock
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Course, Lesson, Student
+from core.throttling import Bucket, TokenBucketStore, get_store, parse_rate
+from core.views import WriteThrottle
+
+
+def test_parse_rate_matches_drf_format():
+    assert parse_rate("30/min") == (30, 60)
+    assert parse_rate("5/s") == (5, 1)
+    assert parse_rate("100/day") == (100, 86400)
+
+
+def test_bucket_allows_burst_then_refills():
+    store = TokenBucketStore(":memory:")
+    bucket = Bucket.for_rate("k", "test.endpoint", "3/min")
+    assert [store.take([bucket], now=100.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.take([bucket], now=100.0) == pytest.approx(20.0)
+    assert store.take([bucket], now=110.0) == pytest.approx(10.0)
+    assert store.take([bucket], now=120.0) == 0.0
+    assert store.rejections() == {"test.endpoint": 2}
+
+
+def test_rejected_request_takes_no_token_from_other_buckets():
+    store = TokenBucketStore(":memory:")
+    roomy = Bucket.for_rate("roomy", "test.endpoint", "10/min")
+    tight = Bucket.for_rate("tight", "test.student", "1/min")
+    assert store.take([roomy, tight], now=0.0) == 0.0
+    assert store.take([roomy, tight], now=0.0) == pytest.approx(60.0)
+    for _ in range(9):
+        assert store.take([roomy], now=0.0) == 0.0
+    assert store.take([roomy], now=0.0) > 0
+    assert store.rejections() == {"test.student": 1, "test.endpoint": 1}
+
+
+def test_store_file_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "throttle.sqlite3")
+    first, second = TokenBucketStore(path), TokenBucketStore(path)
+    bucket = Bucket.for_rate("shared", "test.endpoint", "2/min")
+    assert first.take([bucket], now=0.0) == 0.0
+    assert second.take([bucket], now=0.0) == 0.0
+    assert first.take([bucket], now=0.0) > 0
+    assert second.rejections() == {"test.endpoint": 1}
+    first.close()
+    second.close()
+
+
+@pytest.fixture
+def attempt_payload(db):
+    student = Student.objects.create(name="Throttled", email="throttled@example.com")
+    course = Course.objects.create(name="Course")
+    lesson = Lesson.objects.create(course=course, title="Lesson", order_index=1)
+    return {
+        "student": student.pk,
+        "lesson": lesson.pk,
+        "timestamp": (timezone.now() - timezone.timedelta(minutes=1)).isoformat(),
+        "correctness": 0.5,
+        "hints_used": 0,
+        "duration_sec": 60,
+    }
+
+
+def _post(client, payload, address):
+    return client.post(
+        reverse("attempt-collection"), data=payload, content_type="application/json", REMOTE_ADDR=address
+    )
+
+
+@pytest.mark.django_db
+def test_write_throttle_limits_each_client_per_endpoint(client, attempt_payload):
+    with mock.patch.object(WriteThrottle, "rate", "2/min"), mock.patch.object(WriteThrottle, "student_rate", None):
+        assert _post(client, attempt_payload, "10.0.0.1").status_code == 201
+        assert _post(client, attempt_payload, "10.0.0.1").status_code == 201
+        rejected = _post(client, attempt_payload, "10.0.0.1")
+        assert _post(client, attempt_payload, "10.0.0.2").status_code == 201
+    assert rejected.status_code == 429
+    assert 0 < int(rejected["Retry-After"]) <= 30
+    assert get_store().rejections() == {"attempts.endpoint": 1}
+
+
+@pytest.mark.django_db
+def test_write_throttle_limits_each_student_across_clients(client, attempt_payload):
+    with mock.patch.object(WriteThrottle, "student_rate", "2/min"):
+        assert _post(client, attempt_payload, "10.0.0.1").status_code == 201
+        assert _post(client, attempt_payload, "10.0.0.2").status_code == 201
+        assert _post(client, attempt_payload, "10.0.0.3").status_code == 429
+    text = client.get(reverse("metrics")).content.decode()
+    assert 'codingal_throttle_rejections_total{bucket="attempts.student"} 1' in text
+
+
+@pytest.mark.django_db
+def test_listing_reads_leave_the_student_bucket_alone(client, attempt_payload):
+    listing = reverse("attempt-collection")
+    with mock.patch.object(WriteThrottle, "student_rate", "2/min"):
+        for address in ("10.0.0.1", "10.0.0.2", "10.0.0.3"):
+            assert client.get(listing, {"student": attempt_payload["student"]}, REMOTE_ADDR=address).status_code == 200
+        assert _post(client, attempt_payload, "10.0.0.4").status_code == 201
+        assert _post(client, attempt_payload, "10.0.0.5").status_code == 201
+        assert _post(client, attempt_payload, "10.0.0.6").status_code == 429
@@ -0,0 +1,260 @@
+"""Token-bucket throttling with state shared by every worker on a host.
+
+DRF's ``SimpleRateThrottle`` keeps a list of request timestamps per key in the
+default cache. With the per-process LocMem cache, each gunicorn worker then
+enforces its own limit, and every check costs O(requests in the window). The
+throttle here keeps O(1) state per key instead: a token count and the time it
+was last refilled. Buckets live in a small SQLite file (``THROTTLE_STORE``)
+that all workers open. Taking tokens is one ``BEGIN IMMEDIATE`` transaction, so
+concurrent workers cannot both spend the last token.
+
+A throttle can fill two buckets per request:
+
+* an endpoint bucket per URL name and client (user id, or IP for anonymous
+  requests), like ``UserRateThrottle``;
+* a student bucket per student id named in a write request, shared by every
+  client and endpoint in the same ``scope``. Reads only fill the endpoint
+  bucket.
+
+A request is allowed only when every bucket has a token. Rejections are
+counted per bucket kind and exported by the metrics endpoint.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+_PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_PRUNE_EVERY = 1000
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS throttle_bucket (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    full_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS throttle_rejection (
+    name TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """``"30/min"`` -> ``(30, 60)``, using the same format as DRF rates."""
+
+    num, period = rate.split("/")
+    return int(num), _PERIODS[period[0]]
+
+
+class Bucket(NamedTuple):
+    key: str
+    name: str
+    capacity: float
+    refill_per_second: float
+
+    @classmethod
+    def for_rate(cls, key: str, name: str, rate: str) -> "Bucket":
+        requests, seconds = parse_rate(rate)
+        return cls(key, name, float(requests), requests / seconds)
+
+
+class TokenBucketStore:
+    """SQLite-backed token buckets; ``":memory:"`` keeps them process-local."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._takes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection inherited across fork() must not be reused by the child.
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=5.0, isolation_level=None, check_same_thread=False
+            )
+            if self.path != ":memory:":
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=OFF")
+            connection.executescript(_SCHEMA)
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def take(self, buckets: Sequence[Bucket], now: Optional[float] = None) -> float:
+        """Take one token from every bucket, or none if any is empty.
+
+        Returns 0.0 when the tokens were taken, otherwise the seconds until the
+        emptiest bucket holds a token again.
+        """
+
+        now = time.time() if now is None else now
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                levels = []
+                for bucket in buckets:
+                    row = connection.execute(
+                        "SELECT tokens, updated FROM throttle_bucket WHERE key = ?", (bucket.key,)
+                    ).fetchone()
+                    if row is None:
+                        tokens = bucket.capacity
+                    else:
+                        elapsed = max(0.0, now - row[1])
+                        tokens = min(bucket.capacity, row[0] + elapsed * bucket.refill_per_second)
+                    levels.append(tokens)
+
+                empty = [(bucket, tokens) for bucket, tokens in zip(buckets, levels) if tokens < 1.0]
+                if empty:
+                    connection.executemany(
+                        "INSERT INTO throttle_rejection (name, count) VALUES (?, 1) "
+                        "ON CONFLICT (name) DO UPDATE SET count = count + 1",
+                        [(bucket.name,) for bucket, _ in empty],
+                    )
+                    wait = max((1.0 - tokens) / bucket.refill_per_second for bucket, tokens in empty)
+                else:
+                    connection.executemany(
+                        "INSERT INTO throttle_bucket (key, tokens, updated, full_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, "
+                        "updated = excluded.updated, full_at = excluded.full_at",
+                        [
+                            (
+                                bucket.key,
+                                tokens - 1.0,
+                                now,
+                                now + (bucket.capacity - tokens + 1.0) / bucket.refill_per_second,
+                            )
+                            for bucket, tokens in zip(buckets, levels)
+                        ],
+                    )
+                    wait = 0.0
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            self._takes += 1
+            if self._takes % _PRUNE_EVERY == 0:
+                # A bucket that has refilled completely is the same as no row.
+                connection.execute("DELETE FROM throttle_bucket WHERE full_at < ?", (now,))
+        return wait
+
+    def rejections(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connect().execute("SELECT name, count FROM throttle_rejection").fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+
+_store: Optional[TokenBucketStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> TokenBucketStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TokenBucketStore(getattr(settings, "THROTTLE_STORE", "") or ":memory:")
+    return _store
+
+
+@receiver(setting_changed)
+def _reset_store(setting, **kwargs) -> None:
+    global _store
+    if setting == "THROTTLE_STORE" and _store is not None:
+        _store.close()
+        _store = None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle backed by :class:`TokenBucketStore`.
+
+    ``rate`` sizes the endpoint bucket and ``student_rate`` the student bucket;
+    either may be ``None`` to skip that bucket. Capacity equals the number of
+    requests in the rate, so a full bucket allows that many requests in a
+    burst and then one per ``period / requests``.
+    """
+
+    scope = "default"
+    rate: Optional[str] = None
+    student_rate: Optional[str] = None
+
+    def __init__(self) -> None:
+        self._wait = 0.0
+
+    def get_client_ident(self, request) -> str:
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return f"user-{user.pk}"
+        return f"ip-{self.get_ident(request)}"
+
+    def get_student_id(self, request, view) -> Optional[int]:
+        # Reads never spend a student's bucket: anyone can name a student in a
+        # query string, and polling would lock that student out of writes.
+        if request.method in SAFE_METHODS:
+            return None
+        data = request.data
+        value = data.get("student") if hasattr(data, "get") else None
+        if value is None:
+            value = request.query_params.get("student")
+        try:
+            return int(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    def get_buckets(self, request, view) -> List[Bucket]:
+        buckets = []
+        if self.rate:
+            match = getattr(request, "resolver_match", None)
+            endpoint = (match.url_name if match else None) or request.path
+            buckets.append(
+                Bucket.for_rate(
+                    f"{self.scope}:endpoint:{endpoint}:{self.get_client_ident(request)}",
+                    f"{self.scope}.endpoint",
+                    self.rate,
+                )
+            )
+        if self.student_rate:
+            student_id = self.get_student_id(request, view)
+            if student_id is not None:
+                buckets.append(
+                    Bucket.for_rate(
+                        f"{self.scope}:student:{student_id}", f"{self.scope}.student", self.student_rate
+                    )
+                )
+        return buckets
+
+    def allow_request(self, request, view) -> bool:
+        buckets = self.get_buckets(request, view)
+        if not buckets:
+            return True
+        self._wait = get_store().take(buckets)
+        return self._wait == 0.0
+
+    def wait(self) -> Optional[float]:
+        return self._wait or None
+
+
+__all__ = [
+    "Bucket",
+    "TokenBucketStore",
+    "TokenBucketThrottle",
+    "get_store",
+    "parse_rate",
+]
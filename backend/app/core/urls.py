@@ -1,6 +1,8 @@
 from django.urls import path
 
 from . import views
+from .metrics import metrics_view
+from .streaming import attempt_stream_view
 
 
 urlpatterns = [
@@ -10,6 +12,21 @@ urlpatterns = [
         views.student_recommendation,
         name="student-recommendation",
     ),
+    path("students/<int:pk>/dashboard/", views.student_dashboard, name="student-dashboard"),
+    path("students/<int:pk>/timeline/", views.student_timeline, name="student-timeline"),
+    path("courses/<int:pk>/candidates/", views.course_candidates, name="course-candidates"),
+    path("courses/<int:pk>/cohort/", views.course_cohort, name="course-cohort"),
     path("attempts/", views.attempt_collection, name="attempt-collection"),
+    path("attempts/stream/", attempt_stream_view, name="attempt-stream"),
+    path("attempts/export/", views.attempt_export, name="attempt-export"),
+    path(
+        "lessons/<int:pk>/similar-submissions/",
+        views.lesson_similar_submissions,
+        name="lesson-similar-submissions",
+    ),
+    path("lessons/<int:pk>/stats/", views.lesson_stats, name="lesson-stats"),
+    path("search/", views.search, name="search"),
     path("analyze-code/", views.analyze_code, name="analyze-code"),
+    path("analyze-project/", views.analyze_project_files, name="analyze-project"),
+    path("metrics/", metrics_view, name="metrics"),
 ]
@@ -1,25 +1,54 @@
 from __future__ import annotations
 
-import ast
-from collections import defaultdict
+import json
 import math
-from dataclasses import dataclass, field
-from typing import Dict, Iterable, List, Optional, Sequence, Tuple
-
-from django.db.models import Prefetch
+from dataclasses import dataclass
+from datetime import datetime
+from functools import cached_property
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Max, Prefetch, prefetch_related_objects
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.decorators import api_view, throttle_classes
 from rest_framework.response import Response
-from rest_framework.throttling import UserRateThrottle
 
+from .db_routing import replica_reads, student_pinned
 from .models import Attempt, Course, Lesson, Student
-from .serializers import AttemptCreateSerializer, CodeAnalysisSerializer
+from .profiling import profiled_view, stage
+from .serializers import (
+    AttemptCreateSerializer,
+    AttemptExportQuerySerializer,
+    AttemptListQuerySerializer,
+    CodeAnalysisSerializer,
+    CourseCandidatesQuerySerializer,
+    CourseCohortQuerySerializer,
+    ProjectAnalysisSerializer,
+    SearchQuerySerializer,
+    SimilarSubmissionsQuerySerializer,
+    StudentTimelineQuerySerializer,
+)
+from .services.archive import AttemptRecord, iter_attempt_records, latest_archived_records
+from .services.candidates import rank_course_candidates
+from .services.code_analysis import analyze_snippet
+from .services.completion import CourseProgress, cohort_student_ids, first_missing, lesson_mask, student_progress
+from .services.feature_store import catalog_key, get_feature_store
+from .services.lesson_stats import STAT_QUANTILES, LessonSketches, lesson_sketches, sketches_for_lessons
+from .services.project_analysis import analyze_project
+from .services.submission_index import SimilarSubmission, similar_groups, similar_to_attempt
 from .services.recommender import RecommendationResult, score_candidate
+from .services.rollups import load_student_timeline
+from .services.search import search_catalog
+from .sharding import across_shards, shard_for_student, sharding_enabled
+from .throttling import TokenBucketThrottle
 
 
-class WriteThrottle(UserRateThrottle):
+class WriteThrottle(TokenBucketThrottle):
+    scope = "attempts"
     rate = "30/min"
+    student_rate = "30/min"
 
 
 @api_view(["GET"])
@@ -31,81 +60,130 @@ def service_root(request):
             "endpoints": {
                 "overview": "/api/students/<id>/overview/",
                 "recommendation": "/api/students/<id>/recommendation/",
+                "dashboard": "/api/students/<id>/dashboard/",
+                "timeline": "/api/students/<id>/timeline/?from=&to=",
+                "course_candidates": "/api/courses/<id>/candidates/",
+                "course_cohort": "/api/courses/<id>/cohort/?completed=1-5&missing=6",
                 "attempts": {
                     "GET": "/api/attempts/",
                     "POST": "/api/attempts/",
+                    "stream": "/api/attempts/stream/",
+                    "export": "/api/attempts/export/?student=&from=&to=",
                 },
                 "analyze_code": "/api/analyze-code/",
+                "analyze_project": "/api/analyze-project/",
+                "metrics": "/api/metrics/",
+                "similar_submissions": "/api/lessons/<id>/similar-submissions/",
+                "lesson_stats": "/api/lessons/<id>/stats/",
+                "search": "/api/search/?q=&tag=",
             },
         }
     )
 
 def _get_student(pk: int) -> Optional[Student]:
-    return (
-        Student.objects.prefetch_related(
-            Prefetch(
-                "attempts",
-                queryset=Attempt.objects.select_related("lesson__course").order_by("-timestamp"),
+    return Student.objects.filter(pk=pk).first()
+
+
+def _lessons_prefetch() -> Prefetch:
+    return Prefetch("lessons", queryset=Lesson.objects.order_by("order_index"))
+
+
+def _course_queryset() -> Iterable[Course]:
+    return Course.objects.prefetch_related(_lessons_prefetch()).order_by("name")
+
+
+@dataclass
+class _CourseSummary:
+    """Per-course progress facts shared by the overview and the recommender."""
+
+    course: Course
+    lessons: List[Lesson]
+    completed_bits: int
+    latest_timestamp: Optional[datetime]
+    attempts_count: int
+    hints_total: int
+
+    @cached_property
+    def lesson_mask(self) -> int:
+        return lesson_mask(lesson.order_index for lesson in self.lessons)
+
+    @property
+    def lessons_completed(self) -> int:
+        return (self.completed_bits & self.lesson_mask).bit_count()
+
+    @property
+    def progress_percent(self) -> float:
+        total_lessons = len(self.lessons)
+        return self.lessons_completed / total_lessons * 100.0 if total_lessons else 0.0
+
+    @property
+    def hint_rate(self) -> float:
+        return self.hints_total / self.attempts_count if self.attempts_count else 0.0
+
+    @property
+    def next_lesson_title(self) -> Optional[str]:
+        order_index = first_missing(self.completed_bits, self.lesson_mask)
+        if order_index is None:
+            return None
+        return next(lesson.title for lesson in self.lessons if lesson.order_index == order_index)
+
+
+def _summarize_courses(
+    student: Student, courses: Iterable[Course], progress: Optional[Dict[int, CourseProgress]] = None
+) -> List[_CourseSummary]:
+    # Running totals, so archived attempts still count and no attempt rows are read.
+    if progress is None:
+        progress = student_progress(student.pk)
+    summaries = []
+    for course in courses:
+        course_progress = progress.get(course.id)
+        summaries.append(
+            _CourseSummary(
+                course=course,
+                lessons=list(course.lessons.all()),
+                completed_bits=course_progress.bits if course_progress else 0,
+                latest_timestamp=course_progress.last_attempt_at if course_progress else None,
+                attempts_count=course_progress.attempts_count if course_progress else 0,
+                hints_total=course_progress.hints_total if course_progress else 0,
             )
         )
-        .filter(pk=pk)
-        .first()
-    )
+    return summaries
 
 
-def _course_queryset() -> Iterable[Course]:
-    return Course.objects.prefetch_related(
-        Prefetch("lessons", queryset=Lesson.objects.order_by("order_index"))
-    ).order_by("name")
+def _serialize_student(student: Student) -> Dict[str, object]:
+    return {"id": student.id, "name": student.name, "email": student.email}
 
 
-def _group_attempts_by_course(student: Student) -> Dict[int, List[Attempt]]:
-    grouped: Dict[int, List[Attempt]] = defaultdict(list)
-    for attempt in student.attempts.all():
-        grouped[attempt.lesson.course_id].append(attempt)
-    return grouped
+def _overview_rows(summaries: List[_CourseSummary]) -> List[Dict[str, object]]:
+    return [
+        {
+            "id": summary.course.id,
+            "name": summary.course.name,
+            "description": summary.course.description,
+            "difficulty": summary.course.difficulty,
+            "progress": round(summary.progress_percent, 2),
+            "lessons_total": len(summary.lessons),
+            "lessons_completed": summary.lessons_completed,
+            "last_activity": timezone.localtime(summary.latest_timestamp).isoformat()
+            if summary.latest_timestamp
+            else None,
+            "next_up": summary.next_lesson_title,
+        }
+        for summary in summaries
+    ]
 
 
+@replica_reads(student_kwarg="pk")
 @api_view(["GET"])
 def student_overview(request, pk: int):
     student = _get_student(pk)
     if student is None:
         return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
 
-    attempts_by_course = _group_attempts_by_course(student)
-    overview = []
-    for course in _course_queryset():
-        lessons = list(course.lessons.all())
-        total_lessons = len(lessons)
-        course_attempts = attempts_by_course.get(course.id, [])
-        completed_lesson_ids = {attempt.lesson_id for attempt in course_attempts}
-        completed_count = len(completed_lesson_ids)
-        progress_percent = (completed_count / total_lessons * 100.0) if total_lessons else 0.0
-        latest_attempt = max(course_attempts, key=lambda attempt: attempt.timestamp, default=None)
-        next_lesson_title = None
-        for lesson in lessons:
-            if lesson.id not in completed_lesson_ids:
-                next_lesson_title = lesson.title
-                break
-        overview.append(
-            {
-                "id": course.id,
-                "name": course.name,
-                "description": course.description,
-                "difficulty": course.difficulty,
-                "progress": round(progress_percent, 2),
-                "lessons_total": total_lessons,
-                "lessons_completed": completed_count,
-                "last_activity": timezone.localtime(latest_attempt.timestamp).isoformat()
-                if latest_attempt
-                else None,
-                "next_up": next_lesson_title,
-            }
-        )
-
+    summaries = _summarize_courses(student, _course_queryset())
     payload = {
-        "student": {"id": student.id, "name": student.name, "email": student.email},
-        "courses": overview,
+        "student": _serialize_student(student),
+        "courses": _overview_rows(summaries),
     }
     return Response(payload)
 
@@ -136,52 +214,42 @@ def _serialize_features(result: RecommendationResult) -> Dict[str, Dict[str, flo
     return serialized
 
 
-@api_view(["GET"])
-def student_recommendation(request, pk: int):
-    student = _get_student(pk)
-    if student is None:
-        return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
-
-    attempts_by_course = _group_attempts_by_course(student)
-    now = timezone.now()
-    candidates = []
-    for course in _course_queryset():
-        lessons = list(course.lessons.all())
-        total_lessons = len(lessons)
-        course_attempts = attempts_by_course.get(course.id, [])
-        completed_lesson_ids = {attempt.lesson_id for attempt in course_attempts}
-        progress_percent = (
-            len(completed_lesson_ids) / total_lessons * 100.0 if total_lessons else 0.0
-        )
-        latest_attempt = max(course_attempts, key=lambda attempt: attempt.timestamp, default=None)
-        if latest_attempt is None:
+def _recommendation_inputs(
+    student: Student, summaries: List[_CourseSummary], now: datetime
+) -> List[Tuple[Course, Dict[str, float]]]:
+    inputs = []
+    for summary in summaries:
+        if summary.latest_timestamp is None:
             recency_gap_days = 30.0
         else:
-            recency_gap_days = (now - latest_attempt.timestamp).total_seconds() / 86400.0
-        hint_rate = (
-            sum(attempt.hints_used for attempt in course_attempts) / len(course_attempts)
-            if course_attempts
-            else 0.0
-        )
-        tag_alignment = _compute_tag_alignment(course, student)
-        recommendation = score_candidate(progress_percent, recency_gap_days, tag_alignment, hint_rate)
-        candidates.append(
-            {
-                "course": course,
-                "result": recommendation,
-            }
+            recency_gap_days = (now - summary.latest_timestamp).total_seconds() / 86400.0
+        inputs.append(
+            (
+                summary.course,
+                {
+                    "progress_percent": summary.progress_percent,
+                    "recency_gap_days": recency_gap_days,
+                    "tag_alignment": _compute_tag_alignment(summary.course, student),
+                    "hint_rate": summary.hint_rate,
+                },
+            )
         )
+    return inputs
 
+
+def _score_courses(inputs: List[Tuple[Course, Dict[str, float]]]) -> List[Dict[str, object]]:
+    return [{"course": course, "result": score_candidate(**features)} for course, features in inputs]
+
+
+def _recommendation_payload(candidates: List[Dict[str, object]]) -> Dict[str, object]:
     if not candidates:
-        return Response(
-            {
-                "recommendation": None,
-                "confidence": 0.0,
-                "explanation": "No courses available to recommend.",
-                "reason_features": {},
-                "alternatives": [],
-            }
-        )
+        return {
+            "recommendation": None,
+            "confidence": 0.0,
+            "explanation": "No courses available to recommend.",
+            "reason_features": {},
+            "alternatives": [],
+        }
 
     candidates.sort(key=lambda item: item["result"].score, reverse=True)
     top = candidates[0]
@@ -194,7 +262,7 @@ def student_recommendation(request, pk: int):
         for candidate in candidates[1:3]
     ]
 
-    payload = {
+    return {
         "recommendation": {
             "course_id": top["course"].id,
             "title": f'Continue "{top["course"].name}"',
@@ -205,278 +273,435 @@ def student_recommendation(request, pk: int):
         "reason_features": _serialize_features(top["result"]),
         "alternatives": alternatives,
     }
+
+
+def _stored_recommendation_inputs(
+    student: Student, courses: List[Course], now: datetime
+) -> Optional[List[Tuple[Course, Dict[str, float]]]]:
+    """Inputs read from the shared feature store, or ``None`` if it cannot answer for every course.
+
+    ``courses`` carry a ``lesson_count`` annotation, to check the store was
+    written for the current catalog.
+    """
+
+    # A pinned student wrote moments ago, most likely after the last refresh.
+    if student_pinned(student.pk):
+        return None
+    store = get_feature_store()
+    if store is None or store.catalog_key != catalog_key(
+        (course.pk, course.tags, course.lesson_count) for course in courses
+    ):
+        return None
+    stored = store.student_features(student.pk)
+    if stored is None or any(course.pk not in stored for course in courses):
+        return None
+    now_timestamp = now.timestamp()
+    return [(course, stored[course.pk].recommendation_inputs(now_timestamp)) for course in courses]
+
+
+@profiled_view
+@replica_reads(student_kwarg="pk")
+@api_view(["GET"])
+def student_recommendation(request, pk: int):
+    with stage(request, "load"):
+        student = _get_student(pk)
+        if student is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        courses = list(Course.objects.annotate(lesson_count=Count("lessons")).order_by("name"))
+
+    with stage(request, "aggregate"):
+        now = timezone.now()
+        inputs = _stored_recommendation_inputs(student, courses, now)
+        if inputs is None:
+            prefetch_related_objects(courses, _lessons_prefetch())
+            summaries = _summarize_courses(student, courses)
+            inputs = _recommendation_inputs(student, summaries, now)
+
+    with stage(request, "score"):
+        candidates = _score_courses(inputs)
+
+    with stage(request, "serialize"):
+        payload = _recommendation_payload(candidates)
+    return Response(payload)
+
+
+def student_bundle_payloads(
+    student: Student, courses: List[Course], progress: Dict[int, CourseProgress], now: datetime
+) -> Dict[str, Dict[str, object]]:
+    """The overview and recommendation bodies for already loaded rows, for ``export_dashboards``.
+
+    ``courses`` are in name order with lessons prefetched by ``order_index``.
+    """
+
+    summaries = _summarize_courses(student, courses, progress)
+    return {
+        "overview": {"student": _serialize_student(student), "courses": _overview_rows(summaries)},
+        "recommendation": _recommendation_payload(_score_courses(_recommendation_inputs(student, summaries, now))),
+    }
+
+
+@profiled_view
+@api_view(["GET"])
+def student_dashboard(request, pk: int):
+    """Overview rows and recommendation computed from a single data load."""
+
+    with stage(request, "load"):
+        student = _get_student(pk)
+        if student is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        courses = list(_course_queryset())
+
+    with stage(request, "aggregate"):
+        summaries = _summarize_courses(student, courses)
+        inputs = _recommendation_inputs(student, summaries, timezone.now())
+
+    with stage(request, "score"):
+        candidates = _score_courses(inputs)
+
+    with stage(request, "serialize"):
+        payload = {
+            "student": _serialize_student(student),
+            "courses": _overview_rows(summaries),
+            "recommendation": _recommendation_payload(candidates),
+        }
+    return Response(payload)
+
+
+@profiled_view
+@api_view(["GET"])
+def student_timeline(request, pk: int):
+    """Daily activity per course, served from the rollups: one row per active day and course."""
+
+    query = StudentTimelineQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    start, end = query.validated_data["from"], query.validated_data["to"]
+
+    with stage(request, "load"):
+        student = _get_student(pk)
+        if student is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        timeline = load_student_timeline(student.pk, start, end, course_id=query.validated_data.get("course"))
+        courses = Course.objects.in_bulk(list(timeline))
+
+    with stage(request, "serialize"):
+        rows = []
+        for course_id, days in timeline.items():
+            rows.append(
+                {
+                    "id": course_id,
+                    "name": courses[course_id].name,
+                    "attempts": sum(day.attempts for day in days),
+                    "days": [
+                        {
+                            "date": day.day.isoformat(),
+                            "attempts": day.attempts,
+                            "duration_sec": day.duration_total,
+                            "mean_correctness": round(day.mean_correctness, 4),
+                            "hints": day.hints_total,
+                        }
+                        for day in days
+                    ],
+                }
+            )
+        rows.sort(key=lambda row: row["name"])
+        payload = {
+            "student": _serialize_student(student),
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "courses": rows,
+        }
+    return Response(payload)
+
+
+@profiled_view
+@api_view(["GET"])
+def course_candidates(request, pk: int):
+    """Students who most need course ``pk``, scored with the recommender's features."""
+
+    with stage(request, "load"):
+        course = Course.objects.filter(pk=pk).first()
+        if course is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    query = CourseCandidatesQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+
+    with stage(request, "score"):
+        ranked = rank_course_candidates(course, limit=query.validated_data["limit"])
+
+    with stage(request, "serialize"):
+        students = Student.objects.in_bulk([features.student_id for _, features in ranked])
+        candidates = []
+        for _, features in ranked:
+            result = score_candidate(**features.as_inputs())
+            candidates.append(
+                {
+                    "student": _serialize_student(students[features.student_id]),
+                    "score": round(result.score, 4),
+                    "confidence": round(result.confidence, 4),
+                    "explanation": result.explanation,
+                    "reason_features": _serialize_features(result),
+                }
+            )
+    return Response({"course": {"id": course.id, "name": course.name}, "candidates": candidates})
+
+
+@profiled_view
+@api_view(["GET"])
+def course_cohort(request, pk: int):
+    """Students of course ``pk`` who completed the ``completed`` lessons and none of the ``missing`` ones."""
+
+    with stage(request, "load"):
+        course = Course.objects.filter(pk=pk).annotate(highest_order_index=Max("lessons__order_index")).first()
+        if course is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    query = CourseCohortQuerySerializer(
+        data=request.query_params, context={"highest_order_index": course.highest_order_index or 0}
+    )
+    query.is_valid(raise_exception=True)
+    completed = query.validated_data["completed"]
+    missing = query.validated_data["missing"]
+
+    with stage(request, "aggregate"):
+        student_ids = cohort_student_ids(course.pk, completed=completed, missing=missing)
+
+    with stage(request, "serialize"):
+        page = student_ids[: query.validated_data["limit"]]
+        students = Student.objects.in_bulk(page)
+        payload = {
+            "course": {"id": course.id, "name": course.name},
+            "completed": sorted(completed),
+            "missing": sorted(missing),
+            "count": len(student_ids),
+            "students": [_serialize_student(students[student_id]) for student_id in page],
+        }
     return Response(payload)
 
 
+@profiled_view
+@api_view(["GET"])
+def search(request):
+    """Courses and lessons matching ``q``, ranked title over tags over course text."""
+
+    query = SearchQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+
+    with stage(request, "search"):
+        hits = search_catalog(
+            query.validated_data["q"], tags=query.validated_data["tag"], limit=query.validated_data["limit"]
+        )
+
+    with stage(request, "serialize"):
+        results = [
+            {
+                "type": hit.kind,
+                "id": hit.course_id if hit.lesson_id is None else hit.lesson_id,
+                "title": hit.title,
+                "course": {"id": hit.course_id, "name": hit.course_name},
+                "tags": hit.tags,
+                "score": round(hit.score, 4),
+            }
+            for hit in hits
+        ]
+    return Response({"query": query.validated_data["q"], "count": len(results), "results": results})
+
+
+@replica_reads(student_param="student")
 @api_view(["GET", "POST"])
 @throttle_classes([WriteThrottle])
 def attempt_collection(request):
     if request.method == "GET":
-        attempts = (
-            Attempt.objects.select_related("student", "lesson", "lesson__course")
-            .order_by("-timestamp")[:25]
-        )
+        query = AttemptListQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        student_id, before = query.validated_data.get("student"), query.validated_data.get("before")
+        hot = Attempt.objects.all() if student_id is None else Attempt.objects.for_student(student_id)
+        if before is not None:
+            hot = hot.filter(timestamp__lt=before)
+        # Pick the latest ids first so the sort does not carry the joined rows; the
+        # reverse one-to-one join then brings each lesson's sketch in the same query.
+        # Sketches live on ``default`` only, so other shards are read without the
+        # join, and the newest 25 across shards are kept.
+        attempts: List[Attempt] = []
+        sketches: Dict[int, LessonSketches] = {}
+        for shard in across_shards(hot) if student_id is None else [hot]:
+            joins_sketch = not sharding_enabled() or shard.db == DEFAULT_DB_ALIAS
+            related = ("student", "lesson", "lesson__course") + (("lesson__sketch",) if joins_sketch else ())
+            latest = shard.order_by("-timestamp").values("pk")[:25]
+            rows = list(shard.filter(pk__in=latest).select_related(*related).order_by("-timestamp"))
+            for attempt in rows if joins_sketch else ():
+                if attempt.lesson_id not in sketches and hasattr(attempt.lesson, "sketch"):
+                    sketch = attempt.lesson.sketch
+                    sketches[attempt.lesson_id] = LessonSketches.load(sketch.duration, sketch.correctness)
+            attempts.extend(rows)
+        archived: List[AttemptRecord] = []
+        if query.validated_data["archived"]:
+            archived = latest_archived_records(25, student_id=student_id, before=before)
+        listed: List[object] = list(attempts)
+        if sharding_enabled() or archived:
+            listed = sorted([*attempts, *archived], key=lambda row: (row.timestamp, row.id), reverse=True)[:25]
+            missing = {row.lesson_id for row in listed} - sketches.keys()
+            if missing:
+                sketches.update(sketches_for_lessons(missing))
+        archived = [row for row in listed if isinstance(row, AttemptRecord)]
+        if archived:
+            students = Student.objects.in_bulk({record.student_id for record in archived})
+            lessons = Lesson.objects.select_related("course").in_bulk({record.lesson_id for record in archived})
+            # The archive keeps attempts on lessons deleted since; the listing shows existing lessons only.
+            listed = [row for row in listed if isinstance(row, Attempt) or row.lesson_id in lessons]
         results = [
-            {
-                "id": attempt.id,
-                "student": {"id": attempt.student_id, "name": attempt.student.name},
-                "lesson": {
-                    "id": attempt.lesson_id,
-                    "title": attempt.lesson.title,
-                    "course": attempt.lesson.course.name,
-                },
-                "timestamp": timezone.localtime(attempt.timestamp).isoformat(),
-                "correctness": attempt.correctness,
-                "hints_used": attempt.hints_used,
-                "duration_sec": attempt.duration_sec,
-            }
-            for attempt in attempts
+            _serialize_attempt(row, row.student, row.lesson, sketches)
+            if isinstance(row, Attempt)
+            else _serialize_attempt(row, students[row.student_id], lessons[row.lesson_id], sketches, archived=True)
+            for row in listed
         ]
         return Response({"count": len(results), "results": results})
 
     serializer = AttemptCreateSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    attempt = serializer.save()
-    return Response({"id": attempt.id}, status=status.HTTP_201_CREATED)
+    # The attempt and its derived rows commit together, so a failed request can be retried.
+    with transaction.atomic(using=shard_for_student(serializer.validated_data["student"].pk)):
+        attempt = serializer.save()
+    return Response(
+        {"id": attempt.id, "percentiles": _attempt_percentiles(lesson_sketches(attempt.lesson_id), attempt)},
+        status=status.HTTP_201_CREATED,
+    )
+
+
+def _export_lines(records: Iterable[AttemptRecord], with_code: bool, chunk: int = 500) -> Iterator[bytes]:
+    lines = []
+    for record in records:
+        row = {
+            "id": record.id,
+            "student_id": record.student_id,
+            "lesson_id": record.lesson_id,
+            "timestamp": timezone.localtime(record.timestamp).isoformat(),
+            "correctness": record.correctness,
+            "hints_used": record.hints_used,
+            "duration_sec": record.duration_sec,
+        }
+        if with_code:
+            row["code_snapshot"] = record.code_snapshot
+        lines.append(json.dumps(row, separators=(",", ":")))
+        if len(lines) == chunk:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+@api_view(["GET"])
+def attempt_export(request):
+    """Every matching attempt, hot and archived, oldest first, streamed as NDJSON."""
+
+    # A plain dict, so an absent ``archived`` takes its default rather than HTML-form ``False``.
+    query = AttemptExportQuerySerializer(data=request.query_params.dict())
+    query.is_valid(raise_exception=True)
+    params = query.validated_data
+    records = iter_attempt_records(
+        student_id=params.get("student"),
+        start=params.get("from"),
+        end=params.get("to"),
+        include_archived=params["archived"],
+        with_code=params["code"],
+    )
+    return StreamingHttpResponse(_export_lines(records, params["code"]), content_type="application/x-ndjson")
 
 
-def _issue(rule: str, message: str, severity: str, node: ast.AST) -> Dict[str, object]:
+def _serialize_attempt(
+    attempt, student: Student, lesson: Lesson, sketches: Dict[int, LessonSketches], *, archived: bool = False
+) -> Dict[str, object]:
+    """A listing row for an ``Attempt`` or an archived ``AttemptRecord``."""
+
     return {
-        "rule": rule,
-        "message": message,
-        "severity": severity,
-        "line": getattr(node, "lineno", None),
-        "column": getattr(node, "col_offset", None),
+        "id": attempt.id,
+        "student": {"id": attempt.student_id, "name": student.name},
+        "lesson": {"id": attempt.lesson_id, "title": lesson.title, "course": lesson.course.name},
+        "timestamp": timezone.localtime(attempt.timestamp).isoformat(),
+        "correctness": attempt.correctness,
+        "hints_used": attempt.hints_used,
+        "duration_sec": attempt.duration_sec,
+        "percentiles": _attempt_percentiles(sketches.get(attempt.lesson_id), attempt),
+        "archived": archived,
     }
 
 
-@dataclass
-class _Scope:
-    label: str
-    assigned: Dict[str, ast.AST] = field(default_factory=dict)
-    used: Dict[str, bool] = field(default_factory=dict)
-
+def _attempt_percentiles(sketches: Optional[LessonSketches], attempt: Attempt) -> Optional[Dict[str, float]]:
+    """Where ``attempt`` sits among its lesson's attempts, from the lesson's sketches."""
 
-class _StaticAnalyzer(ast.NodeVisitor):
-    """Lightweight deterministic Python AST checker."""
+    if sketches is None:
+        return None
+    return sketches.percentiles(attempt.duration_sec, attempt.correctness)
 
-    def __init__(self) -> None:
-        self.issues: List[Dict[str, object]] = []
-        self._scopes: List[_Scope] = [_Scope(label="module")]
-        self._block_signatures: Dict[Tuple[str, ...], Tuple[int, int]] = {}
 
-    # ------------------------------------------------------------------
-    # Scope helpers
-    # ------------------------------------------------------------------
-    @property
-    def current_scope(self) -> _Scope:
-        return self._scopes[-1]
-
-    def _enter_scope(self, label: str) -> None:
-        self._scopes.append(_Scope(label=label))
-
-    def _leave_scope(self) -> None:
-        scope = self._scopes.pop()
-        for name, node in scope.assigned.items():
-            if scope.used.get(name):
-                continue
-            self.issues.append(
-                _issue(
-                    "unused-variable",
-                    f'Variable "{name}" is assigned but never used in {scope.label}.',
-                    "info",
-                    node,
-                )
-            )
+@profiled_view
+@api_view(["GET"])
+def lesson_stats(request, pk: int):
+    """Approximate duration and correctness percentiles for one lesson (KLL, ~1.7% rank error)."""
+
+    with stage(request, "load"):
+        lesson = Lesson.objects.filter(pk=pk).values("id", "title").first()
+        if lesson is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        sketches = lesson_sketches(pk)
+    if sketches is None:
+        return Response({"lesson": lesson, "attempts": 0, "duration_sec": None, "correctness": None})
+
+    def summary(sketch, digits: int) -> Dict[str, float]:
+        values = {"min": round(sketch.min, digits)}
+        for fraction in STAT_QUANTILES:
+            values[f"p{round(fraction * 100)}"] = round(sketch.quantile(fraction), digits)
+        values["max"] = round(sketch.max, digits)
+        return values
+
+    with stage(request, "serialize"):
+        payload = {
+            "lesson": lesson,
+            "attempts": sketches.duration.n,
+            "duration_sec": summary(sketches.duration, 1),
+            "correctness": summary(sketches.correctness, 4),
+        }
+    return Response(payload)
 
-    def _record_assignment(self, target: ast.AST) -> None:
-        if isinstance(target, ast.Name):
-            name = target.id
-            if name.startswith("_"):
-                return
-            self.current_scope.assigned.setdefault(name, target)
-        elif isinstance(target, (ast.Tuple, ast.List)):
-            for element in target.elts:
-                self._record_assignment(element)
-
-    def _mark_used(self, name: str) -> None:
-        for scope in reversed(self._scopes):
-            if name in scope.assigned:
-                scope.used[name] = True
-                break
-
-    # ------------------------------------------------------------------
-    # Block helpers
-    # ------------------------------------------------------------------
-    def _record_block(self, statements: Sequence[ast.stmt]) -> None:
-        if not statements:
-            return
-        signature = tuple(ast.dump(stmt, include_attributes=False) for stmt in statements)
-        if not signature:
-            return
-        first = statements[0]
-        location = (
-            getattr(first, "lineno", None),
-            getattr(first, "col_offset", None),
-        )
-        if signature not in self._block_signatures:
-            if location[0] is not None:
-                self._block_signatures[signature] = location
-            return
-
-        if location[0] is None:
-            return
-        dummy = statements[0]
-        self.issues.append(
-            _issue(
-                "duplicate-block",
-                "Duplicate block detected. Extract shared statements to avoid repetition.",
-                "info",
-                dummy,
-            )
-        )
 
-    # ------------------------------------------------------------------
-    # Visitor overrides
-    # ------------------------------------------------------------------
-    def visit_Module(self, node: ast.Module) -> None:  # pragma: no cover - exercised indirectly
-        self._record_block(node.body)
-        self.generic_visit(node)
-        self._leave_scope()
-
-    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
-        self._record_block(node.body)
-        self._enter_scope(f"function {node.name}")
-        for arg in (*node.args.posonlyargs, *node.args.args, *node.args.kwonlyargs):
-            if arg.arg and not arg.arg.startswith("_"):
-                self.current_scope.used[arg.arg] = True
-        if node.args.vararg:
-            self.current_scope.used[node.args.vararg.arg] = True
-        if node.args.kwarg:
-            self.current_scope.used[node.args.kwarg.arg] = True
-        self.generic_visit(node)
-        has_return_value = any(
-            isinstance(child, ast.Return) and child.value is not None for child in ast.walk(node)
-        )
-        has_yield = any(isinstance(child, (ast.Yield, ast.YieldFrom)) for child in ast.walk(node))
-        if not has_return_value and not has_yield and node.body:
-            self.issues.append(
-                _issue(
-                    "missing-return",
-                    f'Function "{node.name}" does not return a value on any path.',
-                    "warning",
-                    node,
-                )
-            )
-        self._leave_scope()
-
-    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> None:
-        self.visit_FunctionDef(node)  # type: ignore[arg-type]
-
-    def visit_For(self, node: ast.For) -> None:
-        self._record_block(node.body)
-        self._record_block(node.orelse)
-        self._record_assignment(node.target)
-        self._check_for_loop(node)
-        self.generic_visit(node)
-
-    def visit_AsyncFor(self, node: ast.AsyncFor) -> None:
-        self.visit_For(node)  # type: ignore[arg-type]
-
-    def visit_With(self, node: ast.With) -> None:
-        self._record_block(node.body)
-        for item in node.items:
-            if item.optional_vars:
-                self._record_assignment(item.optional_vars)
-        self.generic_visit(node)
-
-    def visit_If(self, node: ast.If) -> None:
-        self._record_block(node.body)
-        self._record_block(node.orelse)
-        self.generic_visit(node)
-
-    def visit_Assign(self, node: ast.Assign) -> None:
-        for target in node.targets:
-            self._record_assignment(target)
-        self.generic_visit(node)
-
-    def visit_AnnAssign(self, node: ast.AnnAssign) -> None:
-        if node.target:
-            self._record_assignment(node.target)
-        self.generic_visit(node)
-
-    def visit_AugAssign(self, node: ast.AugAssign) -> None:
-        self._record_assignment(node.target)
-        if isinstance(node.target, ast.Name):
-            self._mark_used(node.target.id)
-        self.generic_visit(node)
-
-    def visit_Name(self, node: ast.Name) -> None:
-        if isinstance(node.ctx, ast.Load):
-            self._mark_used(node.id)
-        self.generic_visit(node)
-
-    def visit_Try(self, node: ast.Try) -> None:
-        self._record_block(node.body)
-        self._record_block(node.orelse)
-        self._record_block(node.finalbody)
-        for handler in node.handlers:
-            self._record_block(handler.body)
-        self.generic_visit(node)
-
-    # ------------------------------------------------------------------
-    # Rule implementations
-    # ------------------------------------------------------------------
-    def _check_for_loop(self, node: ast.For) -> None:
-        iterator = node.iter
-        if not (
-            isinstance(iterator, ast.Call)
-            and isinstance(iterator.func, ast.Name)
-            and iterator.func.id == "range"
-            and iterator.args
-        ):
-            return
-
-        last_arg = iterator.args[-1]
-        if isinstance(last_arg, ast.BinOp) and isinstance(last_arg.op, ast.Add):
-            if self._is_len_call(last_arg.left) and self._is_one(last_arg.right):
-                self.issues.append(
-                    _issue(
-                        "for-loop-off-by-one",
-                        "Potential off-by-one: range(len(items) + 1) iterates one past the end.",
-                        "warning",
-                        iterator,
-                    )
-                )
-            elif self._is_len_call(last_arg.right) and self._is_one(last_arg.left):
-                self.issues.append(
-                    _issue(
-                        "for-loop-off-by-one",
-                        "Potential off-by-one: range(len(items) + 1) iterates one past the end.",
-                        "warning",
-                        iterator,
-                    )
-                )
-
-    @staticmethod
-    def _is_len_call(node: ast.AST) -> bool:
-        return (
-            isinstance(node, ast.Call)
-            and isinstance(node.func, ast.Name)
-            and node.func.id == "len"
-            and len(node.args) == 1
-        )
+def _serialize_similar(match: SimilarSubmission) -> Dict[str, object]:
+    return {
+        "attempt_id": match.attempt_id,
+        "student_id": match.student_id,
+        "similarity": round(match.similarity, 3),
+    }
 
-    @staticmethod
-    def _is_one(node: ast.AST) -> bool:
-        return isinstance(node, ast.Constant) and node.value == 1
 
+@api_view(["GET"])
+def lesson_similar_submissions(request, pk: int):
+    if not Lesson.objects.filter(pk=pk).exists():
+        return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    query = SimilarSubmissionsQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    threshold = query.validated_data["threshold"]
+    limit = query.validated_data["limit"]
+
+    attempt_id = query.validated_data.get("attempt")
+    if attempt_id is not None:
+        if not any(shard.exists() for shard in across_shards(Attempt.objects.filter(pk=attempt_id, lesson_id=pk))):
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        matches = similar_to_attempt(attempt_id, threshold=threshold, limit=limit) or []
+        return Response(
+            {
+                "lesson": pk,
+                "attempt": attempt_id,
+                "matches": [_serialize_similar(match) for match in matches],
+            }
+        )
 
-def _analyze_python_code(code: str) -> List[Dict[str, object]]:
-    tree = ast.parse(code)
-    analyzer = _StaticAnalyzer()
-    analyzer.visit(tree)
-    return analyzer.issues
+    groups = similar_groups(pk, threshold=threshold, limit=limit)
+    return Response(
+        {
+            "lesson": pk,
+            "groups": [
+                {"size": len(group), "submissions": [_serialize_similar(match) for match in group]}
+                for group in groups
+            ],
+        }
+    )
 
 
 @api_view(["POST"])
@@ -484,22 +709,36 @@ def analyze_code(request):
     serializer = CodeAnalysisSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     code = serializer.validated_data["code"]
+    return Response({"issues": analyze_snippet(code)})
 
-    try:
-        issues = _analyze_python_code(code)
-    except SyntaxError as exc:  # pragma: no cover - surfaced in API tests
-        return Response(
+
+@api_view(["POST"])
+def analyze_project_files(request):
+    serializer = ProjectAnalysisSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    reports = analyze_project(serializer.validated_data["files"])
+
+    files = []
+    issues = []
+    for report in reports:
+        files.append(
             {
-                "issues": [
-                    {
-                        "rule": "syntax-error",
-                        "message": exc.msg,
-                        "severity": "error",
-                        "line": exc.lineno,
-                        "column": exc.offset,
-                    }
-                ]
+                "path": report.path,
+                "sha256": report.sha256,
+                "cached": report.cached,
+                "issues": report.issues,
             }
         )
+        issues.extend({**issue, "path": report.path} for issue in report.issues)
 
-    return Response({"issues": issues})
+    payload = {
+        "summary": {
+            "files": len(reports),
+            "analyzed": sum(1 for report in reports if not report.cached),
+            "cached": sum(1 for report in reports if report.cached),
+            "issues": len(issues),
+        },
+        "files": files,
+        "issues": issues,
+    }
+    return Response(payload)
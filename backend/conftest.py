@@ -5,6 +5,8 @@ import os
 import sys
 from pathlib import Path
 
+import pytest
+
 BASE_DIR = Path(__file__).resolve().parent
 REPO_ROOT = BASE_DIR.parent
 PROJECT_DIR = BASE_DIR / "app"
@@ -21,3 +23,17 @@ if project_path not in sys.path:
 os.environ.setdefault(
     "DJANGO_SETTINGS_MODULE", "backend.app.app.settings"
 )
+
+
+@pytest.fixture(autouse=True)
+def _isolated_throttle_store(settings):
+    """Give each test fresh in-memory throttle buckets instead of the shared file."""
+
+    settings.THROTTLE_STORE = ":memory:"
+
+
+@pytest.fixture(autouse=True)
+def _inline_submission_index(settings):
+    """Index attempts in the committing thread, so tests see the rows as soon as callbacks run."""
+
+    settings.SUBMISSION_INDEX_WORKERS = 0